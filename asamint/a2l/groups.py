@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Bulk resolution of GROUPs and their MEASUREMENTs.
+
+`pya2l.api.inspect.Group` materializes a full inspect object for every member (and
+recursively for every sub-group); here group membership and the measurement attributes
+required for DAQ setup are fetched with a handful of SQL queries.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import defaultdict, namedtuple
+from logging import getLogger
+
+from sqlalchemy import bindparam, text
+
+MeasurementInfo = namedtuple("MeasurementInfo", "name address ext datatype compu_method is_virtual if_data")
+
+GroupInfo = namedtuple("GroupInfo", "name subgroups measurements")
+
+REACHABLE_GROUPS = text(
+    """
+    WITH RECURSIVE
+        edges(parent, child) AS (
+            SELECT g.groupName, sgi.identifier
+            FROM "group" g
+            JOIN sub_group sg ON sg._group_rid = g.rid
+            JOIN sub_group_identifiers sgi ON sgi.rm_rid = sg.rid
+        ),
+        reachable(name) AS (
+            SELECT groupName FROM "group" WHERE groupName IN :roots
+            UNION
+            SELECT e.child FROM reachable r JOIN edges e ON e.parent = r.name
+        )
+    SELECT name FROM reachable
+    """
+).bindparams(bindparam("roots", expanding=True))
+
+SUBGROUPS = text(
+    """
+    SELECT g.groupName, sgi.identifier
+    FROM "group" g
+    JOIN sub_group sg ON sg._group_rid = g.rid
+    JOIN sub_group_identifiers sgi ON sgi.rm_rid = sg.rid
+    WHERE g.groupName IN :groups
+    ORDER BY g.groupName, sgi.position
+    """
+).bindparams(bindparam("groups", expanding=True))
+
+REF_MEASUREMENTS = text(
+    """
+    SELECT g.groupName, rmi.identifier
+    FROM "group" g
+    JOIN ref_measurement rm ON rm._group_rid = g.rid
+    JOIN ref_measurement_identifiers rmi ON rmi.rm_rid = rm.rid
+    WHERE g.groupName IN :groups
+    ORDER BY g.groupName, rmi.position
+    """
+).bindparams(bindparam("groups", expanding=True))
+
+MEASUREMENTS = text(
+    """
+    SELECT m.name, ea.address, COALESCE(eae.extension, 0), m.datatype, m.conversion,
+        EXISTS (SELECT 1 FROM virtual v WHERE v._measurement_rid = m.rid)
+    FROM measurement m
+    LEFT JOIN ecu_address ea ON ea._measurement_rid = m.rid
+    LEFT JOIN ecu_address_extension eae ON eae.rid = m.ecu_address_extension_id
+    WHERE m.name IN :names
+    """
+).bindparams(bindparam("names", expanding=True))
+
+MEASUREMENT_IF_DATA = text(
+    """
+    SELECT m.name, i.raw
+    FROM measurement m
+    JOIN ifdata i ON i._association_id = m._if_data_association_id
+    WHERE m.name IN :names
+    ORDER BY m.name, i.rid
+    """
+).bindparams(bindparam("names", expanding=True))
+
+SQL_PARAMETER_CHUNK = 900  # Stay below SQLITE_MAX_VARIABLE_NUMBER of older SQLite versions.
+
+
+def _chunked(items, size=SQL_PARAMETER_CHUNK):
+    items = list(items)
+    for idx in range(0, len(items), size):
+        yield items[idx : idx + size]
+
+
+class GroupResolver:
+    """Resolve GROUPs (transitively) to their MEASUREMENTs.
+
+    Parameters
+    ----------
+    session: SQLAlchemy session
+
+    key: str
+        Identifies the A2L database (e.g. `AsamBaseType.a2l_hash`); resolved groups and
+        measurements are memoized per key across instances.
+    """
+
+    _memo = {}
+
+    def __init__(self, session, key: str = None):
+        self.logger = getLogger(self.__class__.__name__)
+        self.session = session
+        if key is None:
+            self._groups, self._measurements = {}, {}
+        else:
+            self._groups, self._measurements = self._memo.setdefault(key, ({}, {}))
+
+    @classmethod
+    def clear_cache(cls):
+        cls._memo.clear()
+
+    def group(self, name: str) -> GroupInfo:
+        self.load([name])
+        return self._groups.get(name)
+
+    def measurement(self, name: str) -> MeasurementInfo:
+        self._load_measurements([name])
+        return self._measurements.get(name)
+
+    def load(self, roots) -> None:
+        """Fetch `roots` and all transitively reachable sub-groups, including their MEASUREMENTs."""
+        roots = [r for r in roots if r not in self._groups]
+        if not roots:
+            return
+        reachable = set()
+        for chunk in _chunked(roots):
+            reachable.update(name for (name,) in self.session.execute(REACHABLE_GROUPS, {"roots": chunk}))
+        missing = [name for name in reachable if name not in self._groups]
+        subgroups = defaultdict(list)
+        measurements = defaultdict(list)
+        for chunk in _chunked(missing):
+            for parent, child in self.session.execute(SUBGROUPS, {"groups": chunk}):
+                subgroups[parent].append(child)
+            for group, meas in self.session.execute(REF_MEASUREMENTS, {"groups": chunk}):
+                measurements[group].append(meas)
+        for name in missing:
+            self._groups[name] = GroupInfo(name, tuple(subgroups[name]), tuple(measurements[name]))
+        self._load_measurements({m for name in missing for m in measurements[name]})
+        for name in roots:
+            if name not in self._groups:
+                self.logger.warning("GROUP '{}' does not exist.".format(name))
+
+    def _load_measurements(self, names) -> None:
+        missing = [name for name in names if name not in self._measurements]
+        if_data = defaultdict(list)
+        rows = []
+        for chunk in _chunked(missing):
+            rows.extend(self.session.execute(MEASUREMENTS, {"names": chunk}))
+            for name, raw in self.session.execute(MEASUREMENT_IF_DATA, {"names": chunk}):
+                if_data[name].append(raw)
+        for name, address, ext, datatype, compu_method, is_virtual in rows:
+            self._measurements[name] = MeasurementInfo(
+                name=name,
+                address=address,
+                ext=ext or 0,
+                datatype=datatype,
+                compu_method=compu_method,
+                is_virtual=bool(is_virtual),
+                if_data=tuple(if_data[name]),
+            )
+
+    def walk(self, name: str, recursive: bool = True):
+        """Depth-first traversal of a GROUP hierarchy.
+
+        Cycles (a GROUP being its own sub-group, directly or indirectly) are reported and cut.
+
+        Yields
+        ------
+        tuple: (path, measurements)
+            `path` is the tuple of group names from `name` to the current group,
+            `measurements` a list of `MeasurementInfo`.
+        """
+        self.load([name])
+        stack = [(name,)]
+        while stack:
+            path = stack.pop()
+            info = self._groups.get(path[-1])
+            if info is None:
+                continue
+            yield path, [self._measurements[m] for m in info.measurements if m in self._measurements]
+            if not recursive:
+                continue
+            for sg in reversed(info.subgroups):
+                if sg in path:
+                    self.logger.warning("Cyclic GROUP reference: {}.".format(" -> ".join(path + (sg,))))
+                    continue
+                stack.append(path + (sg,))
+
+    def measurements(self, name: str, recursive: bool = True):
+        """All MEASUREMENTs of a GROUP (without duplicates, in traversal order)."""
+        result = {}
+        for _, measurements in self.walk(name, recursive):
+            for meas in measurements:
+                result.setdefault(meas.name, meas)
+        return list(result.values())
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Bulk extraction of memory layouts (address, extension, allocated size) of
+CHARACTERISTICs and AXIS_PTS.
+
+Instead of creating an inspect object per parameter, RECORD_LAYOUTs and parameter
+attributes are fetched with a few queries and sizes are computed in Python.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import defaultdict, namedtuple
+from functools import reduce
+import json
+from logging import getLogger
+from operator import mul
+import os
+
+from sqlalchemy import text
+
+from asamint.asam import TYPE_SIZES
+
+MemoryLayout = namedtuple("MemoryLayout", "name category type address ext size")
+
+ValueLayout = namedtuple(
+    "ValueLayout", "name address ext datatype byte_order bit_mask compu_method comment display_identifier unit dependent"
+)
+
+AXES = ("x", "y", "z", "4", "5")
+
+# RECORD_LAYOUT keywords occupying one element of their data type per axis.
+AXIS_SCALAR_COMPONENTS = ("no_axis_pts", "no_rescale", "src_addr", "rip_addr", "shift_op", "offset", "dist_op")
+
+RESERVED_SIZES = {"BYTE": 1, "WORD": 2, "LONG": 4}
+
+RECORD_LAYOUT_TABLES = text("SELECT name FROM sqlite_master WHERE type = 'table'")
+
+CHARACTERISTICS = text(
+    """
+    SELECT c.rid, c.name, c.type, c.address, COALESCE(eae.extension, 0), c.deposit, n.number, c.matrix_dim_id
+    FROM characteristic c
+    LEFT JOIN ecu_address_extension eae ON eae.rid = c.ecu_address_extension_id
+    LEFT JOIN number n ON n.rid = c.number_id
+    """
+)
+
+MATRIX_DIMS = text("SELECT rm_rid, numbers FROM matrix_dim_numbers ORDER BY rm_rid, position")
+
+AXIS_DESCRS = text(
+    """
+    SELECT _characteristic_rid, attribute, maxAxisPoints
+    FROM axis_descr
+    WHERE _characteristic_rid IS NOT NULL
+    ORDER BY _characteristic_rid, rid
+    """
+)
+
+AXIS_PTS = text(
+    """
+    SELECT a.name, a.address, COALESCE(eae.extension, 0), a.depositAttr, a.maxAxisPoints
+    FROM axis_pts a
+    LEFT JOIN ecu_address_extension eae ON eae.rid = a.ecu_address_extension_id
+    """
+)
+
+VALUES = text(
+    """
+    SELECT c.name, c.address, COALESCE(eae.extension, 0), fv.datatype, bo.byteOrder, bm.mask, c.conversion,
+        c.longIdentifier, di.display_name, COALESCE(pu.unit, cm.unit),
+        EXISTS (SELECT 1 FROM dependent_characteristic dc WHERE dc._characteristic_rid = c.rid)
+    FROM characteristic c
+    JOIN record_layout rl ON rl.name = c.deposit
+    JOIN fnc_values fv ON fv._record_layout_rid = rl.rid
+    LEFT JOIN ecu_address_extension eae ON eae.rid = c.ecu_address_extension_id
+    LEFT JOIN byte_order bo ON bo.rid = c.byte_order_id
+    LEFT JOIN bit_mask bm ON bm.rid = c.bit_mask_id
+    LEFT JOIN display_identifier di ON di.rid = c.display_identifier_id
+    LEFT JOIN phys_unit pu ON pu.rid = c.phys_unit_id
+    LEFT JOIN compu_method cm ON cm.name = c.conversion
+    WHERE c.type = 'VALUE'
+    """
+)
+
+
+def value_layouts(session) -> dict:
+    """Everything needed to decode VALUE CHARACTERISTICs, fetched with a single query.
+
+    Returns
+    -------
+    dict
+        name ==> `ValueLayout`; `byte_order` is the CHARACTERISTIC's own BYTE_ORDER (or None),
+        `unit` is PHYS_UNIT, if present, else the unit of the COMPU_METHOD.
+    """
+    result = {}
+    for row in session.execute(VALUES):
+        layout = ValueLayout(*row)
+        result[layout.name] = layout._replace(dependent=bool(layout.dependent))
+    return result
+
+
+def _record_layout_query(tables):
+    """UNION of all RECORD_LAYOUT components: (layout name, component, axis, datatype)."""
+    parts = [
+        "SELECT rl.name, 'fnc_values', NULL, t.datatype FROM record_layout rl JOIN fnc_values t ON t._record_layout_rid = rl.rid",
+        "SELECT rl.name, 'identification', NULL, t.datatype FROM record_layout rl "
+        "JOIN identification t ON t._record_layout_rid = rl.rid",
+        "SELECT rl.name, 'reserved', NULL, t.dataSize FROM record_layout rl JOIN reserved t ON t._record_layout_rid = rl.rid",
+    ]
+    if "rip_addr_w" in tables:
+        parts.append(
+            "SELECT rl.name, 'rip_addr_w', NULL, t.datatype FROM record_layout rl "
+            "JOIN rip_addr_w t ON t._record_layout_rid = rl.rid"
+        )
+    for component in ("axis_pts", "axis_rescale") + AXIS_SCALAR_COMPONENTS:
+        for axis in AXES:
+            table = "{}_{}".format(component, axis)
+            if table in tables:
+                parts.append(
+                    "SELECT rl.name, '{}', '{}', t.datatype FROM record_layout rl "
+                    "JOIN {} t ON t._record_layout_rid = rl.rid".format(component, axis, table)
+                )
+    return text(" UNION ALL ".join(parts))
+
+
+class LayoutExtractor:
+    """Compute memory layouts of all CHARACTERISTICs and AXIS_PTS of an A2L database.
+
+    Parameters
+    ----------
+    session: SQLAlchemy session
+
+    key: str
+        Identifies the A2L database (e.g. `AsamBaseType.a2l_hash`); results are memoized per key
+        and, if `cache_dir` is given, persisted as JSON.
+
+    cache_dir: str
+    """
+
+    FILE_PREFIX = "param_layouts_"
+    LAYOUT_VERSION = 1
+
+    _memo = {}
+
+    def __init__(self, session, key: str = None, cache_dir: str = None):
+        self.logger = getLogger(self.__class__.__name__)
+        self.session = session
+        self.key = key
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def clear_cache(cls):
+        cls._memo.clear()
+
+    def file_name(self) -> str:
+        return os.path.join(self.cache_dir, "{}{}.json".format(self.FILE_PREFIX, self.key))
+
+    def layouts(self) -> dict:
+        """
+        Returns
+        -------
+        dict
+            name ==> `MemoryLayout`
+        """
+        if self.key is not None and self.key in self._memo:
+            return self._memo[self.key]
+        result = self._load()
+        if result is None:
+            result = self.extract()
+            self._store(result)
+        if self.key is not None:
+            self._memo[self.key] = result
+        return result
+
+    def _load(self):
+        if self.key is None or self.cache_dir is None or not os.path.exists(self.file_name()):
+            return None
+        with open(self.file_name(), "rt", encoding="utf8") as inf:
+            try:
+                data = json.load(inf)
+            except ValueError:
+                return None
+        if data.get("version") != self.LAYOUT_VERSION:
+            return None
+        return {entry[0]: MemoryLayout(*entry) for entry in data["layouts"]}
+
+    def _store(self, layouts: dict):
+        if self.key is None or self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+        with open(self.file_name(), "wt", encoding="utf8") as outf:
+            json.dump({"version": self.LAYOUT_VERSION, "layouts": [list(e) for e in layouts.values()]}, outf)
+
+    def record_layouts(self) -> dict:
+        """
+        Returns
+        -------
+        dict
+            RECORD_LAYOUT name ==> {"fnc_values": datatype, "other": [sizes of non-axis components],
+            "axes": {axis ==> {component ==> datatype}}}
+        """
+        tables = {name for (name,) in self.session.execute(RECORD_LAYOUT_TABLES)}
+        result = defaultdict(lambda: {"fnc_values": None, "other": [], "axes": defaultdict(dict)})
+        for name, component, axis, datatype in self.session.execute(_record_layout_query(tables)):
+            layout = result[name]
+            if component == "fnc_values":
+                layout["fnc_values"] = datatype
+            elif component == "reserved":
+                layout["other"].append(RESERVED_SIZES.get(datatype, 0))
+            elif axis is None:
+                layout["other"].append(TYPE_SIZES.get(datatype, 0))
+            else:
+                layout["axes"][axis][component] = datatype
+        return result
+
+    def extract(self) -> dict:
+        record_layouts = self.record_layouts()
+        matrix_dims = defaultdict(list)
+        for rid, number in self.session.execute(MATRIX_DIMS):
+            matrix_dims[rid].append(number)
+        axis_descrs = defaultdict(list)
+        for rid, attribute, max_axis_points in self.session.execute(AXIS_DESCRS):
+            axis_descrs[rid].append((attribute, max_axis_points))
+        result = {}
+        for rid, name, tp, address, ext, deposit, number, matrix_dim_id in self.session.execute(CHARACTERISTICS):
+            layout = record_layouts.get(deposit)
+            if layout is None:
+                self.logger.warning("CHARACTERISTIC '{}': RECORD_LAYOUT '{}' not found.".format(name, deposit))
+                continue
+            size = self.characteristic_size(tp, layout, number, matrix_dims.get(matrix_dim_id), axis_descrs.get(rid, []))
+            result[name] = MemoryLayout(name, "CHARACTERISTIC", tp, address, ext, size)
+        for name, address, ext, deposit, max_axis_points in self.session.execute(AXIS_PTS):
+            layout = record_layouts.get(deposit)
+            if layout is None:
+                self.logger.warning("AXIS_PTS '{}': RECORD_LAYOUT '{}' not found.".format(name, deposit))
+                continue
+            result[name] = MemoryLayout(name, "AXIS_PTS", "AXIS_PTS", address, ext, self.axis_pts_size(layout, max_axis_points))
+        return result
+
+    @staticmethod
+    def characteristic_size(tp: str, layout: dict, number, matrix_dim, axis_descrs) -> int:
+        """Statically allocated memory of a CHARACTERISTIC (function values, axes and meta-data)."""
+        element_size = TYPE_SIZES.get(layout["fnc_values"], 0)
+        other = sum(layout["other"])
+        if tp == "VALUE":
+            return element_size + other
+        elif tp == "ASCII":
+            return (matrix_dim[0] if matrix_dim else number or 0) + other
+        elif tp == "VAL_BLK":
+            count = reduce(mul, [d for d in matrix_dim if d], 1) if matrix_dim else number or 0
+            return count * element_size + other
+        size = reduce(mul, [max_axis_points for _, max_axis_points in axis_descrs], 1) * element_size
+        for axis, (attribute, max_axis_points) in zip(AXES, axis_descrs):
+            if attribute not in ("RES_AXIS", "STD_AXIS"):
+                continue
+            for component, datatype in layout["axes"].get(axis, {}).items():
+                if component == "axis_pts":
+                    size += max_axis_points * TYPE_SIZES.get(datatype, 0)
+                elif component == "axis_rescale":
+                    size += max_axis_points * TYPE_SIZES.get(datatype, 0) * 2  # Pairs.
+                else:
+                    size += TYPE_SIZES.get(datatype, 0)
+        return size + other
+
+    @staticmethod
+    def axis_pts_size(layout: dict, max_axis_points: int) -> int:
+        """Statically allocated memory of AXIS_PTS."""
+        x_axis = layout["axes"].get("x", {})
+        if "axis_pts" in x_axis:
+            size = max_axis_points * TYPE_SIZES.get(x_axis["axis_pts"], 0)
+        elif "axis_rescale" in x_axis:
+            size = max_axis_points * TYPE_SIZES.get(x_axis["axis_rescale"], 0) * 2
+        else:
+            size = 0
+        size += sum(TYPE_SIZES.get(dt, 0) for component, dt in x_axis.items() if component in AXIS_SCALAR_COMPONENTS)
+        return size + sum(layout["other"])
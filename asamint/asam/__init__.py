@@ -31,13 +31,14 @@ __author__ = "Christoph Schueler"
 
 from enum import IntEnum
 from logging import getLogger
+import os
 
 from sqlalchemy import func, or_
 
 from pya2l.api.inspect import Measurement, ModCommon, ModPar
 import pya2l.model as model
 from pya2l import DB
-from asamint.utils import cond_create_directories, current_timestamp
+from asamint.utils import add_suffix_to_path, cond_create_directories, current_timestamp, sha1_file_digest
 from asamint.config import Configuration
 
 
@@ -82,8 +83,11 @@ class AsamBaseType:
         "measurements": "measurements",
         "parameters": "parameters",
         "hexfiles": "hexfiles",
+        "cache": "cache",
     }
 
+    _a2l_hashes = {}  # Absolute A2L path ==> SHA1 digest.
+
     def __init__(self, project_config=None, experiment_config=None, *args, **kws):
         self.project_config = Configuration(AsamBaseType.PROJECT_PARAMETER_MAP or {}, project_config or {})
         self.experiment_config = Configuration(AsamBaseType.EXPERIMENT_PARAMETER_MAP or {}, experiment_config or {})
@@ -125,6 +129,19 @@ class AsamBaseType:
     def session(self):
         return self._session_obj
 
+    @property
+    def a2l_hash(self):
+        """SHA1 digest of the A2L file, suitable as a cache key.
+
+        Memoized per absolute path; None if the A2L file doesn't exist (caches are bypassed then).
+        """
+        a2l_file = os.path.abspath(add_suffix_to_path(self.project_config.get("A2L_FILE"), ".a2l"))
+        if a2l_file not in AsamBaseType._a2l_hashes:
+            if not os.path.exists(a2l_file):
+                return None
+            AsamBaseType._a2l_hashes[a2l_file] = sha1_file_digest(a2l_file)
+        return AsamBaseType._a2l_hashes[a2l_file]
+
     @property
     def query(self):
         return self.session.query
@@ -149,9 +166,13 @@ class AsamBaseType:
         `ByteOrder`:
             If element has no BYTE_ORDER, lookup MOD_COMMON else ByteOrder.BIG_ENDIAN
         """
+        return self.resolve_byte_order(obj.byteOrder)
+
+    def resolve_byte_order(self, byte_order):
+        """Like `byte_order`, but for a raw BYTE_ORDER value (None if the element has none)."""
         return (
             ByteOrder.BIG_ENDIAN
-            if obj.byteOrder or self.mod_common.byteOrder in ("MSB_FIRST", "LITTLE_ENDIAN")
+            if byte_order or self.mod_common.byteOrder in ("MSB_FIRST", "LITTLE_ENDIAN")
             else ByteOrder.LITTLE_ENDIAN
         )
 
@@ -172,6 +193,22 @@ TYPE_SIZES = {
     "FLOAT64_IEEE": 8,
 }
 
+NP_TYPES = {
+    "BYTE": "u1",
+    "UBYTE": "u1",
+    "SBYTE": "i1",
+    "WORD": "u2",
+    "UWORD": "u2",
+    "SWORD": "i2",
+    "LONG": "u4",
+    "ULONG": "u4",
+    "SLONG": "i4",
+    "A_UINT64": "u8",
+    "A_INT64": "i8",
+    "FLOAT32_IEEE": "f4",
+    "FLOAT64_IEEE": "f8",
+}
+
 OJ_READERS = {
     "UBYTE": ("uint8_le", "uint8_be"),
     "SBYTE": ("int8_le", "int8_be"),
@@ -194,3 +231,8 @@ class ByteOrder(IntEnum):
 def get_section_reader(datatype: str, byte_order: ByteOrder) -> str:
     """ """
     return OJ_READERS[datatype][byte_order]
+
+
+def get_np_dtype(datatype: str, byte_order: ByteOrder) -> str:
+    """NumPy dtype string (like '<u2') for ASAM datatype."""
+    return "{}{}".format(">" if byte_order == ByteOrder.BIG_ENDIAN else "<", NP_TYPES[datatype])
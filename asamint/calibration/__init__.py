@@ -35,6 +35,12 @@ import os
 import numpy as np
 
 from asamint.asam import AsamBaseType
+from asamint.a2l.layouts import LayoutExtractor, ValueLayout, value_layouts
+from asamint.calibration.bulk import FlatImage, read_scalars
+from asamint.calibration.lazy import LazyParameters
+from asamint.calibration.parallel import load_parallel
+from asamint.calibration.transfer import XcpTransferMixin
+from asamint.compu import evaluator
 
 from asamint.asam import TYPE_SIZES, get_section_reader
 from asamint.logger import Logger
@@ -43,7 +49,7 @@ from asamint.utils.optimize import McObject, make_continuous_blocks
 from asamint.calibration import model as cmod
 
 from pya2l import DB
-from pya2l.api.inspect import AxisPts, CompuMethod, Characteristic, ModPar
+from pya2l.api.inspect import AxisPts, Characteristic, ModPar
 from pya2l.api import inspect
 from pya2l.functions import fix_axis_par, fix_axis_par_dist
 
@@ -53,6 +59,8 @@ from objutils import dump, load, Image, Section
 
 AXES = ("x", "y", "z", "4", "5")
 
+NUM_AXES = {"CURVE": 1, "MAP": 2, "CUBOID": 3, "CUBE_4": 4, "CUBE_5": 5}
+
 
 class Calibration:
     """ """
@@ -69,8 +77,7 @@ class Calibration:
     def int_to_physical(self, characteristic, int_values):
         """ """
         cm_name = "NO_COMPU_METHOD" if characteristic.compuMethod == "NO_COMPU_METHOD" else characteristic.compuMethod.name
-        cm = CompuMethod.get(self.a2l_db.session, cm_name)
-        return cm.int_to_physical(int_values)
+        return evaluator(self.a2l_db.session, cm_name)(int_values)
 
     def load_ascii(self, characteristic_name: str) -> cmod.Ascii:
         characteristic = self._load_characteristic(characteristic_name, "ASCII")
@@ -159,7 +166,7 @@ class OfflineCalibration(Calibration):
         self.hexfile_type = hexfile_type
 
 
-class CalibrationData(AsamBaseType):
+class CalibrationData(XcpTransferMixin, AsamBaseType):
     """Fetch calibration parameters from HEX file or XCP slave and create an in-memory representation.
 
     Parameters
@@ -174,6 +181,19 @@ class CalibrationData(AsamBaseType):
     Don't use directly.
     """
 
+    PROJECT_PARAMETER_MAP = {
+        #                                   Type     Req'd   Default
+        "BUS_TRANSPORT": (str, False, "CAN"),  # "CAN", "CANFD", "ETH", "SXI".
+        "BUS_BITRATE": (int, False, 500000),
+        "UPLOAD_GAP_MERGING": (bool, False, True),  # Bridge gaps between blocks if cheaper than another request.
+        "XCP_COMMAND_LATENCY": (float, False, 0.001),  # Seconds per request/response round trip.
+        "INCREMENTAL_UPLOAD": (bool, False, False),  # Skip blocks whose BUILD_CHECKSUM matches the previous upload.
+        "IMAGE_STORE": (bool, False, False),  # Serve uploads from unchanged ECUs (same EPK and checksums) from disk.
+        "IMAGE_STORE_MAX_ENTRIES": (int, False, 20),
+        "IMAGE_STORE_MAX_SIZE": (int, False, 256 * 1024 * 1024),  # Bytes.
+        "LOAD_WORKERS": (int, False, 0),  # Decode parameters in worker processes (s. `load_hex`), 0: sequential.
+    }
+
     def on_init(self, project_config, experiment_config, *args, **kws):
         self.loadConfig(project_config, experiment_config)
         self.a2l_epk = self.epk_from_a2l()
@@ -181,22 +201,37 @@ class CalibrationData(AsamBaseType):
             self.logger.info("A2L doesn't contains an EPK.")
         else:
             self.logger.info("EPK from A2L: {}".format(self.a2l_epk))
+        self._reset_parameters()
+
+    def _reset_parameters(self):
+        """Empty (lazy) parameter containers, s. `parameters`."""
+        axis_pts_names = [a.name for a in self.query(model.AxisPts.name).order_by(model.AxisPts.address).all()]
         self._parameters = {
-            k: OrderedDict()
-            for k in (
-                "AXIS_PTS",
-                "VALUE",
-                "VAL_BLK",
-                "ASCII",
-                "CURVE",
-                "MAP",
-                "CUBOID",
-                "CUBE_4",
-                "CUBE_5",
-            )
+            "AXIS_PTS": LazyParameters(axis_pts_names, self._load_axis_pt),
+            "VALUE": LazyParameters(
+                self._characteristic_names("VALUE"), lambda name: self._load_value(Characteristic.get(self.session, name))
+            ),
+            "VAL_BLK": LazyParameters(self._characteristic_names("VAL_BLK"), self._load_value_block),
+            "ASCII": LazyParameters(self._characteristic_names("ASCII"), self._load_ascii),
         }
+        for category, num_axes in NUM_AXES.items():
+            loader = functools.partial(self._load_curve_or_map, category=category, num_axes=num_axes)
+            self._parameters[category] = LazyParameters(self._characteristic_names(category), loader)
+
+    def load_hex(self, workers: int = None):
+        """Decode all parameters from `image` (otherwise they are decoded on first access, s. `parameters`).
 
-    def load_hex(self):
+        Parameters
+        ----------
+        workers: int
+            Decode in parallel by that many worker processes (s. `asamint.calibration.parallel`);
+            default: `LOAD_WORKERS` from project_config.
+        """
+        if workers is None:
+            workers = self.project_config.get("LOAD_WORKERS")
+        if workers and workers > 1:
+            load_parallel(self, workers)
+            return
         self._load_axis_pts()
         self._load_values()
         self._load_asciis()
@@ -216,9 +251,8 @@ class CalibrationData(AsamBaseType):
         """
         if self.mod_par is None or self.a2l_epk is None:
             return None
-        epk_a2l, epk_addr = self.a2l_epk
-        xcp_master.setMta(epk_addr)
-        epk_xcp = xcp_master.pull(len(epk_a2l)).decode("ascii")
+        epk_a2l, _ = self.a2l_epk
+        epk_xcp = self.read_epk(xcp_master)
         ok = epk_xcp == epk_a2l
         if not ok:
             self.logger.warn("EPK is invalid -- A2L: '{}' got '{}'.".format(self.mod_par.epk, epk_xcp))
@@ -271,7 +305,7 @@ class CalibrationData(AsamBaseType):
         if not image:
             raise ValueError("")
         else:
-            self._image = image
+            self.image = image
         self.load_hex()
         self.save()
 
@@ -311,47 +345,104 @@ class CalibrationData(AsamBaseType):
         sections = []
         xcp_master.setCalPage(0x83, 0, 0)  # TODO: Requires paging information from IF_DATA section.
         page = 0
-        for addr, size in ram_segments:
-            xcp_master.setMta(addr)
-            mem = xcp_master.pull(size)
-            sections.append(Section(start_address=addr, data=mem))
+        blocks = [McObject("", addr, size) for addr, size in ram_segments]
+        for block, mem in zip(blocks, self.fetch_blocks(xcp_master, blocks, kind="calram")):
+            sections.append(Section(start_address=block.address, data=mem))
         file_name = "CalRAM{}_P{}.{}".format(current_timestamp(), page, "hex" if file_type == "ihex" else "srec")
         file_name = os.path.join(self.sub_dir("hexfiles"), file_name)
         img = Image(sections=sections, join=False)
         with open("{}".format(file_name), "wb") as outf:
             dump(file_type, outf, img, row_length=32)
         self.logger.info("CalRAM written to {}".format(file_name))
+        self._calram = Image(sections=[Section(s.start_address, bytes(s.data)) for s in sections], join=False)
         return img
 
-    def download_calram(self, xcp_master, module_name: str = None, data: bytes = None):
+    def download_calram(
+        self,
+        xcp_master,
+        module_name: str = None,
+        data: bytes = None,
+        image: Image = None,
+        reference: Image = None,
+        verify: bool = False,
+    ):
         """Tansfer RAM segments from MCS to ECU.
 
+        Only byte ranges differing from `reference` are written; neighbouring ranges are
+        merged if this is cheaper than separate transfers.
+
         Parameters
         ----------
+        data: bytes
+            Contents of the first RAM segment (if `image` is not given).
+
+        image: `Image`
+            Target contents of CalRAM.
+
+        reference: `Image`
+            Current contents of CalRAM. Defaults to the result of the last `upload_calram` /
+            `download_calram`, if BUILD_CHECKSUM confirms it's still up-to-date;
+            without any reference everything is written.
+
+        verify: bool
+            Check written ranges by BUILD_CHECKSUM.
 
         Returns
         -------
+        `DownloadStats` or `None`
         """
-        if not data:
-            return
-        self.check_epk_xcp(xcp_master)
-        # ram_segments = []
+        # asamint.xcp imports this module.
+        from asamint.xcp.transfer import diff_image, download_blocks, image_unchanged, patched_image
+
         mp = ModPar(self.session, module_name or None)
-        segment = mp.memorySegments[0]
-        if segment["memoryType"] == "RAM":
-            xcp_master.setMta(segment["address"])
-            # xcp_master.setMta(0x4000)
-            xcp_master.push(data)
-        # for segment in mp.memorySegments:
-        #    if segment['memoryType'] == "RAM":
-        #        ram_segments.append((segment['address'], segment['size'], ))
-        # if not ram_segments:
-        #    return None # ECU program doesn't define RAM segments.
-        # sections = []
-        # for addr, size in ram_segments:
-        #    xcp_master.setMta(addr)
-        #    mem = xcp_master.fetch(size)
-        #    sections.append(Section(start_address = addr, data = mem))
+        if image is None:
+            if not data:
+                return
+            segment = mp.memorySegments[0]
+            if segment["memoryType"] != "RAM":
+                return
+            image = Image(sections=[Section(start_address=segment["address"], data=data)], join=False)
+        self.check_epk_xcp(xcp_master)
+        ram_segments = [(s["address"], s["address"] + s["size"]) for s in mp.memorySegments if s["memoryType"] == "RAM"]
+        for section in image.sections:
+            if not any(lo <= section.start_address and section.start_address + section.length <= hi for lo, hi in ram_segments):
+                self.logger.warning(
+                    "Section 0x{:08x} ({} bytes) is not located in CalRAM.".format(section.start_address, section.length)
+                )
+        if reference is None:
+            reference = getattr(self, "_calram", None)
+            if reference is not None and not image_unchanged(xcp_master, reference):
+                self.logger.info("CalRAM changed since last transfer, writing all sections.")
+                reference = None
+        blocks, stats = diff_image(image, reference, self.transfer_cost_model(xcp_master))
+        self.logger.info(
+            "Downloading {} bytes in {} block(s) ({} of {} bytes changed).".format(
+                stats.bytes, stats.blocks, stats.changed_bytes, stats.total_bytes
+            )
+        )
+        download_blocks(xcp_master, blocks, verify)
+        if reference is not None:
+            self._calram = patched_image(reference, blocks)
+        else:
+            self._calram = Image(sections=[Section(s.start_address, bytes(s.data)) for s in image.sections], join=False)
+        return stats
+
+    def parameter_blocks(self):
+        """Continuous memory blocks covering all CHARACTERISTICs and AXIS_PTS.
+
+        Returns
+        -------
+        list of `McObject`
+        """
+        result = []
+        a2l_epk = self.a2l_epk
+        if a2l_epk:
+            epk, address = a2l_epk
+            result.append(McObject("EPK", address, len(epk)))
+        layouts = LayoutExtractor(self.session, self.a2l_hash, self.sub_dir("cache")).layouts()
+        for layout in layouts.values():
+            result.append(McObject(layout.name, layout.address, layout.size, layout.ext))
+        return make_continuous_blocks(result)
 
     def upload_parameters(self, xcp_master, save_to_file: bool = True, hexfile_type: str = "ihex"):
         """
@@ -374,28 +465,11 @@ class CalibrationData(AsamBaseType):
             hexfile_type = hexfile_type.lower()
         if hexfile_type not in ("ihex", "srec"):
             raise ValueError("'file_type' must be either 'ihex' or 'srec'")
-        result = []
-        a2l_epk = self.a2l_epk
-        if a2l_epk:
-            epk, address = a2l_epk
-            result.append(McObject("EPK", address, len(epk)))
-        axis_pts = self.query(model.AxisPts).order_by(model.AxisPts.address).all()
-        for a in axis_pts:
-            ax = AxisPts.get(self.session, a.name)
-            mem_size = ax.total_allocated_memory
-            result.append(McObject(ax.name, ax.address, mem_size))
-        characteristics = self.query(model.Characteristic).order_by(model.Characteristic.type, model.Characteristic.address).all()
-        for c in characteristics:
-            characteristic = Characteristic.get(self.session, c.name)
-            mem_size = characteristic.total_allocated_memory
-            result.append(McObject(characteristic.name, characteristic.address, mem_size))
-        blocks = make_continuous_blocks(result)
+        blocks = self.merge_upload_blocks(xcp_master, self.parameter_blocks())
         total_size = functools.reduce(lambda a, s: s.length + a, blocks, 0)
         self.logger.info("Fetching a total of {:.2f} KBytes from XCP slave".format(total_size / 1024))
         sections = []
-        for block in blocks:
-            xcp_master.setMta(block.address)
-            mem = xcp_master.pull(block.length)
+        for block, mem in zip(blocks, self.fetch_blocks(xcp_master, blocks)):
             sections.append(Section(start_address=block.address, data=mem))
         img = Image(sections=sections, join=False)
         if save_to_file:
@@ -407,152 +481,222 @@ class CalibrationData(AsamBaseType):
         return img
 
     def _load_asciis(self):
-        for characteristic in self.characteristics("ASCII"):
-            self.logger.debug("Processing ASCII '{}' @0x{:08x}".format(characteristic.name, characteristic.address))
-            if characteristic.matrixDim:
-                length = characteristic.matrixDim["x"]
-            else:
-                length = characteristic.number
-            value = self.image.read_string(characteristic.address, length=length)
-            self._parameters["ASCII"][characteristic.name] = cmod.Ascii(
-                name=characteristic.name,
-                comment=characteristic.longIdentifier,
-                category="ASCII",
-                value=value,
-                displayIdentifier=characteristic.displayIdentifier,
-                length=length,
-            )
+        self._parameters["ASCII"].materialize()
+
+    def _load_ascii(self, name: str):
+        characteristic = Characteristic.get(self.session, name)
+        self.logger.debug("Processing ASCII '{}' @0x{:08x}".format(characteristic.name, characteristic.address))
+        if characteristic.matrixDim:
+            length = characteristic.matrixDim["x"]
+        else:
+            length = characteristic.number
+        value = self.image.read_string(characteristic.address, length=length)
+        return cmod.Ascii(
+            name=characteristic.name,
+            comment=characteristic.longIdentifier,
+            category="ASCII",
+            value=value,
+            displayIdentifier=characteristic.displayIdentifier,
+            length=length,
+        )
 
     def _load_value_blocks(self):
-        for characteristic in self.characteristics("VAL_BLK"):
-            self.logger.debug("Processing VAL_BLK '{}' @0x{:08x}".format(characteristic.name, characteristic.address))
-            reader = get_section_reader(characteristic.fnc_asam_dtype, self.byte_order(characteristic))
-            raw_values = self.image.read_ndarray(
-                addr=characteristic.address,
-                length=characteristic.fnc_allocated_memory,
-                dtype=reader,
-                shape=characteristic.fnc_np_shape,
-                order=characteristic.fnc_np_order,
-                bit_mask=characteristic.bitMask,
-            )
-            converted_values = self.int_to_physical(characteristic, raw_values)
-            self._parameters["VAL_BLK"][characteristic.name] = cmod.ValueBlock(
-                name=characteristic.name,
-                comment=characteristic.longIdentifier,
-                category="VAL_BLK",
-                raw_values=raw_values,
-                converted_values=converted_values,
-                displayIdentifier=characteristic.displayIdentifier,
-                shape=characteristic.fnc_np_shape,
-                unit=characteristic.physUnit,
-            )
+        self._parameters["VAL_BLK"].materialize()
+
+    def _load_value_block(self, name: str):
+        characteristic = Characteristic.get(self.session, name)
+        self.logger.debug("Processing VAL_BLK '{}' @0x{:08x}".format(characteristic.name, characteristic.address))
+        reader = get_section_reader(characteristic.fnc_asam_dtype, self.byte_order(characteristic))
+        raw_values = self.image.read_ndarray(
+            addr=characteristic.address,
+            length=characteristic.fnc_allocated_memory,
+            dtype=reader,
+            shape=characteristic.fnc_np_shape,
+            order=characteristic.fnc_np_order,
+            bit_mask=characteristic.bitMask,
+        )
+        converted_values = self.int_to_physical(characteristic, raw_values)
+        return cmod.ValueBlock(
+            name=characteristic.name,
+            comment=characteristic.longIdentifier,
+            category="VAL_BLK",
+            raw_values=raw_values,
+            converted_values=converted_values,
+            displayIdentifier=characteristic.displayIdentifier,
+            shape=characteristic.fnc_np_shape,
+            unit=characteristic.physUnit,
+        )
 
     def _load_values(self):
-        for characteristic in self.characteristics("VALUE"):
-            self.logger.debug("Processing VALUE '{}' @0x{:08x}".format(characteristic.name, characteristic.address))
-            # CALIBRATION_ACCESS
-            # READ_ONLY
-            fnc_asam_dtype = characteristic.fnc_asam_dtype
-            reader = get_section_reader(fnc_asam_dtype, self.byte_order(characteristic))
-            if characteristic.bitMask:
-                raw_value = self.image.read_numeric(characteristic.address, reader, bit_mask=characteristic.bitMask)
-                raw_value >>= ffs(characteristic.bitMask)  # Right-shift to get rid of trailing zeros (s. ASAM 2-MC spec).
-                is_bool = True if characteristic.bitMask in SINGLE_BITS else False
-            else:
-                raw_value = self.image.read_numeric(characteristic.address, reader)
-                is_bool = False
-            if characteristic.physUnit is None and characteristic._conversionRef != "NO_COMPU_METHOD":
-                unit = characteristic.compuMethod.unit
-            else:
-                unit = characteristic.physUnit
-            converted_value = self.int_to_physical(characteristic, raw_value)
-            if isinstance(converted_value, (int, float)):
-                if is_bool:
-                    category = "BOOLEAN"
-                    converted_value = "true" if bool(converted_value) else "false"
-                else:
-                    category = "VALUE"
+        """Load VALUEs group-wise.
+
+        Attributes of all VALUEs are fetched with a single query (s. `asamint.a2l.layouts.value_layouts`).
+        VALUEs are grouped by (datatype, byte order, COMPU_METHOD); every group is read from a
+        flattened image with a single gather and converted with a single COMPU_METHOD call.
+        VALUEs not contained in the image (or groups that can't be vectorized) take the scalar path.
+        """
+        pending = self._parameters["VALUE"].pending()
+        all_layouts = value_layouts(self.session)
+        layouts = [all_layouts[name] for name in pending if name in all_layouts]
+        groups = OrderedDict()
+        for layout in layouts:
+            key = (layout.datatype, self.resolve_byte_order(layout.byte_order), layout.compu_method)
+            groups.setdefault(key, []).append(layout)
+        flat_image = FlatImage(self.image)
+        values = {}
+        for (datatype, byte_order, cm_name), members in groups.items():
+            try:
+                raw_values, valid = read_scalars(
+                    flat_image, [m.address for m in members], datatype, byte_order, [m.bit_mask for m in members]
+                )
+            except (KeyError, TypeError):
+                valid = np.zeros(len(members), dtype=bool)
+            members_valid = [m for m, v in zip(members, valid.tolist()) if v]
+            if members_valid:
+                raw_values = raw_values[valid]
+                cm = evaluator(self.session, cm_name)
+                converted_values = cm(raw_values)
+                converted_values = np.asarray(converted_values).tolist() if np.ndim(converted_values) else None
+                if converted_values is None or len(converted_values) != len(members_valid):
+                    converted_values = [cm(r) for r in raw_values.tolist()]
+                for layout, raw_value, converted_value in zip(members_valid, raw_values.tolist(), converted_values):
+                    values[layout.name] = self._make_value(layout, raw_value, converted_value)
+            for layout, ok in zip(members, valid.tolist()):
+                if not ok:
+                    values[layout.name] = self._load_value(Characteristic.get(self.session, layout.name))
+        for name in pending:
+            if name not in values:  # No FNC_VALUES.
+                values[name] = self._load_value(Characteristic.get(self.session, name))
+            self._parameters["VALUE"][name] = values[name]
+
+    def _load_value(self, characteristic):
+        """Load a single VALUE (scalar path)."""
+        self.logger.debug("Processing VALUE '{}' @0x{:08x}".format(characteristic.name, characteristic.address))
+        # CALIBRATION_ACCESS
+        # READ_ONLY
+        fnc_asam_dtype = characteristic.fnc_asam_dtype
+        reader = get_section_reader(fnc_asam_dtype, self.byte_order(characteristic))
+        if characteristic.bitMask:
+            raw_value = self.image.read_numeric(characteristic.address, reader, bit_mask=characteristic.bitMask)
+            raw_value >>= ffs(characteristic.bitMask)  # Right-shift to get rid of trailing zeros (s. ASAM 2-MC spec).
+        else:
+            raw_value = self.image.read_numeric(characteristic.address, reader)
+        converted_value = self.int_to_physical(characteristic, raw_value)
+        if characteristic.physUnit is None and characteristic._conversionRef != "NO_COMPU_METHOD":
+            unit = characteristic.compuMethod.unit
+        else:
+            unit = characteristic.physUnit
+        layout = ValueLayout(
+            name=characteristic.name,
+            address=characteristic.address,
+            ext=None,
+            datatype=fnc_asam_dtype,
+            byte_order=characteristic.byteOrder,
+            bit_mask=characteristic.bitMask,
+            compu_method=self._compu_method_name(characteristic),
+            comment=characteristic.longIdentifier,
+            display_identifier=characteristic.displayIdentifier,
+            unit=unit,
+            dependent=bool(getattr(characteristic, "dependentCharacteristic", None)),  # Not available in every pya2l version.
+        )
+        return self._make_value(layout, raw_value, converted_value)
+
+    def _make_value(self, layout, raw_value, converted_value):
+        """
+        Parameters
+        ----------
+        layout: `asamint.a2l.layouts.ValueLayout`
+        """
+        is_bool = True if layout.bit_mask and layout.bit_mask in SINGLE_BITS else False
+        if isinstance(converted_value, (int, float)):
+            if is_bool:
+                category = "BOOLEAN"
+                converted_value = "true" if bool(converted_value) else "false"
             else:
-                category = "TEXT"
-            if characteristic.dependentCharacteristic:
-                category = "DEPENDENT_VALUE"
-            self._parameters["VALUE"][characteristic.name] = cmod.Value(
-                name=characteristic.name,
-                comment=characteristic.longIdentifier,
-                category=category,
-                raw_value=raw_value,
-                converted_value=converted_value,
-                displayIdentifier=characteristic.displayIdentifier,
-                unit=unit,
-            )
+                category = "VALUE"
+        else:
+            category = "TEXT"
+        if layout.dependent:
+            category = "DEPENDENT_VALUE"
+        return cmod.Value(
+            name=layout.name,
+            comment=layout.comment,
+            category=category,
+            raw_value=raw_value,
+            converted_value=converted_value,
+            displayIdentifier=layout.display_identifier,
+            unit=layout.unit,
+        )
 
     def _load_axis_pts(self):
-        for item in self.axis_points():
-            ap = AxisPts.get(self.session, item.name)
-            # mem_size = ap.total_allocated_memory
-            self.logger.debug("Processing AXIS_PTS '{}' @0x{:08x}".format(ap.name, ap.address))
-            rl_values = self.read_record_layout_values(ap, "x")
-            self.record_layout_correct_offsets(ap)
-            virtual = False
-            axis = ap.record_layout_components.axes("x")
-            paired = False
-            if "axisRescale" in axis:
-                category = "RES_AXIS"
-                paired = True
-                if "noRescale" in rl_values:
-                    no_rescale_pairs = rl_values["noRescale"]
-                else:
-                    no_rescale_pairs = axis["maxNumberOfRescalePairs"]
-                index_incr = axis["axisRescale"]["indexIncr"]
-                count = no_rescale_pairs * 2
-                attr = "axisRescale"
-            elif "axisPts" in axis:
-                category = "COM_AXIS"
-                if "noAxisPts" in rl_values:
-                    no_axis_points = rl_values["noAxisPts"]
-                else:
-                    no_axis_points = axis["maxAxisPoints"]
-                index_incr = axis["axisPts"]["indexIncr"]
-                count = no_axis_points
-                attr = "axisPts"
-            elif "offset" in axis:
-                category = "FIX_AXIS"
-                virtual = True  # Virtual / Calculated axis.
-                offset = rl_values.get("offset")
-                dist_op = rl_values.get("distOp")
-                shift_op = rl_values.get("shiftOp")
-                if "noAxisPts" in rl_values:
-                    no_axis_points = rl_values["noAxisPts"]
-                else:
-                    no_axis_points = axis["maxAxisPoints"]
-                if (dist_op or shift_op) is None:
-                    raise TypeError("Malformed AXIS_PTS '{}', neither DIST_OP nor SHIFT_OP specified.".format(ap))
-                if dist_op is not None:
-                    raw_values = fix_axis_par_dist(offset, dist_op, no_axis_points)
-                else:
-                    raw_values = fix_axis_par(offset, shift_op, no_axis_points)
+        self._parameters["AXIS_PTS"].materialize()
+
+    def _load_axis_pt(self, name: str):
+        ap = AxisPts.get(self.session, name)
+        # mem_size = ap.total_allocated_memory
+        self.logger.debug("Processing AXIS_PTS '{}' @0x{:08x}".format(ap.name, ap.address))
+        rl_values = self.read_record_layout_values(ap, "x")
+        self.record_layout_correct_offsets(ap)
+        virtual = False
+        axis = ap.record_layout_components.axes("x")
+        paired = False
+        if "axisRescale" in axis:
+            category = "RES_AXIS"
+            paired = True
+            if "noRescale" in rl_values:
+                no_rescale_pairs = rl_values["noRescale"]
             else:
-                raise TypeError("Malformed AXIS_PTS '{}'.".format(ap))
-            if not virtual:
-                raw_values = self.read_nd_array(ap, "x", attr, count)
-                if index_incr == "INDEX_DECR":
-                    raw_values = raw_values[::-1]
-                    reversed_storage = True
-                else:
-                    reversed_storage = False
-            converted_values = self.int_to_physical(ap, raw_values)
-            unit = ap.compuMethod.refUnit
-            self._parameters["AXIS_PTS"][ap.name] = cmod.AxisPts(
-                name=ap.name,
-                comment=ap.longIdentifier,
-                category=category,
-                raw_values=raw_values,
-                converted_values=converted_values,
-                displayIdentifier=ap.displayIdentifier,
-                paired=paired,
-                unit=unit,
-                reversed_storage=reversed_storage,
-            )
+                no_rescale_pairs = axis["maxNumberOfRescalePairs"]
+            index_incr = axis["axisRescale"]["indexIncr"]
+            count = no_rescale_pairs * 2
+            attr = "axisRescale"
+        elif "axisPts" in axis:
+            category = "COM_AXIS"
+            if "noAxisPts" in rl_values:
+                no_axis_points = rl_values["noAxisPts"]
+            else:
+                no_axis_points = axis["maxAxisPoints"]
+            index_incr = axis["axisPts"]["indexIncr"]
+            count = no_axis_points
+            attr = "axisPts"
+        elif "offset" in axis:
+            category = "FIX_AXIS"
+            virtual = True  # Virtual / Calculated axis.
+            offset = rl_values.get("offset")
+            dist_op = rl_values.get("distOp")
+            shift_op = rl_values.get("shiftOp")
+            if "noAxisPts" in rl_values:
+                no_axis_points = rl_values["noAxisPts"]
+            else:
+                no_axis_points = axis["maxAxisPoints"]
+            if (dist_op or shift_op) is None:
+                raise TypeError("Malformed AXIS_PTS '{}', neither DIST_OP nor SHIFT_OP specified.".format(ap))
+            if dist_op is not None:
+                raw_values = fix_axis_par_dist(offset, dist_op, no_axis_points)
+            else:
+                raw_values = fix_axis_par(offset, shift_op, no_axis_points)
+        else:
+            raise TypeError("Malformed AXIS_PTS '{}'.".format(ap))
+        if not virtual:
+            raw_values = self.read_nd_array(ap, "x", attr, count)
+            if index_incr == "INDEX_DECR":
+                raw_values = raw_values[::-1]
+                reversed_storage = True
+            else:
+                reversed_storage = False
+        converted_values = self.int_to_physical(ap, raw_values)
+        unit = ap.compuMethod.refUnit
+        return cmod.AxisPts(
+            name=ap.name,
+            comment=ap.longIdentifier,
+            category=category,
+            raw_values=raw_values,
+            converted_values=converted_values,
+            displayIdentifier=ap.displayIdentifier,
+            paired=paired,
+            unit=unit,
+            reversed_storage=reversed_storage,
+        )
 
     def _load_curves(self):
         self._load_curves_and_maps("CURVE", 1)
@@ -565,167 +709,137 @@ class CalibrationData(AsamBaseType):
         self._load_curves_and_maps("CUBE_4", 4)
         self._load_curves_and_maps("CUBE_5", 5)
 
-    def _order_curves(self, curves):
-        """Remove forward references from CURVE list."""
-        curves = list(curves)[::1]  # Don't destroy the generator, make a copy.
-        curves_by_name = {c.name: (pos, c) for pos, c in enumerate(curves)}
-        while True:
-            ins_pos = 0
-            for curr_pos in range(len(curves)):
-                curve = curves[curr_pos]
-                axis_descr = curve.axisDescriptions[0]
-                if axis_descr.attribute == "CURVE_AXIS":
-                    if axis_descr.curveAxisRef.name in curves_by_name:
-                        ref_pos, ref_curve = curves_by_name.get(axis_descr.curveAxisRef.name)
-                        if ref_pos > curr_pos:
-                            # Swap
-                            t_curve = curves[ins_pos]
-                            curves[ins_pos] = curves[ref_pos]
-                            curves[ref_pos] = t_curve
-                            curves_by_name[curves[ins_pos].name] = (
-                                ins_pos,
-                                curves[ins_pos],
-                            )
-                            curves_by_name[curves[ref_pos].name] = (
-                                ref_pos,
-                                curves[ref_pos],
-                            )
-                            ins_pos += 1
-            if ins_pos == 0:
-                break  # No more swaps, we're done.
-        return curves
-
     def _load_curves_and_maps(self, category: str, num_axes: int):
-        characteristics = self.characteristics(category)
-        if num_axes == 1:
-            # CURVEs may reference other CURVEs, so some ordering is required.
-            characteristics = self._order_curves(characteristics)
-        for characteristic in characteristics:
-            self.logger.debug("Processing {} '{}' @0x{:08x}".format(category, characteristic.name, characteristic.address))
-
-            if characteristic.compuMethod != "NO_COMPU_METHOD":
-                characteristic_cm = characteristic.compuMethod.name
+        self._parameters[category].materialize()
+
+    def _load_curve_or_map(self, name: str, category: str, num_axes: int):
+        """Load CURVE, MAP, ...; referenced AXIS_PTS and CURVEs (CURVE_AXIS) are loaded on demand."""
+        characteristic = Characteristic.get(self.session, name)
+        self.logger.debug("Processing {} '{}' @0x{:08x}".format(category, characteristic.name, characteristic.address))
+
+        if characteristic.compuMethod != "NO_COMPU_METHOD":
+            characteristic_cm = characteristic.compuMethod.name
+        else:
+            characteristic_cm = "NO_COMPU_METHOD"
+        chr_cm = evaluator(self.session, characteristic_cm)
+        fnc_unit = chr_cm.unit
+        fnc_datatype = characteristic.record_layout_components.fncValues["datatype"]
+        self.record_layout_correct_offsets(characteristic)
+        num_func_values = 1
+        shape = []
+        axes = []
+        for axis_idx in range(num_axes):
+            axis_descr = characteristic.axisDescriptions[axis_idx]
+            axis_name = AXES[axis_idx]
+            maxAxisPoints = axis_descr.maxAxisPoints
+            axis_cm_name = "NO_COMPU_METHOD" if axis_descr.compuMethod == "NO_COMPU_METHOD" else axis_descr.compuMethod.name
+            axis_cm = evaluator(self.session, axis_cm_name)
+            axis_unit = axis_cm.unit
+            axis_attribute = axis_descr.attribute
+            axis = characteristic.record_layout_components.axes(axis_name)
+            fix_no_axis_pts = characteristic.deposit.fixNoAxisPts.get(axis_name)
+            rl_values = self.read_record_layout_values(characteristic, axis_name)
+            curve_axis_ref = None
+            axis_pts_ref = None
+            reversed_storage = False
+            flipper = []
+            if fix_no_axis_pts:
+                no_axis_points = fix_no_axis_pts
             else:
-                characteristic_cm = "NO_COMPU_METHOD"
-            chr_cm = CompuMethod.get(self.session, characteristic_cm)
-            fnc_unit = chr_cm.unit
-            fnc_datatype = characteristic.record_layout_components.fncValues["datatype"]
-            self.record_layout_correct_offsets(characteristic)
-            num_func_values = 1
-            shape = []
-            axes = []
-            for axis_idx in range(num_axes):
-                axis_descr = characteristic.axisDescriptions[axis_idx]
-                axis_name = AXES[axis_idx]
-                maxAxisPoints = axis_descr.maxAxisPoints
-                axis_cm_name = "NO_COMPU_METHOD" if axis_descr.compuMethod == "NO_COMPU_METHOD" else axis_descr.compuMethod.name
-                axis_cm = CompuMethod.get(self.session, axis_cm_name)
-                axis_unit = axis_cm.unit
-                axis_attribute = axis_descr.attribute
-                axis = characteristic.record_layout_components.axes(axis_name)
-                fix_no_axis_pts = characteristic.deposit.fixNoAxisPts.get(axis_name)
-                rl_values = self.read_record_layout_values(characteristic, axis_name)
-                curve_axis_ref = None
-                axis_pts_ref = None
-                reversed_storage = False
-                flipper = []
-                if fix_no_axis_pts:
-                    no_axis_points = fix_no_axis_pts
+                if "noAxisPts" in rl_values:
+                    no_axis_points = rl_values["noAxisPts"]
+                elif "noRescale" in rl_values:
+                    no_axis_points = rl_values["noRescale"]
                 else:
-                    if "noAxisPts" in rl_values:
-                        no_axis_points = rl_values["noAxisPts"]
-                    elif "noRescale" in rl_values:
-                        no_axis_points = rl_values["noRescale"]
-                    else:
-                        no_axis_points = maxAxisPoints
-                if axis_attribute == "FIX_AXIS":
-                    if axis_descr.fixAxisParDist:
-                        par_dist = axis_descr.fixAxisParDist
-                        raw_axis_values = fix_axis_par_dist(
-                            par_dist["offset"],
-                            par_dist["distance"],
-                            par_dist["numberapo"],
-                        )
-                    elif axis_descr.fixAxisParList:
-                        raw_axis_values = axis.fixAxisParList
-                    elif axis_descr.fixAxisPar:
-                        par = axis_descr.fixAxisPar
-                        raw_axis_values = fix_axis_par(par["offset"], par["shift"], par["numberapo"])
-                    no_axis_points = len(raw_axis_values)
-                    converted_axis_values = axis_cm.int_to_physical(raw_axis_values)
-                elif axis_attribute == "STD_AXIS":
-                    raw_axis_values = self.read_nd_array(characteristic, "x", "axisPts", no_axis_points)
-                    index_incr = axis["axisPts"]["indexIncr"]
-                    if index_incr == "INDEX_DECR":
-                        raw_axis_values = raw_axis_values[::-1]
-                        reversed_storage = True
-                    converted_axis_values = axis_cm.int_to_physical(raw_axis_values)
-                elif axis_attribute == "RES_AXIS":
-                    ref_obj = self._parameters["AXIS_PTS"][axis_descr.axisPtsRef.name]
-                    # no_axis_points = min(no_axis_points, len(ref_obj.raw_values) // 2)
-                    axis_pts_ref = axis_descr.axisPtsRef.name
-                    raw_axis_values = None
-                    converted_axis_values = None
-                    axis_unit = None
-                    no_axis_points = len(ref_obj.raw_values)
-                    reversed_storage = ref_obj.reversed_storage
-                elif axis_attribute == "CURVE_AXIS":
-                    ref_obj = self._parameters["CURVE"][axis_descr.curveAxisRef.name]
-                    curve_axis_ref = axis_descr.curveAxisRef.name
-                    raw_axis_values = None
-                    converted_axis_values = None
-                    axis_unit = None
-                    no_axis_points = len(ref_obj.raw_values)
-                    reversed_storage = ref_obj.axes[0].reversed_storage
-                elif axis_attribute == "COM_AXIS":
-                    ref_obj = self._parameters["AXIS_PTS"][axis_descr.axisPtsRef.name]
-                    axis_pts_ref = axis_descr.axisPtsRef.name
-                    raw_axis_values = None
-                    converted_axis_values = None
-                    axis_unit = None
-                    no_axis_points = len(ref_obj.raw_values)
-                    reversed_storage = ref_obj.reversed_storage
-                num_func_values *= no_axis_points
-                shape.append(no_axis_points)
-                if reversed_storage:
-                    flipper.append(axis_idx)
-                axes.append(
-                    cmod.AxisContainer(
-                        category=axis_attribute,
-                        unit=axis_unit,
-                        reversed_storage=reversed_storage,
-                        raw_values=raw_axis_values,
-                        converted_values=converted_axis_values,
-                        axis_pts_ref=axis_pts_ref,
-                        curve_axis_ref=curve_axis_ref,
+                    no_axis_points = maxAxisPoints
+            if axis_attribute == "FIX_AXIS":
+                if axis_descr.fixAxisParDist:
+                    par_dist = axis_descr.fixAxisParDist
+                    raw_axis_values = fix_axis_par_dist(
+                        par_dist["offset"],
+                        par_dist["distance"],
+                        par_dist["numberapo"],
                     )
+                elif axis_descr.fixAxisParList:
+                    raw_axis_values = axis.fixAxisParList
+                elif axis_descr.fixAxisPar:
+                    par = axis_descr.fixAxisPar
+                    raw_axis_values = fix_axis_par(par["offset"], par["shift"], par["numberapo"])
+                no_axis_points = len(raw_axis_values)
+                converted_axis_values = axis_cm.int_to_physical(raw_axis_values)
+            elif axis_attribute == "STD_AXIS":
+                raw_axis_values = self.read_nd_array(characteristic, "x", "axisPts", no_axis_points)
+                index_incr = axis["axisPts"]["indexIncr"]
+                if index_incr == "INDEX_DECR":
+                    raw_axis_values = raw_axis_values[::-1]
+                    reversed_storage = True
+                converted_axis_values = axis_cm.int_to_physical(raw_axis_values)
+            elif axis_attribute == "RES_AXIS":
+                ref_obj = self._parameters["AXIS_PTS"][axis_descr.axisPtsRef.name]
+                # no_axis_points = min(no_axis_points, len(ref_obj.raw_values) // 2)
+                axis_pts_ref = axis_descr.axisPtsRef.name
+                raw_axis_values = None
+                converted_axis_values = None
+                axis_unit = None
+                no_axis_points = len(ref_obj.raw_values)
+                reversed_storage = ref_obj.reversed_storage
+            elif axis_attribute == "CURVE_AXIS":
+                ref_obj = self._parameters["CURVE"][axis_descr.curveAxisRef.name]
+                curve_axis_ref = axis_descr.curveAxisRef.name
+                raw_axis_values = None
+                converted_axis_values = None
+                axis_unit = None
+                no_axis_points = len(ref_obj.raw_values)
+                reversed_storage = ref_obj.axes[0].reversed_storage
+            elif axis_attribute == "COM_AXIS":
+                ref_obj = self._parameters["AXIS_PTS"][axis_descr.axisPtsRef.name]
+                axis_pts_ref = axis_descr.axisPtsRef.name
+                raw_axis_values = None
+                converted_axis_values = None
+                axis_unit = None
+                no_axis_points = len(ref_obj.raw_values)
+                reversed_storage = ref_obj.reversed_storage
+            num_func_values *= no_axis_points
+            shape.append(no_axis_points)
+            if reversed_storage:
+                flipper.append(axis_idx)
+            axes.append(
+                cmod.AxisContainer(
+                    category=axis_attribute,
+                    unit=axis_unit,
+                    reversed_storage=reversed_storage,
+                    raw_values=raw_axis_values,
+                    converted_values=converted_axis_values,
+                    axis_pts_ref=axis_pts_ref,
+                    curve_axis_ref=curve_axis_ref,
                 )
-            length = num_func_values * TYPE_SIZES[fnc_datatype]
-            raw_values = self.image.read_ndarray(
-                addr=characteristic.address + characteristic.record_layout_components.fncValues["offset"],
-                length=length,
-                dtype=get_section_reader(
-                    characteristic.record_layout_components.fncValues["datatype"],
-                    self.byte_order(characteristic),
-                ),
-                shape=shape,
-                # order = order,
-                # bit_mask = characteristic.bitMask
-            )
-            if flipper:
-                raw_values = np.flip(raw_values, axis=flipper)
-            converted_values = chr_cm.int_to_physical(raw_values)
-            klass = cmod.get_calibration_class(category)
-            self._parameters["{}".format(category)][characteristic.name] = klass(
-                name=characteristic.name,
-                comment=characteristic.longIdentifier,
-                category=category,
-                displayIdentifier=characteristic.displayIdentifier,
-                raw_values=raw_values,
-                converted_values=converted_values,
-                fnc_unit=fnc_unit,
-                axes=axes,
             )
+        length = num_func_values * TYPE_SIZES[fnc_datatype]
+        raw_values = self.image.read_ndarray(
+            addr=characteristic.address + characteristic.record_layout_components.fncValues["offset"],
+            length=length,
+            dtype=get_section_reader(
+                characteristic.record_layout_components.fncValues["datatype"],
+                self.byte_order(characteristic),
+            ),
+            shape=shape,
+            # order = order,
+            # bit_mask = characteristic.bitMask
+        )
+        if flipper:
+            raw_values = np.flip(raw_values, axis=flipper)
+        converted_values = chr_cm.int_to_physical(raw_values)
+        klass = cmod.get_calibration_class(category)
+        return klass(
+            name=characteristic.name,
+            comment=characteristic.longIdentifier,
+            category=category,
+            displayIdentifier=characteristic.displayIdentifier,
+            raw_values=raw_values,
+            converted_values=converted_values,
+            fnc_unit=fnc_unit,
+            axes=axes,
+        )
 
     def record_layout_correct_offsets(self, obj):
         """ """
@@ -822,18 +936,31 @@ class CalibrationData(AsamBaseType):
         )
         return np_arr
 
+    @staticmethod
+    def _compu_method_name(characteristic):
+        return "NO_COMPU_METHOD" if characteristic.compuMethod == "NO_COMPU_METHOD" else characteristic.compuMethod.name
+
     def int_to_physical(self, characteristic, int_values):
         """ """
-        cm_name = "NO_COMPU_METHOD" if characteristic.compuMethod == "NO_COMPU_METHOD" else characteristic.compuMethod.name
-        cm = CompuMethod.get(self.session, cm_name)
-        return cm.int_to_physical(int_values)
+        return evaluator(self.session, self._compu_method_name(characteristic))(int_values)
 
     @property
     def image(self):
         return self._image
 
+    @image.setter
+    def image(self, image):
+        self._image = image
+        self._reset_parameters()  # Drop parameters decoded from the previous image.
+
     @property
     def parameters(self):
+        """Parameters by category (AXIS_PTS, VALUE, ...), decoded on first access.
+
+        Returns
+        -------
+        dict of `LazyParameters`
+        """
         return self._parameters
 
     def axis_points(self):
@@ -842,6 +969,9 @@ class CalibrationData(AsamBaseType):
         for a in axis_pts:
             yield AxisPts.get(self.session, a.name)
 
+    def _characteristic_names(self, category):
+        return [c.name for c in self.query(model.Characteristic.name).filter(model.Characteristic.type == category).all()]
+
     def characteristics(self, category):
         """ """
         query = self.query(model.Characteristic.name).filter(model.Characteristic.type == category)
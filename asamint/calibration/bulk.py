@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Vectorized access to memory images.
+
+`FlatImage` concatenates the sections of an `objutils.Image` into a single NumPy buffer,
+so many scalars of the same datatype can be fetched with one fancy-index read instead of
+one `Image.read_numeric` call each.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+import numpy as np
+
+from asamint.asam import get_np_dtype
+
+
+class FlatImage:
+    """Sections of an `objutils.Image` as one contiguous `uint8` buffer.
+
+    Parameters
+    ----------
+    image: `objutils.Image`
+    """
+
+    def __init__(self, image):
+        sections = sorted(image.sections, key=lambda s: s.start_address)
+        self.starts = np.array([s.start_address for s in sections], dtype=np.int64)
+        self.lengths = np.array([len(s.data) for s in sections], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.lengths)[:-1])).astype(np.int64)
+        self.buffer = np.frombuffer(b"".join(bytes(s.data) for s in sections), dtype=np.uint8)
+
+    def locate(self, addresses, size: int):
+        """Buffer offsets of `addresses`.
+
+        Returns
+        -------
+        tuple: (offsets, valid)
+            `valid` is False for addresses not completely contained in a single section.
+        """
+        addresses = np.asarray(addresses, dtype=np.int64)
+        idx = np.searchsorted(self.starts, addresses, side="right") - 1
+        valid = idx >= 0
+        idx = np.where(valid, idx, 0)
+        if len(self.starts):
+            valid &= addresses + size <= self.starts[idx] + self.lengths[idx]
+            offsets = self.offsets[idx] + addresses - self.starts[idx]
+        else:
+            valid[:] = False
+            offsets = np.zeros_like(addresses)
+        return offsets, valid
+
+    def gather(self, addresses, dtype):
+        """Read one value of `dtype` (NumPy dtype incl. byte order) at every address.
+
+        Returns
+        -------
+        tuple: (values, valid)
+            Values of invalid addresses are zero.
+        """
+        dtype = np.dtype(dtype)
+        offsets, valid = self.locate(addresses, dtype.itemsize)
+        index = np.where(valid, offsets, 0)[:, np.newaxis] + np.arange(dtype.itemsize)
+        if len(self.buffer) < dtype.itemsize:
+            return np.zeros(len(offsets), dtype=dtype), valid
+        raw = self.buffer[index]
+        raw[~valid] = 0
+        return raw.reshape(-1).view(dtype), valid
+
+
+def read_scalars(flat_image: FlatImage, addresses, datatype: str, byte_order, bit_masks=None):
+    """Read scalars of ASAM `datatype`, applying bit masks (and shifting out trailing zeros) like `_load_values`.
+
+    Parameters
+    ----------
+    flat_image: `FlatImage`
+
+    addresses: sequence of int
+
+    datatype: str
+        ASAM datatype, e.g. "UWORD".
+
+    byte_order: `asamint.asam.ByteOrder`
+
+    bit_masks: sequence of int or None
+        None (or 0) entries mean "no mask".
+
+    Returns
+    -------
+    tuple: (values, valid)
+    """
+    dtype = np.dtype(get_np_dtype(datatype, byte_order))
+    values, valid = flat_image.gather(addresses, dtype)
+    if bit_masks is None or not any(bit_masks):
+        return values, valid
+    if dtype.kind not in "iu":
+        raise TypeError("Bit masks require integer datatypes, got '{}'.".format(datatype))
+    unsigned = dtype.newbyteorder("=") if dtype.kind == "u" else np.dtype("u{}".format(dtype.itemsize))
+    masks = np.array([m or 0 for m in bit_masks], dtype=np.uint64)
+    has_mask = masks != 0
+    masked = values.astype(dtype.newbyteorder("=")).view(unsigned) & np.where(has_mask, masks, ~np.uint64(0)).astype(unsigned)
+    masked = masked.view(dtype.newbyteorder("="))  # Reinterpret masked bits (signed types), like `Section.read_numeric`.
+    lowest_bits = masks & (~masks + np.uint64(1))
+    shifts = np.where(has_mask, np.log2(np.where(has_mask, lowest_bits, 1)), 0).astype(masked.dtype)
+    return masked >> shifts, valid
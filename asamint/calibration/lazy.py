@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Lazily decoded calibration parameters.
+
+`LazyParameters` is the container of one parameter category (VALUE, CURVE, ...) of `CalibrationData`:
+names are known up front, but a parameter is decoded from the memory image only on first access
+and cached afterwards. Loaders may access other containers (AXIS_PTS, CURVE_AXIS references),
+so dependencies are decoded on demand, too.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections.abc import MutableMapping
+
+
+class LazyParameters(MutableMapping):
+    """dict-like container, values are decoded on first access.
+
+    Parameters
+    ----------
+    names: iterable of str
+        Parameter names, in iteration order.
+
+    loader: callable
+        name ==> decoded parameter
+    """
+
+    def __init__(self, names, loader):
+        self._names = list(names)
+        self._known = set(self._names)
+        self._loader = loader
+        self._values = {}
+        self._loading = set()
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        if name not in self._known:
+            raise KeyError(name)
+        if name in self._loading:
+            raise ValueError("Circular reference while loading '{}'.".format(name))
+        self._loading.add(name)
+        try:
+            value = self._loader(name)
+        finally:
+            self._loading.discard(name)
+        self._values[name] = value
+        return value
+
+    def __setitem__(self, name, value):
+        if name not in self._known:
+            self._known.add(name)
+            self._names.append(name)
+        self._values[name] = value
+
+    def __delitem__(self, name):
+        if name not in self._known:
+            raise KeyError(name)
+        self._known.discard(name)
+        self._names.remove(name)
+        self._values.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._known
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return "LazyParameters({} of {} loaded)".format(len(self._values), len(self._names))
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._values
+
+    def pending(self) -> list:
+        """Names not decoded yet."""
+        return [name for name in self._names if name not in self._values]
+
+    def materialize(self):
+        """Decode all parameters."""
+        for name in self._names:
+            self[name]
+        return self
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Decode calibration parameters in worker processes.
+
+The memory image is flattened (s. `FlatImage`) into a shared-memory buffer, so it's transferred
+to every worker once instead of being pickled with every task, and workers read it in place.
+Characteristics are split into dependency-respecting stages:
+
+1. AXIS_PTS
+2. CURVEs referenced by CURVE_AXIS (referenced ones before referencing ones)
+3. everything else
+
+Each stage is cut into batches, decoded by a pool of worker processes (every worker holds its own
+`CalibrationData` instance with its own A2L database session). Decoded AXIS_PTS / CURVEs a batch
+refers to are shipped with the batch. Results are merged in submission order, so the outcome
+doesn't depend on scheduling. VALUEs are decoded in the calling process by the grouped path
+(s. `CalibrationData._load_values`) while the workers are busy.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import math
+from multiprocessing import shared_memory
+
+import numpy as np
+from objutils import Image, Section
+from pya2l import DB
+import pya2l.model as model
+
+from asamint.asam import AsamBaseType
+from asamint.calibration.bulk import FlatImage
+
+ImageSpec = namedtuple("ImageSpec", "name starts lengths offsets")
+
+Batch = namedtuple("Batch", "category names")
+
+WORKER_CATEGORIES = ("VAL_BLK", "ASCII", "CURVE", "MAP", "CUBOID", "CUBE_4", "CUBE_5")
+
+
+class SharedImage:
+    """`objutils.Image` flattened into a shared-memory buffer.
+
+    Parameters
+    ----------
+    image: `objutils.Image`
+
+    Note
+    ----
+    Use as context manager, the shared memory is released on exit.
+    """
+
+    def __init__(self, image):
+        flat_image = FlatImage(image)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(flat_image.buffer.nbytes, 1))
+        np.ndarray(flat_image.buffer.shape, dtype=np.uint8, buffer=self.shm.buf)[:] = flat_image.buffer
+        self.spec = ImageSpec(
+            self.shm.name, flat_image.starts.tolist(), flat_image.lengths.tolist(), flat_image.offsets.tolist()
+        )
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SharedBytes:
+    """Read-only, bytes-like view of a section within a shared-memory segment.
+
+    Slicing returns `bytes` of just the requested range, so a worker never holds a private copy
+    of the whole image. No buffer is exported longer than a single read, so the segment can be
+    closed at any time.
+
+    Parameters
+    ----------
+    shm: `multiprocessing.shared_memory.SharedMemory`
+
+    offset: int
+
+    length: int
+    """
+
+    def __init__(self, shm, offset: int, length: int):
+        self.shm = shm
+        self.offset = offset
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, key):
+        with self.shm.buf[self.offset : self.offset + self.length] as view:
+            if isinstance(key, slice):
+                return view[key].tobytes()
+            return view[key]
+
+    def __bytes__(self) -> bytes:
+        return self[:]
+
+
+def attach_image(spec: ImageSpec):
+    """Re-create the `objutils.Image` from a `SharedImage`.
+
+    Sections refer to the shared memory (s. `SharedBytes`) instead of copying it, so the image is read-only;
+    the segment stays attached as long as the image lives (i.e. for the lifetime of a worker).
+    """
+    shm = shared_memory.SharedMemory(name=spec.name)
+    sections = []
+    for start, length, offset in zip(spec.starts, spec.lengths, spec.offsets):
+        section = Section(start_address=start)
+        section.data = SharedBytes(shm, offset, length)
+        sections.append(section)
+    return Image(sections=sections, join=False)
+
+
+def references(session):
+    """AXIS_PTS (COM_AXIS, RES_AXIS) and CURVE (CURVE_AXIS) references of all CHARACTERISTICs.
+
+    Returns
+    -------
+    dict: name ==> list of (category, referenced name)
+    """
+    result = {}
+    axis_pts = (
+        session.query(model.Characteristic.name, model.AxisPtsRef.axisPoints)
+        .join(model.AxisDescr, model.AxisDescr._characteristic_rid == model.Characteristic.rid)
+        .join(model.AxisPtsRef, model.AxisPtsRef._axis_descr_rid == model.AxisDescr.rid)
+    )
+    for name, ref in axis_pts.all():
+        result.setdefault(name, []).append(("AXIS_PTS", ref))
+    curves = (
+        session.query(model.Characteristic.name, model.CurveAxisRef.curveAxis)
+        .join(model.AxisDescr, model.AxisDescr._characteristic_rid == model.Characteristic.rid)
+        .join(model.CurveAxisRef, model.CurveAxisRef._axis_descr_rid == model.AxisDescr.rid)
+    )
+    for name, ref in curves.all():
+        result.setdefault(name, []).append(("CURVE", ref))
+    return result
+
+
+def curve_axis_levels(curve_names, refs):
+    """Group CURVEs referenced by CURVE_AXIS into levels, a level only depends on previous levels.
+
+    Returns
+    -------
+    list of lists of names
+    """
+    curve_names = set(curve_names)
+    referenced = {ref for deps in refs.values() for category, ref in deps if category == "CURVE" and ref in curve_names}
+    levels = {}
+
+    def level(name, depth=0):
+        if name not in levels:
+            deps = [ref for category, ref in refs.get(name, []) if category == "CURVE" and ref in referenced and ref != name]
+            if depth > len(referenced):
+                return 0  # Circular reference, reported by the decoder.
+            levels[name] = 1 + max((level(ref, depth + 1) for ref in deps), default=-1)
+        return levels[name]
+
+    result = []
+    for name in sorted(referenced):
+        idx = level(name)
+        while len(result) <= idx:
+            result.append([])
+        result[idx].append(name)
+    return result
+
+
+def batches(category: str, names, batch_size: int):
+    return [Batch(category, names[idx : idx + batch_size]) for idx in range(0, len(names), batch_size)]
+
+
+def stages(parameters, refs, batch_size: int):
+    """Dependency-respecting stages of `Batch`es of pending parameters.
+
+    Parameters
+    ----------
+    parameters: dict of `LazyParameters`
+        s. `CalibrationData.parameters`
+
+    refs: dict
+        s. `references`
+
+    batch_size: int
+    """
+    result = [batches("AXIS_PTS", parameters["AXIS_PTS"].pending(), batch_size)]
+    pending_curves = parameters["CURVE"].pending()
+    levels = curve_axis_levels(pending_curves, refs)
+    for level in levels:
+        result.append(batches("CURVE", [name for name in pending_curves if name in level], batch_size))
+    staged = {name for level in levels for name in level}
+    rest = []
+    for category in WORKER_CATEGORIES:
+        names = [name for name in parameters[category].pending() if not (category == "CURVE" and name in staged)]
+        rest.extend(batches(category, names, batch_size))
+    result.append(rest)
+    return [stage for stage in result if stage]
+
+
+_decoder = None
+
+
+def _init_worker(klass, project_config: dict, experiment_config: dict, image_spec: ImageSpec):
+    global _decoder
+
+    # Every worker needs its own database session (SQLite connections must not cross process boundaries).
+    AsamBaseType._session_obj = DB().open_create(project_config.get("A2L_FILE"), encoding=project_config.get("A2L_ENCODING"))
+    _decoder = klass(project_config, experiment_config)
+    _decoder.image = attach_image(image_spec)
+
+
+def _decode_batch(batch: Batch, dependencies: dict):
+    for category, values in dependencies.items():
+        for name, value in values.items():
+            _decoder.parameters[category][name] = value
+    return [(name, _decoder.parameters[batch.category][name]) for name in batch.names]
+
+
+def load_parallel(calibration_data, workers: int, batch_size: int = None, mp_context=None) -> None:
+    """Decode all pending parameters of `calibration_data` (s. `CalibrationData.load_hex`).
+
+    Parameters
+    ----------
+    calibration_data: `CalibrationData`
+
+    workers: int
+        Number of worker processes.
+
+    batch_size: int
+        Parameters per task; default: about four tasks per worker and stage.
+
+    mp_context:
+        `multiprocessing` context, s. `concurrent.futures.ProcessPoolExecutor`
+    """
+    parameters = calibration_data.parameters
+    refs = references(calibration_data.session)
+    if batch_size is None:
+        pending = sum(len(parameters[category].pending()) for category in ("AXIS_PTS",) + WORKER_CATEGORIES)
+        batch_size = max(1, math.ceil(pending / (workers * 4)))
+    plan = stages(parameters, refs, batch_size)
+    if not plan:
+        calibration_data._load_values()
+        return
+    with SharedImage(calibration_data.image) as shared_image:
+        initargs = (
+            type(calibration_data),
+            dict(calibration_data.project_config),
+            dict(calibration_data.experiment_config),
+            shared_image.spec,
+        )
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker, initargs=initargs) as pool:
+            for idx, stage in enumerate(plan):
+                futures = []
+                for batch in stage:
+                    dependencies = {}
+                    for name in batch.names:
+                        for category, ref in refs.get(name, []):
+                            if parameters[category].is_loaded(ref):
+                                dependencies.setdefault(category, {})[ref] = parameters[category][ref]
+                    futures.append((batch, pool.submit(_decode_batch, batch, dependencies)))
+                if idx == len(plan) - 1:
+                    calibration_data._load_values()  # Meanwhile...
+                for batch, future in futures:
+                    for name, value in future.result():
+                        parameters[batch.category][name] = value
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Upload helpers shared by the XCP-aware `CalibrationData` classes.
+
+`asamint.calibration.CalibrationData` and `asamint.xcp.CalibrationData` both fetch parameter
+memory from XCP slaves and share their transfer logic (cost model, gap merging, ...).
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+
+import os
+
+
+class XcpTransferMixin:
+    """Transfer methods for `AsamBaseType` subclasses.
+
+    Note
+    ----
+    Uses the project parameters `BUS_TRANSPORT`, `BUS_BITRATE`, `XCP_COMMAND_LATENCY`, `UPLOAD_GAP_MERGING`,
+    `INCREMENTAL_UPLOAD` and `IMAGE_STORE*`, and the attribute `a2l_epk` (s. `epk_from_a2l`).
+    """
+
+    def read_epk(self, xcp_master):
+        """Read EPK from ECU (at the address and with the length given by the A2L file).
+
+        Returns
+        -------
+        str or None
+        """
+        if not self.a2l_epk:
+            return None
+        epk_a2l, epk_addr = self.a2l_epk
+        xcp_master.setMta(epk_addr)
+        return xcp_master.pull(len(epk_a2l)).decode("ascii")
+
+    def transfer_cost_model(self, xcp_master):
+        from asamint.xcp.transfer import TransferCostModel  # asamint.xcp imports this module.
+
+        return TransferCostModel.from_slave_properties(
+            xcp_master.slaveProperties,
+            transport=self.project_config.get("BUS_TRANSPORT"),
+            bitrate=self.project_config.get("BUS_BITRATE"),
+            command_latency=self.project_config.get("XCP_COMMAND_LATENCY"),
+        )
+
+    def merge_upload_blocks(self, xcp_master, blocks):
+        """Bridge gaps between `blocks`, if uploading the unused bytes is cheaper than extra round trips."""
+        if not self.project_config.get("UPLOAD_GAP_MERGING"):
+            return blocks
+        merged, stats = self.transfer_cost_model(xcp_master).merge_blocks(blocks)
+        self.logger.info(
+            "Gap merging: {} -> {} blocks, {} round trip(s) saved ({} unused bytes fetched, ~{:.3f}s saved).".format(
+                len(blocks), stats.blocks, stats.round_trips_saved, stats.gap_bytes, stats.estimated_time_saved
+            )
+        )
+        return merged
+
+    def fetch_blocks(self, xcp_master, blocks, kind: str = "calparams"):
+        """Pull `blocks` from the slave.
+
+        With `IMAGE_STORE`, an image matching EPK and BUILD_CHECKSUMs of all blocks is served from disk.
+        With `INCREMENTAL_UPLOAD`, blocks whose BUILD_CHECKSUM matches the previous upload
+        (of the same `kind`, cached per A2L file) are not transferred again.
+        """
+        from asamint.xcp.image_store import ImageStore  # asamint.xcp imports this module.
+        from asamint.xcp.transfer import ReferenceImage, fingerprint, remote_checksums, upload_blocks
+
+        incremental = self.project_config.get("INCREMENTAL_UPLOAD")
+        a2l_hash = self.a2l_hash
+        reference = ReferenceImage(self.sub_dir("cache"), "{}_{}".format(kind, a2l_hash) if a2l_hash is not None else None)
+        remote = None
+        key = None
+        store = None
+        if self.project_config.get("IMAGE_STORE"):
+            store = ImageStore(
+                os.path.join(self.sub_dir("cache"), "images"),
+                self.project_config.get("IMAGE_STORE_MAX_ENTRIES"),
+                self.project_config.get("IMAGE_STORE_MAX_SIZE"),
+            )
+            remote = remote_checksums(xcp_master, blocks)
+            key = fingerprint(self.read_epk(xcp_master), blocks, remote)
+            stored = store.get(key)
+            if stored is not None and all((b.ext, b.address, b.length) in stored for b in blocks):
+                self.logger.info("Unchanged ECU contents, using stored image '{}'.".format(store.file_name(key)))
+                data = [stored[(b.ext, b.address, b.length)] for b in blocks]
+                reference.store(blocks, data)
+                return data
+        data, stats = upload_blocks(
+            xcp_master, blocks, reference.load() if incremental else None, self.transfer_cost_model(xcp_master), remote
+        )
+        if incremental:
+            self.logger.info(
+                "Incremental upload: {} of {} blocks unchanged, {} bytes skipped, {} bytes pulled.".format(
+                    stats.unchanged, stats.blocks, stats.bytes_skipped, stats.bytes_pulled
+                )
+            )
+        reference.store(blocks, data)
+        if store is not None:
+            store.put(key, blocks, data)
+        return data
@@ -1,10 +1,31 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+"""Memoized, vectorized COMPU_METHOD evaluators.
+
+Every COMPU_METHOD is resolved once per database session into a `CompuEvaluator`, a compiled
+callable that converts scalars as well as whole `numpy` arrays (no per-element Python calls):
+
+- IDENTICAL / NO_COMPU_METHOD, LINEAR, RAT_FUNC: NumPy arithmetic.
+- TAB_INTP: `numpy.interp`, default value outside of the table.
+- TAB_NOINTP, TAB_VERB (incl. COMPU_VTAB_RANGE): `numpy.searchsorted` based lookup.
+- FORM: the formula is translated into a NumPy expression and compiled to Python bytecode.
+
+Semantics follow `pya2l.functions`, but neither `scipy` nor `numexpr` are required; conversions
+not supported here (e.g. quadratic RAT_FUNCs) fall back to the `pya2l` evaluator.
+
+Usage
+-----
+
+.. code-block:: python
+
+    cm = evaluator(session, "CM_LINEAR")
+    physical = cm(raw_values)
+"""
 
 __copyright__ = """
    pySART - Simplified AUTOSAR-Toolkit for Python.
 
-   (C) 2020 by Christoph Schueler <cpu12.gems.googlemail.com>
+   (C) 2020-2022 by Christoph Schueler <cpu12.gems.googlemail.com>
 
    All Rights Reserved
 
@@ -26,125 +47,415 @@ __copyright__ = """
 """
 __author__ = "Christoph Schueler"
 
+import ast
+from logging import getLogger
+import re
+import threading
+import weakref
 
-from collections.abc import Mapping
-
-
-from pya2l import DB
+import numpy as np
+from pya2l.api.inspect import CompuMethod, CompuTab, CompuTabVerb, CompuTabVerbRanges, ModPar, get_legacy_formulas
 import pya2l.model as model
 
+NO_COMPU_METHOD = "NO_COMPU_METHOD"
+
+MATH_FUNCTIONS = {
+    "abs": np.abs,
+    "arccos": np.arccos,
+    "arcsin": np.arcsin,
+    "arctan": np.arctan,
+    "cos": np.cos,
+    "cosh": np.cosh,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "sin": np.sin,
+    "sinh": np.sinh,
+    "sqrt": np.sqrt,
+    "tan": np.tan,
+    "tanh": np.tanh,
+}
+
+FUNCTION_NAMES = re.compile(r"\b(abs|acos|asin|atan|arcos|cos|cosh|exp|log|log10|pow|sin|sinh|sqrt|tan|tanh)\b", re.IGNORECASE)
+RENAMES = {"acos": "arccos", "arcos": "arccos", "asin": "arcsin", "atan": "arctan"}
+HEX_INT = re.compile(r"0x[0-9a-fA-F]+")
+POW = re.compile(r"pow\s*\((?P<params>[^()]*?)\)")
+SYSC = re.compile(r"sysc\s*\((?P<param>.*?)\s*\)")
+
+
+def translate_formula(formula: str, system_constants=None, legacy: bool = False) -> str:
+    """Translate an ASAP2 FORM into a NumPy (Python) expression of `X` / `X1`.
 
-"""
-a2ldb_import [imex]
-
-"""
+    Parameters
+    ----------
+    formula: str
 
+    system_constants: dict
+        Values of `sysc(...)` references.
 
-class CompuMethods(Mapping):
-    """dict-like (non-modifiable) container for `COMPU_METHOD`s.
+    legacy: bool
+        Formula syntax before ASAM MCD-2 MC 1.6 (`^` is the power operator).
+    """
+    system_constants = system_constants or {}
+    result = FUNCTION_NAMES.sub(lambda m: RENAMES.get(m.group(0).lower(), m.group(0).lower()), formula)
+    if legacy:
+        result = result.replace("^", "**")
+        result = re.sub(r"\bxor\b", " != ", result, flags=re.IGNORECASE)
+    else:
+        result = re.sub(r"\s*&&\s*", " and ", result)
+        result = re.sub(r"\s*\|\|\s*", " or ", result)
+        result = re.sub(r"!(?!=)\s*", "not ", result)
+    result = HEX_INT.sub(lambda m: str(int(m.group(0), 16)), result)
+    while True:
+        match = POW.search(result)
+        if not match:
+            break
+        base, exponent = [p.strip() for p in match.group("params").split(",")]
+        result = "{}({} ** {}){}".format(result[: match.start()], base, exponent, result[match.end() :])
+    while True:
+        match = SYSC.search(result)
+        if not match:
+            break
+        value = system_constants[match.group("param").strip().strip("\"'")]
+        result = "{}({}){}".format(result[: match.start()], value, result[match.end() :])
+    return result.strip()
+
+
+def _finish(result, scalar: bool):
+    """Python scalars for scalar inputs, arrays otherwise."""
+    if scalar:
+        result = np.asarray(result)
+        return result.item() if result.dtype.kind != "O" else result[()]
+    return result
+
+
+class CompuEvaluator:
+    """Compiled COMPU_METHOD.
 
     Parameters
     ----------
-    session: `SQLAlchemy` session instance.
+    name: str
 
-    referenced: bool
-        Only include referenced `COMPU_METHOD`s.
-    """
+    conversionType: str
 
-    # IDENTICAL     -
-    # FORM          -
-    # LINEAR        -
-    # RAT_FUNC      -
-    # TAB_INTP      -
-    # TAB_NOINTP    -
-    # TAB_VERB      -
+    function: callable
+        array ==> array
 
-    """
-    0 = 1:1 conversion 0 0
-    1 = parametric, linear 0 2
-    2 = rational conversion formula 0 6
-    3 = algebraic conversion (MCD-2 MC text formula) 1 0
-    4 = value to value tabular look-up with interpolation 0 2 x n
-    5 = value to value tabular look-up without interpolation 0 2 x n
-    6 = value range to value tabular look-up 0 3 x n + 1
-    7 = value to text/scale conversion tabular look-up n + 1 n
-    8 = value range to text/scale conversion tabular look-up  n + 1 2 x n
-    9 = text to value tabular look-up n n + 1
-    10 = text to text tabular look-up (translation) 2 x n + 1 0
+    unit: str
+
+    format: str
+
+    Note
+    ----
+    Use `evaluator` to get (cached) instances.
     """
 
-    def __init__(self, session, referenced: bool = True):
-        if referenced:
-            conversions = (
-                session.query(model.Measurement.conversion).filter(model.Measurement.conversion != "NO_COMPU_METHOD").distinct()
-            )
-            self._compu_methods = {
-                item.name: item for item in session.query(model.CompuMethod).filter(model.CompuMethod.name.in_(conversions)).all()
-            }
-        else:
-            self._compu_methods = {item.name: item for item in session.query(model.CompuMethod).all()}
-        for cm in self._compu_methods.values():
-            conversionType = cm.conversionType
-            if conversionType == "IDENTICAL":
-                pass
-            elif conversionType == "FORM":
-                pass
-            elif conversionType == "LINEAR":
-                pass
-            elif conversionType == "RAT_FUNC":
-                pass
-            elif conversionType == "TAB_INTP":
-                pass
-            elif conversionType == "TAB_NOINTP":
-                pass
-            elif conversionType == "TAB_VERB":
-                pass
-        print(self._compu_methods)
-
-    def __getitem__(self, name):
-        return self._compu_methods[name]
-
-    def __iter__(self):
-        return iter(self._compu_methods)
-
-    def __len__(self):
-        return len(self._compu_methods)
-
-
-class Measurement:
-    """Container for Measurement-related data."""
-
-    def __init__(self, session, name):
-        self.session = session
-        self._meas = session.query(model.Measurement).filter(model.Measurement.name == name).first()
-
-
-def getCM(session, name):
-    if name != "NO_COMPU_METHOD":
-        cm = session.query(model.CompuMethod).filter(model.CompuMethod.name == name).first()
-        return cm
+    def __init__(self, name: str, conversionType: str, function, unit: str = None, format: str = None):
+        self.name = name
+        self.conversionType = conversionType
+        self.function = function
+        self.unit = unit
+        self.format = format
+
+    def __call__(self, values):
+        scalar = np.ndim(values) == 0
+        return _finish(self.function(np.asarray(values)), scalar)
+
+    int_to_physical = __call__
+
+    def __repr__(self):
+        return "CompuEvaluator(name={!r}, conversionType={!r})".format(self.name, self.conversionType)
+
+
+def _identical(values):
+    return np.array(values, copy=True)
+
+
+def _linear(a, b):
+    def function(values):
+        return a * values + b
+
+    return function
+
+
+def _rat_func(coeffs):
+    """Inverted RAT_FUNC (s. `pya2l.functions.RatFunc`); None if not invertible."""
+    a, b, c, d, e, f = (coeffs.a, coeffs.b, coeffs.c, coeffs.d, coeffs.e, coeffs.f)
+    p_order = np.poly1d([a, b, c]).order
+    q_order = np.poly1d([d, e, f]).order
+    if p_order == 1 and q_order == 0:
+        slope, offset = f / b, -(c / b)
+
+        def function(values):
+            return slope * values + offset
+
+        return function
+    elif p_order == 0 and q_order == 1:
+
+        def function(values):
+            return c / (e * values + f)
+
+        return function
+    return None
+
+
+def _interpolated_table(in_values, out_values, default):
+    order = np.argsort(in_values)
+    xs = np.asarray(in_values, dtype=float)[order]
+    ys = np.asarray(out_values, dtype=float)[order]
+    fill = np.nan if default is None else default
+
+    def function(values):
+        outside = (values < xs[0]) | (values > xs[-1])
+        if np.ndim(values) == 0 and outside:
+            return np.asarray(default, dtype=object)
+        return np.where(outside, fill, np.interp(values, xs, ys))
+
+    return function
+
+
+def _lookup_table(keys, outputs, default):
+    """Exact-match table lookup (keys are integers); `outputs` may be numbers or strings."""
+    order = np.argsort(keys, kind="stable")
+    keys = np.array([int(keys[i]) for i in order], dtype=float)
+    outputs = [outputs[i] for i in order]
+    numeric = all(isinstance(o, (int, float)) for o in outputs)
+    if numeric:
+        table = np.array(outputs + [np.nan if default is None else default], dtype=float)
     else:
-        return None
+        table = np.array(outputs + [default], dtype=object if default is None else None)
+    miss = len(keys)
+
+    def function(values):
+        pos = np.clip(np.searchsorted(keys, values), 0, max(miss - 1, 0))
+        hit = (keys[pos] == values) if miss else np.zeros(np.shape(values), dtype=bool)
+        if np.ndim(values) == 0 and not hit:
+            return np.asarray(default, dtype=object)
+        return table[np.where(hit, pos, miss)]
+
+    return function
+
+
+def _range_table(lower_values, upper_values, texts, default):
+    """COMPU_VTAB_RANGE lookup, ranges include both limits."""
+    order = np.argsort(lower_values, kind="stable")
+    lower = np.asarray(lower_values, dtype=float)[order]
+    upper = np.asarray(upper_values, dtype=float)[order]
+    table = np.array([texts[i] for i in order] + [default], dtype=object)
+    miss = len(lower)
+
+    def function(values):
+        pos = np.searchsorted(lower, values, side="right") - 1
+        idx = np.clip(pos, 0, max(miss - 1, 0))
+        hit = (pos >= 0) & (values <= upper[idx]) if miss else np.zeros(np.shape(values), dtype=bool)
+        return table[np.where(hit, idx, miss)]
+
+    return function
+
+
+def _integers(function):
+    """Bitwise operators on (float) arguments."""
+
+    def wrapper(*args):
+        return function(*(np.asarray(a).astype(np.int64) for a in args))
+
+    return wrapper
+
+
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+    ast.BitAnd: _integers(np.bitwise_and),
+    ast.BitOr: _integers(np.bitwise_or),
+    ast.BitXor: _integers(np.bitwise_xor),
+    ast.LShift: _integers(np.left_shift),
+    ast.RShift: _integers(np.right_shift),
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: np.positive,
+    ast.USub: np.negative,
+    ast.Not: np.logical_not,
+    ast.Invert: _integers(np.invert),
+}
+
+COMPARISON_OPERATORS = {
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+}
+
+BOOLEAN_OPERATORS = {ast.And: np.logical_and, ast.Or: np.logical_or}
+
+
+def _compile_node(node):
+    """Turn a whitelisted expression node into a function of `X`; anything else raises ValueError."""
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+    elif isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = node.value
+        return lambda x: value
+    elif isinstance(node, ast.Name) and node.id in ("X", "X1"):
+        return lambda x: x
+    elif isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        op = BINARY_OPERATORS[type(node.op)]
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda x: op(left(x), right(x))
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        op = UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda x: op(operand(x))
+    elif isinstance(node, ast.Compare) and all(type(op) in COMPARISON_OPERATORS for op in node.ops):
+        ops = [COMPARISON_OPERATORS[type(op)] for op in node.ops]
+        operands = [_compile_node(n) for n in [node.left] + node.comparators]
+
+        def compare(x):
+            values = [operand(x) for operand in operands]
+            result = ops[0](values[0], values[1])
+            for op, left, right in zip(ops[1:], values[1:], values[2:]):
+                result = np.logical_and(result, op(left, right))
+            return result
+
+        return compare
+    elif isinstance(node, ast.BoolOp) and type(node.op) in BOOLEAN_OPERATORS:
+        op = BOOLEAN_OPERATORS[type(node.op)]
+        operands = [_compile_node(n) for n in node.values]
+
+        def boolean(x):
+            result = operands[0](x)
+            for operand in operands[1:]:
+                result = op(result, operand(x))
+            return result
+
+        return boolean
+    elif (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in MATH_FUNCTIONS
+        and not node.keywords
+        and len(node.args) == 1
+    ):
+        function = MATH_FUNCTIONS[node.func.id]
+        argument = _compile_node(node.args[0])
+        return lambda x: function(argument(x))
+    raise ValueError("Unsupported element {!r} in formula.".format(ast.dump(node)))
+
+
+def _formula(name, expression):
+    """Compile a (translated) FORM without `eval`.
+
+    Only arithmetic, bitwise, comparison and logical operators, `MATH_FUNCTIONS`,
+    numeric constants and `X` / `X1` are allowed.
+
+    Raises
+    ------
+    ValueError
+        Syntax error or unsupported element.
+    """
+    try:
+        tree = ast.parse(expression, "<FORM {}>".format(name), "eval")
+        compiled = _compile_node(tree)
+    except (SyntaxError, ValueError) as e:
+        raise ValueError("FORM {!r}: {}".format(name, e)) from e
 
+    def function(values):
+        if values.dtype.kind in "iu":
+            values = values.astype(np.float64)  # Like numexpr: no integer overflows / truncations.
+        return compiled(values)
 
-db = DB()
-session = db.open_existing("ASAP2_Demo_V161")
-measurements = session.query(model.Measurement).order_by(model.Measurement.name).all()
+    return function
 
-cms = CompuMethods(session)
 
-for m in measurements:
-    print("{:48} {:12} 0x{:08x}".format(m.name, m.datatype, m.ecu_address.address))
-    # print("{:48} {:12} 0x{:08x} [{}]".format(m.name, m.datatype, m.ecu_address.address, m.conversion))
+def _fallback(session, name):
+    def function(values):
+        return CompuMethod.get(session, name).int_to_physical(values)
 
-conversions = session.query(model.Measurement.conversion).filter(model.Measurement.conversion != "NO_COMPU_METHOD").distinct()
-# print(conversions)
+    return function
 
 
-cm = session.query(model.CompuMethod).filter(model.CompuMethod.name.in_(conversions)).all()
-print("\n\n")
-for c in cm:
-    print(c)
+def compile_compu_method(session, name: str) -> CompuEvaluator:
+    """Resolve COMPU_METHOD `name` into a `CompuEvaluator` (uncached, s. `evaluator`).
 
-print("\n\n")
-print(list(cms.keys()))
+    Raises
+    ------
+    ValueError
+        COMPU_METHOD `name` does not exist.
+    """
+    if not name or name == NO_COMPU_METHOD:
+        return CompuEvaluator(NO_COMPU_METHOD, NO_COMPU_METHOD, _identical)
+    cm = session.query(model.CompuMethod).filter(model.CompuMethod.name == name).first()
+    if cm is None:
+        raise ValueError("COMPU_METHOD {!r} does not exist.".format(name))
+    cm_type = cm.conversionType
+    function = None
+    if cm_type in ("IDENTICAL", NO_COMPU_METHOD):
+        function = _identical
+    elif cm_type == "LINEAR":
+        function = _linear(cm.coeffs_linear.a, cm.coeffs_linear.b)
+    elif cm_type == "RAT_FUNC":
+        function = _rat_func(cm.coeffs)
+    elif cm_type in ("TAB_INTP", "TAB_NOINTP"):
+        tab = CompuTab.get(session, name=cm.compu_tab_ref.conversionTable)
+        if tab.interpolation:
+            function = _interpolated_table(tab.in_values, tab.out_values, tab.default_value)
+        else:
+            function = _lookup_table(tab.in_values, tab.out_values, tab.default_value)
+    elif cm_type == "TAB_VERB":
+        table_name = cm.compu_tab_ref.conversionTable
+        if session.query(model.CompuVtab).filter(model.CompuVtab.name == table_name).first() is not None:
+            tab = CompuTabVerb.get(session, name=table_name)
+            function = _lookup_table(tab.in_values, tab.text_values, tab.default_value)
+        else:
+            tab = CompuTabVerbRanges.get(session, name=table_name)
+            function = _range_table(tab.lower_values, tab.upper_values, tab.text_values, tab.default_value)
+    elif cm_type == "FORM":
+        system_constants = ModPar.get(session).systemConstants
+        expression = translate_formula(cm.formula.f_x, system_constants, get_legacy_formulas(session))
+        try:
+            function = _formula(name, expression)
+        except ValueError as e:
+            getLogger("compile_compu_method").warning("{}, using pya2l's evaluator.".format(e))
+    if function is None:
+        function = _fallback(session, name)  # Not compilable, use `pya2l`s evaluator.
+    return CompuEvaluator(name, cm_type, function, cm.unit, cm.format)
+
+
+_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+
+def evaluator(session, name: str) -> CompuEvaluator:
+    """Get the `CompuEvaluator` of COMPU_METHOD `name`, compiled at most once per `session`.
+
+    Parameters
+    ----------
+    session: SQLAlchemy session
+
+    name: str
+        COMPU_METHOD name, "NO_COMPU_METHOD" or None.
+    """
+    name = name or NO_COMPU_METHOD
+    with _cache_lock:
+        evaluators = _cache.setdefault(session, {})
+        result = evaluators.get(name)
+    if result is None:
+        result = compile_compu_method(session, name)
+        with _cache_lock:
+            result = evaluators.setdefault(name, result)
+    return result
+
+
+def clear_cache(session=None) -> None:
+    """Drop cached evaluators (of `session` or all)."""
+    with _cache_lock:
+        if session is None:
+            _cache.clear()
+        else:
+            _cache.pop(session, None)
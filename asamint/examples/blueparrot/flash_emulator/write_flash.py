@@ -27,11 +27,13 @@ __copyright__ = """
 
 from os.path import exists
 
-from create import create_example_hexfile
+from create import PAGE_SIZE, create_example_hexfile
 
 from objutils import load
 from pyxcp.cmdline import ArgumentParser
 
+from asamint.xcp.flash import DownloadJournal, PagedDownloader, paging_window
+
 HEX_FILE_NAME = "paged_flash.s28"
 
 if not exists(HEX_FILE_NAME):
@@ -42,15 +44,15 @@ hex_file = load("srec", HEX_FILE_NAME)
 
 def upload_file(xcp_master):
     print(end="\n")
-    for idx, sec in enumerate(hex_file, start=1):
-        address = 0x8000  # Paging window.
-        address_ext = (sec.start_address >> 16) - 0x10  # Calculate page number.
-        data = sec.data
-        # print(hex(address), address_ext, len(sec))
-        print("Writing page {:02d} of 32".format(idx), end="\r")
-        xcp_master.setMta(address, address_ext)
-        xcp_master.push(data)
-    print("OK, successfully written 32 pages.")
+    downloader = PagedDownloader(
+        xcp_master,
+        page_size=PAGE_SIZE,
+        address_mapper=paging_window(0x8000, page_shift=16, first_page=0x10),  # Page number ==> address extension.
+        journal=DownloadJournal("{}.journal".format(HEX_FILE_NAME)),
+        callback=lambda done, total: print("Writing page {:02d} of {}".format(done, total), end="\r"),
+    )
+    stats = downloader.download(hex_file)
+    print("OK, successfully written {} pages ({} resumed).".format(stats.pages, stats.resumed))
 
 
 def callout(master, args):
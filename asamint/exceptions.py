@@ -31,3 +31,15 @@ __copyright__ = """
 
 class FileFormatError(Exception):
     """Raised when something is wrong with the structure of the file."""
+
+
+class DaqResourceError(Exception):
+    """DAQ configuration exceeds bus bandwidth or slave resources."""
+
+
+class DownloadVerificationError(Exception):
+    """Memory contents don't match the downloaded data."""
+
+
+class ReplayMismatchError(Exception):
+    """Replayed session diverges from the recorded one."""
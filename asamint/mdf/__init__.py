@@ -31,9 +31,9 @@ import numpy as np
 from lxml.etree import Element, tostring
 
 from asammdf import MDF, Signal
-from pya2l.api import inspect
 
 from asamint.asam import AsamBaseType
+from asamint.compu import evaluator
 from asamint.utils.xml import create_elem
 
 
@@ -247,5 +247,4 @@ class MDFCreator(AsamBaseType):
                 name = cm_object.name
             else:
                 name = "NO_COMPU_METHOD"
-            calculator = inspect.CompuMethod(self.session, name)
-            return calculator.int_to_physical(internal_values)
+            return evaluator(self.session, name)(internal_values)
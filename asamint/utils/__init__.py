@@ -50,6 +50,14 @@ def sha1_digest(x: str) -> str:
     return hashlib.sha1(x.encode("utf8")).hexdigest()
 
 
+def sha1_file_digest(file_name: str, block_size: int = 1024 * 1024) -> str:
+    sha = hashlib.sha1()
+    with open(file_name, "rb") as inf:
+        for block in iter(lambda: inf.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
 def replace_non_c_char(s: str) -> str:
     return re.sub(r"[^.a-zA-Z0-9_]", "_", s)
 
@@ -119,6 +127,7 @@ def cond_create_directories():
         "measurements",
         "parameters",
         "hexfiles",
+        "cache",
     ]  # Directory names could be configurable.
     for d in SUB_DIRS:
         if not os.access(d, os.F_OK):
@@ -27,73 +27,120 @@ __copyright__ = """
 """
 
 from collections import defaultdict, namedtuple
-from itertools import groupby
-from operator import attrgetter
 
-from sortedcontainers import SortedListWithKey
+import numpy as np
 
 
-def sort_by_address_and_ext(e):
-    return (
-        e[0].ext,
-        e[0].address,
-    )
+OdtEntry = namedtuple("OdtEntry", "odt_idx, odt_entry_idx, offset")
 
+ODT_LOCATION_DTYPE = np.dtype([("odt_idx", np.int32), ("odt_entry_idx", np.int32), ("offset", np.int64)])
 
-OdtEntry = namedtuple("OdtEntry", "odt_idx, odt_entry_idx, offset")
+EXT_SHIFT = 40  # (ext, address) pairs are combined into a single int64 key.
 
 
 class DaqList:
-    """ """
+    """Locate MEASUREMENTs within the ODTs of a DAQ list.
+
+    Parameters
+    ----------
+    odts: list of lists
+        ODT entries (having `address`, `length` and `ext` attributes).
+
+    measurement_summary: list of tuples
+        (name, address, ext, datatype, size, compu method name), resolved to `locations`.
+    """
 
     def __init__(self, odts, measurement_summary):
         self.odts = odts
         self.measurement_summary = measurement_summary
-        adl = SortedListWithKey(key=sort_by_address_and_ext)
+        starts = []
+        ends = []
+        odt_indices = []
+        entry_indices = []
         for odt_idx, odt in enumerate(odts):
             for odt_entry_idx, odt_entry in enumerate(odt):
-                adl.add((odt_entry, odt_idx, odt_entry_idx))
-        # print(adl)
-        self.adl = adl
-        flo = []
-        for name, address, ext, datatype, typesize, cm in measurement_summary:
-            res = self.find(address, ext)
-            print(name, hex(address), datatype, typesize, cm, res)
-            flo.append((name, hex(address), datatype, typesize, cm, res))
+                key = (odt_entry.ext or 0) << EXT_SHIFT | odt_entry.address
+                starts.append(key)
+                ends.append(key + odt_entry.length)
+                odt_indices.append(odt_idx)
+                entry_indices.append(odt_entry_idx)
+        order = np.argsort(np.asarray(starts, dtype=np.int64), kind="stable")
+        self._starts = np.asarray(starts, dtype=np.int64)[order]
+        self._ends = np.asarray(ends, dtype=np.int64)[order]
+        self._odt_indices = np.asarray(odt_indices, dtype=np.int32)[order]
+        self._entry_indices = np.asarray(entry_indices, dtype=np.int32)[order]
+        self.locations = self.resolve(
+            [address for _, address, _, _, _, _ in measurement_summary],
+            [ext for _, _, ext, _, _, _ in measurement_summary],
+        )
+
+    def resolve(self, addresses, exts=None) -> np.ndarray:
+        """Vectorized lookup of ODT entries containing `addresses`.
+
+        Parameters
+        ----------
+        addresses: array-like
+
+        exts: array-like
+            Address extensions (default 0).
+
+        Returns
+        -------
+        `np.ndarray` of `ODT_LOCATION_DTYPE`
+            `odt_idx`, `odt_entry_idx` and `offset` within the entry; all -1 if not found.
+        """
+        addresses = np.asarray(addresses, dtype=np.int64)
+        if exts is None:
+            exts = np.zeros_like(addresses)
+        else:
+            exts = np.asarray([e or 0 for e in exts], dtype=np.int64)
+        keys = (exts << EXT_SHIFT) | addresses
+        result = np.full(len(keys), -1, dtype=ODT_LOCATION_DTYPE)
+        if not len(self._starts) or not len(keys):
+            return result
+        idx = np.searchsorted(self._starts, keys, side="right") - 1
+        valid = idx >= 0
+        clipped = np.where(valid, idx, 0)
+        found = valid & (keys < self._ends[clipped])
+        result["odt_idx"][found] = self._odt_indices[clipped[found]]
+        result["odt_entry_idx"][found] = self._entry_indices[clipped[found]]
+        result["offset"][found] = keys[found] - self._starts[clipped[found]]
+        return result
 
     def find(self, address, ext=0):
-        """ """
-        last_idx = len(self.adl) - 1
-        idx = self.adl.bisect_key((ext, address)) - 1
-        if idx < 0 or idx > last_idx:
+        """
+        Returns
+        -------
+        tuple: (odt_idx, odt_entry_idx, offset) or None.
+        """
+        (location,) = self.resolve([address], [ext])
+        if location["odt_idx"] < 0:
             return None
-        else:
-            entry, odt_idx, odt_entry_idx = self.adl[idx]
-            if entry.ext != ext:
-                return None
-            if entry.address <= address < entry.address + entry.length:
-                offset = address - entry.address
-                return (odt_idx, odt_entry_idx, offset)
-            else:
-                return None
+        return (int(location["odt_idx"]), int(location["odt_entry_idx"]), int(location["offset"]))
 
 
 class McObject:
     """Measurement and Calibration objects have an address and a length.
 
     Used as input for optimization algorithms.
+
+    `ext` is the address extension (segment / page), objects with different
+    extensions never share a memory block.
     """
 
-    def __init__(self, name="", address=0, length=0):
+    def __init__(self, name="", address=0, length=0, ext=0):
         self.name = name
         self.address = address
         self.length = length
+        self.ext = ext or 0
 
     def __repr__(self):
-        return 'McObject(name = "{}", address = 0x{:08x}, length = {})'.format(self.name, self.address, self.length)
+        return 'McObject(name = "{}", address = 0x{:08x}, length = {}, ext = {})'.format(
+            self.name, self.address, self.length, self.ext
+        )
 
     def __eq__(self, other):
-        return self.address == other.address and self.length == other.length
+        return self.address == other.address and self.length == other.length and self.ext == getattr(other, "ext", 0)
 
     def __contains__(self, address):
         return self.address <= address < self.address + self.length
@@ -105,44 +152,127 @@ class McObject:
             return address - self.address
 
 
+class ContinuousBlocks:
+    """Result of `coalesce_blocks`.
+
+    Blocks are kept as compact arrays (`ext`, `address`, `length`), `McObject`s are
+    only created on access.
+
+    `block_index` maps every input object (in input order) to the block containing it.
+    """
+
+    def __init__(self, ext, address, length, block_index):
+        self.ext = ext
+        self.address = address
+        self.length = length
+        self.block_index = block_index
+
+    def __len__(self):
+        return len(self.address)
+
+    def __getitem__(self, idx):
+        return McObject(address=int(self.address[idx]), length=int(self.length[idx]), ext=int(self.ext[idx]))
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def total_length(self) -> int:
+        return int(self.length.sum())
+
+    def to_list(self):
+        return [
+            McObject(address=address, length=length, ext=ext)
+            for ext, address, length in zip(self.ext.tolist(), self.address.tolist(), self.length.tolist())
+        ]
+
+
+def coalesce_blocks(addresses, lengths, exts=None, max_gap: int = 0, max_length: int = None) -> ContinuousBlocks:
+    """Merge (possibly overlapping) memory objects into continuous blocks.
+
+    Sorting is O(n log n), merging is done vectorized by comparing every start address
+    with the cumulative maximum of the preceding end addresses.
+
+    Parameters
+    ----------
+    addresses: array-like
+
+    lengths: array-like
+
+    exts: array-like
+        Address extensions, objects of different extensions are never merged.
+
+    max_gap: int
+        Objects separated by up to `max_gap` unused bytes are merged.
+
+    max_length: int
+        Blocks are split (greedily, at object boundaries) to not exceed `max_length`;
+        objects larger than `max_length` form blocks on their own.
+
+    Returns
+    -------
+    `ContinuousBlocks`
+        Sorted by (ext, address).
+    """
+    addresses = np.asarray(addresses, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    exts = np.zeros_like(addresses) if exts is None else np.asarray(exts, dtype=np.int64)
+    count = len(addresses)
+    if count == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return ContinuousBlocks(empty, empty, empty, empty)
+    order = np.lexsort((addresses, exts))
+    ext_s = exts[order]
+    start_s = addresses[order]
+    end_s = start_s + lengths[order]
+    key_start = (ext_s << EXT_SHIFT) | start_s
+    run_end = np.maximum.accumulate((ext_s << EXT_SHIFT) | end_s)
+    new_block = np.empty(count, dtype=bool)
+    new_block[0] = True
+    new_block[1:] = key_start[1:] > run_end[:-1] + max_gap
+    if max_length is not None:
+        first = np.flatnonzero(new_block)
+        block_end = np.maximum.reduceat(end_s, first)
+        for idx in np.flatnonzero(block_end - start_s[first] > max_length):
+            lo = first[idx]
+            hi = first[idx + 1] if idx + 1 < len(first) else count
+            block_start, current_end = start_s[lo], end_s[lo]
+            for item in range(lo + 1, hi):
+                end = max(current_end, end_s[item])
+                if end - block_start <= max_length:
+                    current_end = end
+                else:
+                    new_block[item] = True
+                    block_start, current_end = start_s[item], end_s[item]
+    first = np.flatnonzero(new_block)
+    block_ids = np.cumsum(new_block) - 1
+    block_index = np.empty(count, dtype=np.int64)
+    block_index[order] = block_ids
+    block_start = start_s[first]
+    return ContinuousBlocks(ext_s[first], block_start, np.maximum.reduceat(end_s, first) - block_start, block_index)
+
+
 def make_continuous_blocks(chunks, upper_bound=None, upper_bound_initial=None):
     """Try to make continous blocks from a list of small, unordered `chunks`.
 
+    Chunks are merged per address extension, `upper_bound` applies to every block.
+
     Parameters
     ----------
     chunks: list of `McObject`
 
     Returns
     -------
-    sorted list of `McObject`
+    list of `McObject`
+        Sorted by (ext, address).
     """
-
-    # Objects can share addresses, for instance MEASUREMENTs with different COMPU_METHODs.
-    values = []
-    # 1. Groupy by address.
-    for key, value in groupby(sorted(chunks, key=attrgetter("address")), key=attrgetter("address")):
-        # 2. Pick the largest one.
-        values.append(max(value, key=attrgetter("length")))
-    result_sections = []
-    last_section = None
-    while values:
-        section = values.pop(0)
-        if last_section and section.address <= last_section.address + last_section.length:
-            last_end = last_section.address + last_section.length - 1
-            current_end = section.address + section.length - 1
-            if last_end > section.address:
-                pass
-            else:
-                offset = current_end - last_end
-                if upper_bound:
-                    if last_section.length + offset <= upper_bound:
-                        last_section.length += offset
-                    else:
-                        result_sections.append(McObject(address=section.address, length=section.length))
-                else:
-                    last_section.length += offset
-        else:
-            # Create a new section.
-            result_sections.append(McObject(address=section.address, length=section.length))
-        last_section = result_sections[-1]
-    return result_sections
+    if not chunks:
+        return []
+    blocks = coalesce_blocks(
+        [c.address for c in chunks],
+        [c.length for c in chunks],
+        [c.ext for c in chunks],
+        max_length=upper_bound or None,
+    )
+    return blocks.to_list()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Constraint-aware packing of memory blocks into ODTs.
+
+In contrast to `binpacking.first_fit_decreasing`, which treats items as opaque lengths,
+the following DAQ resource constraints are respected:
+
+- `MAX_ODT_ENTRY_SIZE_DAQ`: blocks are represented by as many ODT entries as required.
+- `GRANULARITY_ODT_ENTRY_SIZE_DAQ`: entries are aligned and sized to a multiple of granularity.
+- Address extensions: if the slave requires the same address extension for all entries of an ODT,
+  blocks are packed per address extension.
+- Large contiguous blocks may be split across ODTs (optionally only at given split points,
+  e.g. signal boundaries) to fill up residual capacities.
+
+The goal is to minimize the number of ODTs (i.e. per-frame overhead on the bus),
+as a secondary goal the number of ODT entries.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+import bisect
+from collections import defaultdict, namedtuple
+from itertools import groupby
+from operator import attrgetter
+
+from asamint.utils.optimize.binpacking import Bin
+
+
+OdtItem = namedtuple("OdtItem", "address length ext")
+
+MAX_ODT_ENTRIES = 255
+EXACT_NODE_LIMIT = 200000
+
+
+def _num_entries(length: int, max_entry_size: int) -> int:
+    return -(-length // max_entry_size)
+
+
+def align_items(items, granularity: int = 1):
+    """Align blocks to `granularity` and merge overlapping / adjacent blocks per address extension.
+
+    Parameters
+    ----------
+    items: iterable
+        Objects having `address`, `length` and optionally `ext` attributes (e.g. `McObject`).
+
+    Returns
+    -------
+    list of `OdtItem`
+        Sorted by (ext, address).
+    """
+    aligned = []
+    for item in items:
+        ext = getattr(item, "ext", 0) or 0
+        start = item.address - (item.address % granularity)
+        end = item.address + item.length
+        end += -end % granularity
+        aligned.append(OdtItem(start, end - start, ext))
+    result = []
+    for _, group in groupby(sorted(aligned, key=attrgetter("ext", "address")), key=attrgetter("ext")):
+        current = None
+        for item in group:
+            if current and item.address <= current.address + current.length:
+                end = max(current.address + current.length, item.address + item.length)
+                current = current._replace(length=end - current.address)
+            else:
+                if current:
+                    result.append(current)
+                current = item
+        if current:
+            result.append(current)
+    return result
+
+
+class _Splitter:
+    """Find permitted split positions within blocks."""
+
+    def __init__(self, granularity: int, split_points=None):
+        self.granularity = granularity
+        if split_points is None:
+            self.points = None
+        else:
+            points = defaultdict(set)
+            for ext, address in split_points:
+                if address % granularity == 0:
+                    points[ext].add(address)
+            self.points = {ext: sorted(addrs) for ext, addrs in points.items()}
+
+    def head_length(self, item: OdtItem, limit: int) -> int:
+        """Largest permitted head length <= `limit` (0, if there is none)."""
+        if limit >= item.length:
+            return item.length
+        if self.points is None:
+            return (limit // self.granularity) * self.granularity
+        points = self.points.get(item.ext, [])
+        idx = bisect.bisect_right(points, item.address + limit) - 1
+        if idx >= 0 and points[idx] > item.address:
+            return points[idx] - item.address
+        return 0
+
+
+class _PackedBin(Bin):
+    """`Bin` keeping track of the number of ODT entries."""
+
+    def __init__(self, length, max_entry_size):
+        super().__init__(length)
+        self.max_entry_size = max_entry_size
+        self.entry_count = 0
+
+    def entries_needed(self, length: int) -> int:
+        return _num_entries(length, self.max_entry_size)
+
+    def place(self, item: OdtItem):
+        address, remaining = item.address, item.length
+        while remaining:
+            size = min(remaining, self.max_entry_size)
+            self.append(OdtItem(address, size, item.ext))
+            address += size
+            remaining -= size
+        self.residual_capacity -= item.length
+        self.entry_count = len(self.entries)
+
+
+def _heuristic(items, bin_size, first_bin_size, max_entry_size, max_entries, splitter, split):
+    """First-fit-decreasing, splitting blocks into residual capacities if permitted."""
+    bins = []
+
+    def new_bin():
+        b = _PackedBin(first_bin_size if not bins else bin_size, max_entry_size)
+        bins.append(b)
+        return b
+
+    def fits(b, length):
+        return b.residual_capacity >= length and b.entry_count + b.entries_needed(length) <= max_entries
+
+    for item in sorted(items, key=lambda x: (-x.length, x.ext, x.address)):
+        while item.length:
+            for b in bins:
+                if fits(b, item.length):
+                    b.place(item)
+                    item = item._replace(length=0)
+                    break
+            else:
+                head = 0
+                if split:
+                    candidates = sorted(bins, key=lambda x: x.residual_capacity, reverse=True)
+                    for b in candidates:
+                        head = splitter.head_length(item, b.residual_capacity)
+                        if head and fits(b, head):
+                            break
+                        head = 0
+                if not head:
+                    b = new_bin()
+                    if not fits(b, item.length) and b.length < bin_size and item.length <= bin_size:
+                        b = new_bin()  # Doesn't fit into the (reduced) first ODT, but into a regular one.
+                    head = item.length if fits(b, item.length) else splitter.head_length(item, b.residual_capacity)
+                    if not head or not fits(b, head):
+                        raise ValueError(
+                            "Block at 0x{:08x} (ext {}) of length {} can't be placed into an ODT of size {}.".format(
+                                item.address, item.ext, item.length, b.length
+                            )
+                        )
+                b.place(item._replace(length=head))
+                item = OdtItem(item.address + head, item.length - head, item.ext)
+    return bins
+
+
+def _branch_and_bound(items, bin_size, first_bin_size, max_entry_size, max_entries, upper_bound):
+    """Exact bin-packing (no splitting) for small problems.
+
+    Returns
+    -------
+    list of lists of `OdtItem` or None, if no solution better than `upper_bound` was found.
+    """
+    items = sorted(items, key=lambda x: (-x.length, x.ext, x.address))
+    lengths = [i.length for i in items]
+    entries = [_num_entries(i.length, max_entry_size) for i in items]
+    suffix = [0] * (len(items) + 1)
+    for idx in range(len(items) - 1, -1, -1):
+        suffix[idx] = suffix[idx + 1] + lengths[idx]
+    best = {"bins": upper_bound, "assignment": None}
+    residuals = []
+    entry_counts = []
+    assignment = [0] * len(items)
+    nodes = [0]
+
+    def lower_bound(idx):
+        free = sum(residuals)
+        missing = suffix[idx] - free
+        if missing <= 0:
+            return len(residuals)
+        return len(residuals) + -(-missing // bin_size)
+
+    def search(idx):
+        nodes[0] += 1
+        if nodes[0] > EXACT_NODE_LIMIT:
+            return
+        if idx == len(items):
+            if len(residuals) < best["bins"]:
+                best["bins"] = len(residuals)
+                best["assignment"] = list(assignment)
+            return
+        if lower_bound(idx) >= best["bins"]:
+            return
+        seen = set()
+        for b in range(len(residuals)):
+            state = (residuals[b], entry_counts[b])
+            if state in seen:
+                continue  # Symmetric bins.
+            seen.add(state)
+            if residuals[b] >= lengths[idx] and entry_counts[b] + entries[idx] <= max_entries:
+                residuals[b] -= lengths[idx]
+                entry_counts[b] += entries[idx]
+                assignment[idx] = b
+                search(idx + 1)
+                residuals[b] += lengths[idx]
+                entry_counts[b] -= entries[idx]
+        capacity = first_bin_size if not residuals else bin_size
+        if len(residuals) + 1 < best["bins"] and capacity >= lengths[idx] and entries[idx] <= max_entries:
+            residuals.append(capacity - lengths[idx])
+            entry_counts.append(entries[idx])
+            assignment[idx] = len(residuals) - 1
+            search(idx + 1)
+            residuals.pop()
+            entry_counts.pop()
+
+    search(0)
+    if best["assignment"] is None:
+        return None
+    result = [[] for _ in range(best["bins"])]
+    for item, b in zip(items, best["assignment"]):
+        result[b].append(item)
+    return result
+
+
+def _entry_count(bins):
+    return sum(b.num_entries for b in bins)
+
+
+def _pack_group(items, bin_size, first_bin_size, max_entry_size, max_entries, splitter, split, exact, exact_limit):
+    bins = _heuristic(items, bin_size, first_bin_size, max_entry_size, max_entries, splitter, split)
+    if exact and bins:
+        # Exact search works on unsplit items; blocks exceeding an ODT have to be pre-split.
+        pieces = []
+        for item in items:
+            while item.length > bin_size:
+                head = splitter.head_length(item, bin_size)
+                pieces.append(item._replace(length=head))
+                item = OdtItem(item.address + head, item.length - head, item.ext)
+            pieces.append(item)
+        if len(pieces) <= exact_limit:
+            solution = _branch_and_bound(pieces, bin_size, first_bin_size, max_entry_size, max_entries, len(bins) + 1)
+            if solution is not None:
+                exact_bins = []
+                for idx, content in enumerate(solution):
+                    b = _PackedBin(first_bin_size if idx == 0 else bin_size, max_entry_size)
+                    for item in content:
+                        b.place(item)
+                    exact_bins.append(b)
+                if (len(exact_bins), _entry_count(exact_bins)) < (len(bins), _entry_count(bins)):
+                    bins = exact_bins
+    return bins
+
+
+def pack_odts(
+    items,
+    bin_size: int,
+    max_entry_size: int = None,
+    granularity: int = 1,
+    address_extension: str = "AE_DIFFERENT_WITHIN_ODT",
+    split: bool = True,
+    split_points=None,
+    max_entries: int = MAX_ODT_ENTRIES,
+    reserved: int = 0,
+    exact: bool = False,
+    exact_limit: int = 16,
+):
+    """Pack memory blocks into as few ODTs as possible.
+
+    Parameters
+    ----------
+    items: iterable
+        Objects having `address`, `length` and optionally `ext` attributes (e.g. `McObject`).
+
+    bin_size: int
+        ODT payload size, i.e. MAX_DTO minus identification field.
+
+    max_entry_size: int
+        MAX_ODT_ENTRY_SIZE_DAQ (None or 0: unlimited).
+
+    granularity: int
+        GRANULARITY_ODT_ENTRY_SIZE_DAQ.
+
+    address_extension: str
+        Address extension mode from DAQ key byte, e.g. "AE_SAME_FOR_ALL_ODT".
+
+    split: bool
+        Permit splitting blocks across ODTs.
+
+    split_points: iterable of (ext, address) or None
+        If not None, blocks are only split at these addresses (e.g. signal boundaries),
+        otherwise at any `granularity` aligned address.
+
+    max_entries: int
+        Max. number of entries per ODT.
+
+    reserved: int
+        Bytes not available in the first ODT (e.g. DAQ timestamp).
+
+    exact: bool
+        Additionally run an exact branch-and-bound search (no splitting) if the problem is small,
+        the better solution wins.
+
+    exact_limit: int
+        Max. number of blocks for exact search.
+
+    Returns
+    -------
+    list of `Bin`
+        Entries are `OdtItem`s, sorted by (ext, address).
+    """
+    max_entry_size = max_entry_size or bin_size
+    max_entry_size -= max_entry_size % granularity
+    if max_entry_size <= 0:
+        raise ValueError("MAX_ODT_ENTRY_SIZE must be at least granularity ({}).".format(granularity))
+    aligned = align_items(items, granularity)
+    if not aligned:
+        return []
+    splitter = _Splitter(granularity, split_points)
+    first_bin_size = bin_size - reserved
+    if address_extension in ("AE_SAME_FOR_ALL_ODT", "AE_SAME_FOR_ALL_DAQ"):
+        exts = sorted({i.ext for i in aligned})
+        if address_extension == "AE_SAME_FOR_ALL_DAQ" and len(exts) > 1:
+            raise ValueError("Slave requires the same address extension for all entries of a DAQ list.")
+        bins = []
+        for ext in exts:
+            group = [i for i in aligned if i.ext == ext]
+            bins.extend(
+                _pack_group(
+                    group,
+                    bin_size,
+                    bin_size if bins else first_bin_size,
+                    max_entry_size,
+                    max_entries,
+                    splitter,
+                    split,
+                    exact,
+                    exact_limit,
+                )
+            )
+    else:
+        bins = _pack_group(aligned, bin_size, first_bin_size, max_entry_size, max_entries, splitter, split, exact, exact_limit)
+    for b in bins:
+        b.entries.sort(key=attrgetter("ext", "address"))
+    return bins
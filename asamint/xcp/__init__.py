@@ -36,15 +36,32 @@ import time
 
 
 from asamint.asam import AsamBaseType, TYPE_SIZES
-from asamint.xcp.reco import Worker, LogConverter
+from asamint.a2l.groups import GroupResolver
+from asamint.a2l.layouts import LayoutExtractor
+from asamint.xcp.daq import (
+    DAQ_ID_FIELD_SIZE,
+    DAQ_TIMESTAMP_SIZE,
+    DaqEntry,
+    DaqLayoutCache,
+    DaqListSetup,
+    event_channels_from_a2l,
+    event_channels_from_daq_info,
+    max_write_daq_multiple_elements,
+    measurement_events_from_if_data,
+    resolve_event_channel,
+    split_points_from_summary,
+)
+from asamint.xcp.reco import Worker
+from asamint.xcp.pipeline import CompuMethodConverter, DaqMdfPipeline
+from asamint.xcp.planner import BandwidthPlanner
+from asamint.exceptions import DaqResourceError
+from asamint.calibration.transfer import XcpTransferMixin
 from asamint.cdf import CDFCreator
-from asamint.utils.optimize import DaqList, McObject, make_continuous_blocks, binpacking
+from asamint.utils.optimize import DaqList, McObject, make_continuous_blocks, odt_packing
 from asamint.utils import chunks, current_timestamp
+from pyxcp.types import XcpResponseError
 import pya2l.model as model
 from pya2l.api.inspect import (
-    AxisPts,
-    Characteristic,
-    Group,
     Function,
     ModPar,
     ModCommon,
@@ -52,12 +69,19 @@ from pya2l.api.inspect import (
 from objutils import dump, load, Image, Section
 
 
-class CalibrationData(AsamBaseType):
+class CalibrationData(XcpTransferMixin, AsamBaseType):
     """ """
 
     PROJECT_PARAMETER_MAP = {
         #                                   Type     Req'd   Default
-        "MDF_VERSION": (str, False, "4.10"),
+        "BUS_TRANSPORT": (str, False, "CAN"),  # "CAN", "CANFD", "ETH", "SXI".
+        "BUS_BITRATE": (int, False, 500000),
+        "UPLOAD_GAP_MERGING": (bool, False, True),  # Bridge gaps between blocks if cheaper than another request.
+        "XCP_COMMAND_LATENCY": (float, False, 0.001),  # Seconds per request/response round trip.
+        "INCREMENTAL_UPLOAD": (bool, False, False),  # Skip blocks whose BUILD_CHECKSUM matches the previous upload.
+        "IMAGE_STORE": (bool, False, False),  # Serve uploads from unchanged ECUs (same EPK and checksums) from disk.
+        "IMAGE_STORE_MAX_ENTRIES": (int, False, 20),
+        "IMAGE_STORE_MAX_SIZE": (int, False, 256 * 1024 * 1024),  # Bytes.
     }
 
     def on_init(self, project_config, experiment_config, *args, **kws):
@@ -75,9 +99,8 @@ class CalibrationData(AsamBaseType):
         """
         if not self.a2l_epk:
             return False
-        epk_a2l, epk_addr = self.a2l_epk
-        xcp_master.setMta(epk_addr)
-        epk_xcp = xcp_master.pull(len(epk_a2l)).decode("ascii")
+        epk_a2l, _ = self.a2l_epk
+        epk_xcp = self.read_epk(xcp_master)
         ok = epk_xcp == epk_a2l
         if not ok:
             self.logger.warn("EPK is invalid -- A2L: '{}' got '{}'.".format(epk_a2l, epk_xcp))
@@ -121,6 +144,19 @@ class CalibrationData(AsamBaseType):
             raise ValueError("")
         CDFCreator(self.project_config, self.experiment_config, img)
 
+    def parameter_blocks(self):
+        """Continuous memory blocks covering all CHARACTERISTICs and AXIS_PTS.
+
+        Returns
+        -------
+        list of `McObject`
+        """
+        result = []
+        layouts = LayoutExtractor(self.session, self.a2l_hash, self.sub_dir("cache")).layouts()
+        for layout in layouts.values():
+            result.append(McObject(layout.name, layout.address, layout.size, layout.ext))
+        return make_continuous_blocks(result)
+
     def upload_parameters(self, xcp_master, save_to_file: bool = True, hexfile_type: str = "ihex"):
         """
         Parameters
@@ -136,24 +172,11 @@ class CalibrationData(AsamBaseType):
             hexfile_type = hexfile_type.lower()
         if hexfile_type not in ("ihex", "srec"):
             raise ValueError("'file_type' must be either 'ihex' or 'srec'")
-        result = []
-        axis_pts = self.query(model.AxisPts).order_by(model.AxisPts.address).all()
-        for a in axis_pts:
-            ax = AxisPts.get(self.session, a.name)
-            mem_size = ax.total_allocated_memory
-            result.append(McObject(ax.name, ax.address, mem_size))
-        characteristics = self.query(model.Characteristic).order_by(model.Characteristic.type, model.Characteristic.address).all()
-        for c in characteristics:
-            chx = Characteristic.get(self.session, c.name)
-            mem_size = chx.total_allocated_memory
-            result.append(McObject(chx.name, chx.address, mem_size))
-        blocks = make_continuous_blocks(result)
+        blocks = self.merge_upload_blocks(xcp_master, self.parameter_blocks())
         total_size = functools.reduce(lambda a, s: s.length + a, blocks, 0)
         self.logger.info("Fetching a total of {:.3f} KBytes from XCP slave".format(total_size / 1024))
         sections = []
-        for block in blocks:
-            xcp_master.setMta(block.address)
-            mem = xcp_master.pull(block.length)
+        for block, mem in zip(blocks, self.fetch_blocks(xcp_master, blocks)):
             sections.append(Section(start_address=block.address, data=mem))
         img = Image(sections=sections, join=False)
         if save_to_file:
@@ -165,16 +188,6 @@ class CalibrationData(AsamBaseType):
         return img
 
 
-DaqEntry = namedtuple("DaqEntry", "bitoff length address ext")
-
-DAQ_ID_FIELD_SIZE = {
-    "IDF_ABS_ODT_NUMBER": 1,
-    "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_BYTE": 2,
-    "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD": 3,
-    "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD_ALIGNED": 4,
-}
-
-
 def associate_measurement_to_odt_entry():
     """ """
 
@@ -182,45 +195,295 @@ def associate_measurement_to_odt_entry():
 class XCPMeasurement(AsamBaseType):
     """ """
 
+    PROJECT_PARAMETER_MAP = {
+        #                               Type    Req'd   Default
+        "DAQ_LAYOUT_CACHE": (bool, False, True),
+        "WRITE_DAQ_MULTIPLE": (bool, False, True),
+        "DAQ_EXACT_PACKING": (bool, False, False),  # Additional branch-and-bound search for small DAQ lists.
+        "MDF_VERSION": (str, False, "4.10"),
+        "BUS_TRANSPORT": (str, False, "CAN"),  # "CAN", "CANFD", "ETH", "SXI".
+        "BUS_BITRATE": (int, False, 500000),
+        "MAX_BUS_LOAD": (float, False, 0.8),
+        "BUS_LOAD_POLICY": (str, False, "WARN"),  # "WARN", "REFUSE", "ADJUST" (prescalers).
+    }
+
+    EXPERIMENT_PARAMETER_MAP = {
+        #                               Type    Req'd   Default
+        "GROUPS": (list, False, []),
+        "EVENT_CHANNELS": (dict, False, {}),  # GROUP or MEASUREMENT name ==> event channel number or name.
+        "EVENT_PRESCALERS": (dict, False, {}),  # event channel number or name ==> prescaler.
+        "DEFAULT_EVENT_CHANNEL": (int, False, 3),
+    }
+
     def on_init(self, project_config, experiment_config, *args, **kws):
         self.loadConfig(project_config, experiment_config)
+        self.event_channels = event_channels_from_a2l(self.session)
 
-    def setup_groups(self, groups):
-        result = []
-        measurement_summary = []
-        for name in groups:
-            result.extend(self._collect_group(name, measurement_summary=measurement_summary))
-        blocks = make_continuous_blocks(result)
-        return blocks, measurement_summary
+    def setup_groups(self, groups=None):
+        """Collect measurements of `groups` and distribute them to event channels.
+
+        Parameters
+        ----------
+        groups: list of str
+            If None, `GROUPS` from experiment config is used.
 
-    def _collect_group(self, name: str, recursive: bool = True, measurement_summary: list = None):
-        """ """
+        Returns
+        -------
+        list of `DaqListSetup`
+            One entry per event channel, ordered by event channel number.
+        """
+        if groups is None:
+            groups = self.experiment_config.get("GROUPS")
+        by_event = defaultdict(lambda: ([], []))
+        seen = defaultdict(set)
+        for name in groups:
+            self._collect_group(name, event=self._configured_event(name), by_event=by_event, seen=seen)
         result = []
-        gr = Group(self.session, name)
-        for meas in gr.measurements:
-            if meas.is_virtual:
-                continue
-            measurement_summary.append(
-                (
-                    meas.name,
-                    meas.ecuAddress,
-                    meas.ecuAddressExtension,
-                    meas.datatype,
-                    TYPE_SIZES.get(meas.datatype),
-                    meas.compuMethod.name,
+        for event_channel in sorted(by_event):
+            objects, measurement_summary = by_event[event_channel]
+            result.append(
+                DaqListSetup(
+                    event_channel=event_channel,
+                    prescaler=self._configured_prescaler(event_channel),
+                    priority=0,
+                    blocks=make_continuous_blocks(objects),
+                    measurement_summary=measurement_summary,
                 )
             )
-            result.append(McObject(meas.name, meas.ecuAddress, TYPE_SIZES.get(meas.datatype)))
-        if recursive:
-            for sg in gr.subgroups:
-                result.extend(
-                    self._collect_group(
-                        sg.name,
-                        recursive=recursive,
-                        measurement_summary=measurement_summary,
+        return result
+
+    def _configured_event(self, name: str):
+        event = self.experiment_config.get("EVENT_CHANNELS").get(name)
+        return resolve_event_channel(event, self.event_channels)
+
+    def _configured_prescaler(self, event_channel: int) -> int:
+        prescalers = self.experiment_config.get("EVENT_PRESCALERS")
+        for number_or_name, prescaler in prescalers.items():
+            if resolve_event_channel(number_or_name, self.event_channels) == event_channel:
+                return prescaler
+        return 1
+
+    def _measurement_event(self, meas, group_event):
+        """Event channel precedence:
+
+        A2L FIXED_EVENT_LIST, MEASUREMENT config, GROUP config, A2L DEFAULT_EVENT_LIST, `DEFAULT_EVENT_CHANNEL`.
+
+        Parameters
+        ----------
+        meas: `asamint.a2l.groups.MeasurementInfo`
+        """
+        fixed_events, default_events = measurement_events_from_if_data(meas.if_data)
+        if fixed_events:
+            return fixed_events[0]
+        event = self._configured_event(meas.name)
+        if event is not None:
+            return event
+        if group_event is not None:
+            return group_event
+        if default_events:
+            return default_events[0]
+        return self.experiment_config.get("DEFAULT_EVENT_CHANNEL")
+
+    def _collect_group(self, name: str, recursive: bool = True, event=None, by_event: dict = None, seen: dict = None):
+        """Distribute MEASUREMENTs of GROUP `name` (and sub-groups) to `by_event`.
+
+        Configured sub-group events override `event` for the whole sub-tree.
+        MEASUREMENTs referenced more than once (`seen`: event channel ==> names) are acquired once per event channel.
+        """
+        if seen is None:
+            seen = defaultdict(set)
+        resolver = GroupResolver(self.session, self.a2l_hash)
+        group_events = {}
+        for path, measurements in resolver.walk(name, recursive):
+            if len(path) == 1:
+                group_event = event
+            else:
+                sg_event = self._configured_event(path[-1])
+                group_event = group_events[path[:-1]] if sg_event is None else sg_event
+            group_events[path] = group_event
+            for meas in measurements:
+                if meas.is_virtual:
+                    continue
+                event_channel = self._measurement_event(meas, group_event)
+                if meas.name in seen[event_channel]:
+                    continue
+                seen[event_channel].add(meas.name)
+                size = TYPE_SIZES.get(meas.datatype)
+                objects, measurement_summary = by_event[event_channel]
+                measurement_summary.append((meas.name, meas.address, meas.ext, meas.datatype, size, meas.compu_method))
+                objects.append(McObject(meas.name, meas.address, size, meas.ext))
+
+    def daq_layout(self, slave_properties, daq_info, groups=None):
+        """Distribute `groups` to DAQ lists and pack ODTs.
+
+        Layouts are cached (keyed by A2L hash, groups, event configuration, slave properties and packing mode),
+        so repeated measurements skip `setup_groups` and bin-packing entirely.
+
+        Returns
+        -------
+        list of `DaqListSetup`
+        """
+        if groups is None:
+            groups = self.experiment_config.get("GROUPS")
+        idf = daq_info["processor"]["keyByte"]["identificationField"]
+        address_extension = daq_info["processor"]["keyByte"]["addressExtension"]
+        resolution = daq_info["resolution"]
+        timestamp_size = DAQ_TIMESTAMP_SIZE.get(resolution["timestampMode"]["size"], 0)
+        max_dto = slave_properties["maxDto"]
+        use_cache = self.project_config.get("DAQ_LAYOUT_CACHE") and self.a2l_hash is not None
+        if use_cache:
+            cache = DaqLayoutCache(self.sub_dir("cache"))
+            key = DaqLayoutCache.make_key(
+                self.a2l_hash,
+                groups,
+                {
+                    "channels": self.experiment_config.get("EVENT_CHANNELS"),
+                    "prescalers": self.experiment_config.get("EVENT_PRESCALERS"),
+                    "default": self.experiment_config.get("DEFAULT_EVENT_CHANNEL"),
+                },
+                {
+                    "maxDto": max_dto,
+                    "byteOrder": slave_properties["byteOrder"],
+                    "identificationField": idf,
+                    "addressExtension": address_extension,
+                    "maxOdtEntrySizeDaq": resolution["maxOdtEntrySizeDaq"],
+                    "granularityOdtEntrySizeDaq": resolution["granularityOdtEntrySizeDaq"],
+                    "timestampSize": timestamp_size,
+                    "exactPacking": self.project_config.get("DAQ_EXACT_PACKING"),
+                },
+            )
+            daq_setups = cache.load(key)
+            if daq_setups is not None:
+                self.logger.info("Using cached DAQ layout '{}'.".format(cache.file_name(key)))
+                return daq_setups
+        bin_size = max_dto - DAQ_ID_FIELD_SIZE[idf]
+        daq_setups = []
+        for setup in self.setup_groups(groups):
+            bins = odt_packing.pack_odts(
+                items=setup.blocks,
+                bin_size=bin_size,
+                max_entry_size=resolution["maxOdtEntrySizeDaq"],
+                granularity=resolution["granularityOdtEntrySizeDaq"] or 1,
+                address_extension=address_extension,
+                split_points=split_points_from_summary(setup.measurement_summary),
+                reserved=timestamp_size,
+                exact=self.project_config.get("DAQ_EXACT_PACKING"),
+            )
+            odts = []
+            for bin in bins:
+                odts.append([DaqEntry(bitoff=0xFF, length=e.length, address=e.address, ext=e.ext) for e in bin.entries])
+            daq_setups.append(setup._replace(odts=odts))
+        if use_cache:
+            cache.store(key, daq_setups)
+        return daq_setups
+
+    def plan_bus_load(self, slave_properties, daq_info, daq_setups):
+        """Check DAQ layout against bus bandwidth and slave resources (s. `BUS_LOAD_POLICY`).
+
+        Returns
+        -------
+        list of `DaqListSetup`
+            Possibly with adjusted prescalers.
+
+        Raises
+        ------
+        DaqResourceError
+            Slave resources exceeded or bus load too high (policy "REFUSE").
+        """
+        event_channels = dict(event_channels_from_daq_info(daq_info))
+        event_channels.update(self.event_channels)
+        planner = BandwidthPlanner(
+            daq_info,
+            slave_properties["maxDto"],
+            event_channels,
+            transport=self.project_config.get("BUS_TRANSPORT"),
+            bitrate=self.project_config.get("BUS_BITRATE"),
+        )
+        plan = planner.estimate(daq_setups)
+        for daq_load in plan.daq_loads:
+            self.logger.info(
+                "DAQ list #{}: {:.1f} frames/s, {:.1f} bytes/s.".format(
+                    daq_load.daq_idx, daq_load.frames_per_second, daq_load.bytes_per_second
+                )
+            )
+        self.logger.info("Estimated bus load: {:.1%}.".format(plan.bus_load))
+        if plan.problems:
+            raise DaqResourceError(" ".join(plan.problems))
+        max_load = self.project_config.get("MAX_BUS_LOAD")
+        if plan.bus_load <= max_load:
+            return daq_setups
+        policy = self.project_config.get("BUS_LOAD_POLICY").upper()
+        prescalers = planner.suggest_prescalers(daq_setups, max_load)
+        if prescalers:
+            for daq_idx, event_channel in planner.suggest_event_assignments(daq_setups, prescalers).items():
+                self.logger.info(
+                    "DAQ list #{}: consider event channel {} instead of prescaler {}.".format(
+                        daq_idx, event_channel, prescalers[daq_idx]
                     )
                 )
-        return result
+        message = "Estimated bus load {:.1%} exceeds {:.1%}; suggested prescalers: {}.".format(
+            plan.bus_load, max_load, prescalers
+        )
+        if policy == "REFUSE" or (policy == "ADJUST" and prescalers is None):
+            raise DaqResourceError(message)
+        elif policy == "ADJUST":
+            self.logger.warning(message)
+            return [setup._replace(prescaler=prescalers[daq_idx]) for daq_idx, setup in enumerate(daq_setups)]
+        self.logger.warning(message)
+        return daq_setups
+
+    def write_daq_lists(self, xcp_master, daq_setups):
+        """Allocate DAQ lists and write ODT entries.
+
+        WRITE_DAQ_MULTIPLE is used (in batches sized to MAX_CTO) if enabled and supported by the slave,
+        otherwise every ODT entry requires a WRITE_DAQ round-trip.
+        """
+        # XCP requires ALLOC_DAQ, ALLOC_ODT, ALLOC_ODT_ENTRY in this order.
+        xcp_master.freeDaq()
+        xcp_master.allocDaq(len(daq_setups))
+        for daq_idx, setup in enumerate(daq_setups):
+            xcp_master.allocOdt(daq_idx, len(setup.odts))
+        for daq_idx, setup in enumerate(daq_setups):
+            for odt_idx, odt in enumerate(setup.odts):
+                xcp_master.allocOdtEntry(daq_idx, odt_idx, len(odt))
+
+        if self.project_config.get("WRITE_DAQ_MULTIPLE"):
+            max_elements = max_write_daq_multiple_elements(xcp_master.slaveProperties["maxCto"])
+        else:
+            max_elements = 0
+        requests = 0
+        for daq_idx, setup in enumerate(daq_setups):
+            for odt_idx, odt in enumerate(setup.odts):
+                xcp_master.setDaqPtr(daq_idx, odt_idx, 0)
+                if max_elements > 1:
+                    try:
+                        for requ in chunks(odt, max_elements):
+                            xcp_master.writeDaqMultiple(
+                                [
+                                    dict(
+                                        bitOffset=r.bitoff,
+                                        size=r.length,
+                                        address=r.address,
+                                        addressExt=r.ext,
+                                    )
+                                    for r in requ
+                                ]
+                            )
+                            requests += 1
+                        continue
+                    except XcpResponseError as e:
+                        self.logger.info("WRITE_DAQ_MULTIPLE failed ({}), falling back to WRITE_DAQ.".format(e))
+                        max_elements = 0
+                        xcp_master.setDaqPtr(daq_idx, odt_idx, 0)
+                for odt_entry in odt:
+                    xcp_master.writeDaq(
+                        odt_entry.bitoff,
+                        odt_entry.length,
+                        odt_entry.ext,
+                        odt_entry.address,
+                    )
+                    requests += 1
+        self.logger.info("DAQ lists written using {} request(s).".format(requests))
 
     def start_measurement(self, xcp_master, groups=None):
         self.uncompressed_size = 0
@@ -230,98 +493,32 @@ class XCPMeasurement(AsamBaseType):
 
         self.worker = Worker("rekorder")
 
-        blocks, measurement_summary = self.setup_groups(groups)
-
         slp = xcp_master.slaveProperties
-        max_dto = slp["maxDto"]
-        # byteOrder = slp["byteOrder"]
-
-        maxWriteDaqMultipleElements = slp.maxWriteDaqMultipleElements  # TODO: Optional service.
-        maxWriteDaqMultipleElements = 0  # Don't use for now
-
         daq_info = xcp_master.getDaqInfo()
-        daq_proc = daq_info["processor"]
-        idf = daq_proc["keyByte"]["identificationField"]
-        idf_size = DAQ_ID_FIELD_SIZE[idf]
-        bin_size = max_dto - idf_size
-        bins = binpacking.first_fit_decreasing(items=blocks, bin_size=bin_size)
-        # for bin in bins:
-        #    for entry in sorted(bin.entries, key = lambda e: e.address):
-        #        print(entry)
-        bin_count = len(bins)
-
-        # Create / Allocate DAQs
-        xcp_master.freeDaq()
-        xcp_master.allocDaq(1)
-        xcp_master.allocOdt(0, bin_count)
-        daqs = []
-        odts = []
-        for odt_num in range(bin_count):
-            bin = bins[odt_num]
-            xcp_master.allocOdtEntry(0, odt_num, bin.num_entries)
-            odt_entries = []
-            for odt_entry_num in range(bin.num_entries):
-                odt_entry = bin.entries[odt_entry_num]
-                odt_entries.append(
-                    DaqEntry(
-                        bitoff=0xFF,
-                        length=odt_entry.length,
-                        ext=0,
-                        address=odt_entry.address,
-                    )
-                )
-            odts.append(odt_entries)
-        daqs.append(odts)
-        # pprint(daqs, indent = 4)
-        # daq_list = DaqList(odts, measurement_summary)
 
-        """
-        daq_list.find(0xe10be)
-        daq_list.find(0xe10be, ext = 1)
-        daq_list.find(0x125438)
-        daq_list.find(0x125439)
-        daq_list.find(0x12543a)
-        #daq_list.find(0x125438, 3)
-        daq_list.find(0x1000, 0)
-        #daq_list.find(0x1000, 1)
-        daq_list.find(0x12543c)
-        daq_list.find(0x12543d)
-        """
+        daq_setups = self.daq_layout(slp, daq_info, groups)
+        daq_setups = self.plan_bus_load(slp, daq_info, daq_setups)
 
-        # Write DAQs.
-        for daq_idx, daq in enumerate(daqs):
-            for odt_idx, odt in enumerate(daq):
-                xcp_master.setDaqPtr(daq_idx, odt_idx, 0)
-                if maxWriteDaqMultipleElements:
-                    for requ in chunks(odt, maxWriteDaqMultipleElements):
-                        xcp_master.writeDaqMultiple(
-                            [
-                                dict(
-                                    bitOffset=r.bitoff,
-                                    size=r.length,
-                                    address=r.address,
-                                    addressExt=r.ext,
-                                )
-                                for r in requ
-                            ]
-                        )
-                else:
-                    for _, odt_entry in enumerate(odt):
-                        xcp_master.writeDaq(
-                            odt_entry.bitoff,
-                            odt_entry.length,
-                            odt_entry.ext,
-                            odt_entry.address,
-                        )
-
-        xcp_master.setDaqListMode(mode=0x10, daqListNumber=0, eventChannelNumber=3, prescaler=1, priority=0)
-        print("startStopDaqList #0", xcp_master.startStopDaqList(0x02, 0))
-        # xcp_master.setDaqListMode(0x10, 1, 2, 1, 0) # , 2)
-        # print("startStopDaqList #1", xcp_master.startStopDaqList(0x02, 1))
+        self.write_daq_lists(xcp_master, daq_setups)
+
+        for daq_idx, setup in enumerate(daq_setups):
+            self.logger.info(
+                "DAQ list #{}: event channel {}, prescaler {}, {} ODT(s).".format(
+                    daq_idx, setup.event_channel, setup.prescaler, len(setup.odts)
+                )
+            )
+            xcp_master.setDaqListMode(
+                mode=0x10,
+                daqListNumber=daq_idx,
+                eventChannelNumber=setup.event_channel,
+                prescaler=setup.prescaler,
+                priority=setup.priority,
+            )
+            xcp_master.startStopDaqList(0x02, daq_idx)  # Select.
 
         self.worker.start()
 
-        xcp_master.startStopSynch(0x01)
+        xcp_master.startStopSynch(0x01)  # Start selected.
 
         time.sleep(5.0 * 2)  # * 200
         xcp_master.startStopSynch(0x00)
@@ -329,9 +526,41 @@ class XCPMeasurement(AsamBaseType):
         self.worker.shutdown_event.set()
         self.worker.join()
 
-        lc = LogConverter(slp, daq_info, "rekorder")
-        lc.start()
-        lc.join()
+        self.convert_to_mdf("rekorder", slp, daq_info, daq_setups)
+
+    def convert_to_mdf(
+        self, log_file_name: str, slave_properties, daq_info, daq_setups, mdf_file_name: str = None, timestamps: bool = True
+    ):
+        """Convert a raw recording to MDF (physical values, one channel group per DAQ list).
+
+        Parameters
+        ----------
+        log_file_name: str
+            Don't specify extension.
+
+        mdf_file_name: str
+            If None, a name is generated from configuration.
+
+        timestamps: bool
+            Recording contains DAQ timestamps, otherwise host timestamps are used.
+
+        Returns
+        -------
+        str
+            Name of the MDF file.
+        """
+        if mdf_file_name is None:
+            mdf_file_name = os.path.join(self.sub_dir("measurements"), self.generate_filename(".mf4"))
+        pipeline = DaqMdfPipeline(
+            daq_setups,
+            daq_info,
+            byte_order=slave_properties["byteOrder"],
+            converter=CompuMethodConverter(self.session),
+            mdf_version=self.project_config.get("MDF_VERSION"),
+            timestamps=timestamps,
+        )
+        pipeline.run(log_file_name, mdf_file_name)
+        return mdf_file_name
 
     def wockser(self, catagory, *args):
         response, counter, length, timestamp = args
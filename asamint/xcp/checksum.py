@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Local implementation of the XCP BUILD_CHECKSUM algorithms.
+
+Checksums of many blocks are computed at once: additive checksums by segmented sums,
+CRC-16 variants by table lookups running over all blocks in parallel.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+import zlib
+
+import numpy as np
+
+# checksum type ==> (element size, modulus)
+ADDITIVE_ALGORITHMS = {
+    "XCP_ADD_11": (1, 2**8),
+    "XCP_ADD_12": (1, 2**16),
+    "XCP_ADD_14": (1, 2**32),
+    "XCP_ADD_22": (2, 2**16),
+    "XCP_ADD_24": (2, 2**32),
+    "XCP_ADD_44": (4, 2**32),
+}
+
+CRC_ALGORITHMS = ("XCP_CRC_16", "XCP_CRC_16_CITT", "XCP_CRC_32")
+
+ALGORITHMS = tuple(ADDITIVE_ALGORITHMS) + CRC_ALGORITHMS
+
+
+def _crc16_table(poly: int, reflected: bool):
+    table = np.empty(256, dtype=np.uint32)
+    for idx in range(256):
+        if reflected:
+            crc = idx
+            for _ in range(8):
+                crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        else:
+            crc = idx << 8
+            for _ in range(8):
+                crc = ((crc << 1) ^ poly if crc & 0x8000 else crc << 1) & 0xFFFF
+        table[idx] = crc
+    return table
+
+
+CRC16_TABLE = _crc16_table(0xA001, reflected=True)  # CRC-16/ARC: poly 0x8005, reflected, init 0x0000.
+CRC16_CCITT_TABLE = _crc16_table(0x1021, reflected=False)  # CRC-16/CCITT-FALSE: poly 0x1021, init 0xFFFF.
+
+
+def _additive(blocks, element_size: int, modulus: int, byte_order: str):
+    # Like pyxcp (and most slave implementations) incomplete trailing elements are zero-padded.
+    padded = [bytes(b) + bytes(-len(b) % element_size) for b in blocks]
+    counts = np.array([len(p) // element_size for p in padded], dtype=np.int64)
+    result = np.zeros(len(blocks), dtype=np.uint64)
+    if not counts.sum():
+        return result
+    dtype = np.dtype("u{}".format(element_size)).newbyteorder(byte_order)
+    values = np.frombuffer(b"".join(padded), dtype=dtype).astype(np.uint64)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    non_empty = counts > 0
+    result[non_empty] = np.add.reduceat(values, starts[non_empty]) % np.uint64(modulus)
+    return result
+
+
+def _crc16(blocks, table, init: int, reflected: bool):
+    lengths = np.array([len(b) for b in blocks], dtype=np.int64)
+    crc = np.full(len(blocks), init, dtype=np.uint32)
+    if not len(blocks) or not lengths.max():
+        return crc.astype(np.uint64)
+    matrix = np.zeros((len(blocks), lengths.max()), dtype=np.uint32)
+    for idx, block in enumerate(blocks):
+        matrix[idx, : len(block)] = np.frombuffer(bytes(block), dtype=np.uint8)
+    for column in range(matrix.shape[1]):
+        active = lengths > column
+        values = matrix[active, column]
+        current = crc[active]
+        if reflected:
+            crc[active] = (current >> 8) ^ table[(current ^ values) & 0xFF]
+        else:
+            crc[active] = ((current << 8) & 0xFFFF) ^ table[((current >> 8) ^ values) & 0xFF]
+    return crc.astype(np.uint64)
+
+
+def block_checksums(blocks, algorithm: str, byte_order: str = "<"):
+    """Checksums of a list of blocks, as computed by BUILD_CHECKSUM.
+
+    Parameters
+    ----------
+    blocks: list of bytes-like
+
+    algorithm: str
+        Checksum type as reported by BUILD_CHECKSUM, e.g. "XCP_CRC_16_CITT".
+
+    byte_order: str
+        "<" (Intel) or ">" (Motorola); relevant for XCP_ADD_22, XCP_ADD_24 and XCP_ADD_44.
+
+    Returns
+    -------
+    `numpy.ndarray` of uint64
+    """
+    if algorithm in ADDITIVE_ALGORITHMS:
+        element_size, modulus = ADDITIVE_ALGORITHMS[algorithm]
+        return _additive(blocks, element_size, modulus, byte_order)
+    elif algorithm == "XCP_CRC_16":
+        return _crc16(blocks, CRC16_TABLE, 0x0000, reflected=True)
+    elif algorithm == "XCP_CRC_16_CITT":
+        return _crc16(blocks, CRC16_CCITT_TABLE, 0xFFFF, reflected=False)
+    elif algorithm == "XCP_CRC_32":
+        return np.array([zlib.crc32(bytes(b)) & 0xFFFFFFFF for b in blocks], dtype=np.uint64)
+    raise ValueError("Unsupported checksum algorithm '{}'.".format(algorithm))
+
+
+def checksum(data, algorithm: str, byte_order: str = "<") -> int:
+    """Checksum of a single block."""
+    return int(block_checksums([data], algorithm, byte_order)[0])
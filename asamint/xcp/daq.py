@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""DAQ list / event channel configuration.
+
+Measurements are assigned to XCP event channels (rasters), one DAQ list is
+allocated per used event channel.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+import bisect
+from collections import defaultdict, namedtuple
+import hashlib
+import json
+import os
+import re
+
+import pya2l.model as model
+
+from asamint.utils.optimize import McObject
+
+
+EventChannel = namedtuple("EventChannel", "number name short_name cycle time_unit priority max_daq_list")
+
+DaqListSetup = namedtuple(
+    "DaqListSetup",
+    "event_channel prescaler priority blocks measurement_summary odts",
+    defaults=(None,),
+)
+
+DaqEntry = namedtuple("DaqEntry", "bitoff length address ext")
+
+DAQ_ID_FIELD_SIZE = {
+    "IDF_ABS_ODT_NUMBER": 1,
+    "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_BYTE": 2,
+    "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD": 3,
+    "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD_ALIGNED": 4,
+}
+
+DAQ_TIMESTAMP_SIZE = {
+    "NO_TIME_STAMP": 0,
+    "S1": 1,
+    "S2": 2,
+    "S4": 4,
+}
+
+WRITE_DAQ_MULTIPLE_HEADER_SIZE = 2  # CMD + NoDAQ.
+WRITE_DAQ_MULTIPLE_ELEMENT_SIZE = 8  # BitOffset, Size, Address[4], AddressExt, Dummy.
+
+EVENT_RE = re.compile(
+    r'/begin\s+EVENT\s+"([^"]*)"\s+"([^"]*)"\s+(\w+)\s+(\w+)\s+(\w+)\s+(\w+)\s+(\w+)\s+(\w+)',
+    re.DOTALL,
+)
+
+EVENT_LIST_RE = re.compile(r"(FIXED_EVENT_LIST|DEFAULT_EVENT_LIST)((?:\s+EVENT\s+\w+)+)")
+
+EVENT_NUMBER_RE = re.compile(r"EVENT\s+(\w+)")
+
+
+def event_cycle_time(cycle: int, time_unit: int) -> float:
+    """Cycle time of an event channel in seconds.
+
+    Parameters
+    ----------
+    cycle: int
+        TIME_CYCLE as found in IF_DATA XCP / GET_DAQ_EVENT_INFO.
+
+    time_unit: int
+        TIME_UNIT exponent (0 = 1ns, 1 = 10ns, ... 6 = 1ms, ... 9 = 1s).
+
+    Returns
+    -------
+    float
+        0.0 for sporadic (non-cyclic) events.
+    """
+    return cycle * 10.0 ** (time_unit - 9)
+
+
+def parse_if_data_events(text: str) -> dict:
+    """Extract `EVENT` definitions from an IF_DATA XCP section.
+
+    Returns
+    -------
+    dict
+        Event channel number ==> `EventChannel`
+    """
+    result = {}
+    for name, short_name, number, _, max_daq_list, cycle, time_unit, priority in EVENT_RE.findall(text or ""):
+        number = int(number, 0)
+        result[number] = EventChannel(
+            number=number,
+            name=name,
+            short_name=short_name,
+            cycle=int(cycle, 0),
+            time_unit=int(time_unit, 0),
+            priority=int(priority, 0),
+            max_daq_list=int(max_daq_list, 0),
+        )
+    return result
+
+
+def parse_if_data_daq_event(text: str) -> tuple:
+    """Extract event channels from a MEASUREMENTs IF_DATA XCP `DAQ_EVENT` section.
+
+    Returns
+    -------
+    tuple: (fixed_events, default_events)
+        Lists of event channel numbers.
+    """
+    fixed_events = []
+    default_events = []
+    for kind, events in EVENT_LIST_RE.findall(text or ""):
+        numbers = [int(n, 0) for n in EVENT_NUMBER_RE.findall(events)]
+        if kind == "FIXED_EVENT_LIST":
+            fixed_events.extend(numbers)
+        else:
+            default_events.extend(numbers)
+    return fixed_events, default_events
+
+
+def event_channels_from_a2l(session) -> dict:
+    """Collect event channel definitions from all IF_DATA sections of an A2L database."""
+    result = {}
+    for (raw,) in session.query(model.IfData.raw).all():
+        if raw and "EVENT" in raw:
+            result.update(parse_if_data_events(raw))
+    return result
+
+
+def measurement_events_from_if_data(if_data) -> tuple:
+    """Get `FIXED_EVENT_LIST` / `DEFAULT_EVENT_LIST` from the raw IF_DATA sections of a MEASUREMENT.
+
+    Returns
+    -------
+    tuple: (fixed_events, default_events)
+    """
+    fixed_events = []
+    default_events = []
+    for raw in if_data:
+        fixed, default = parse_if_data_daq_event(raw)
+        fixed_events.extend(fixed)
+        default_events.extend(default)
+    return fixed_events, default_events
+
+
+def measurement_events_from_a2l(session, name: str) -> tuple:
+    """Get `FIXED_EVENT_LIST` / `DEFAULT_EVENT_LIST` of a MEASUREMENT.
+
+    Returns
+    -------
+    tuple: (fixed_events, default_events)
+    """
+    meas = session.query(model.Measurement).filter(model.Measurement.name == name).first()
+    if meas is None:
+        return [], []
+    return measurement_events_from_if_data(if_data.raw for if_data in meas.if_data or [])
+
+
+def event_channels_from_daq_info(daq_info: dict) -> dict:
+    """Convert the `channels` part of `Master.getDaqInfo()` to `EventChannel`s."""
+    TIME_UNITS = {
+        "EVENT_CHANNEL_TIME_UNIT_1NS": 0,
+        "EVENT_CHANNEL_TIME_UNIT_10NS": 1,
+        "EVENT_CHANNEL_TIME_UNIT_100NS": 2,
+        "EVENT_CHANNEL_TIME_UNIT_1US": 3,
+        "EVENT_CHANNEL_TIME_UNIT_10US": 4,
+        "EVENT_CHANNEL_TIME_UNIT_100US": 5,
+        "EVENT_CHANNEL_TIME_UNIT_1MS": 6,
+        "EVENT_CHANNEL_TIME_UNIT_10MS": 7,
+        "EVENT_CHANNEL_TIME_UNIT_100MS": 8,
+        "EVENT_CHANNEL_TIME_UNIT_1S": 9,
+    }
+    result = {}
+    for number, channel in enumerate(daq_info.get("channels", [])):
+        time_unit = channel.get("unit")
+        result[number] = EventChannel(
+            number=number,
+            name=channel.get("name") or "",
+            short_name=channel.get("name") or "",
+            cycle=channel.get("cycle", 0),
+            time_unit=TIME_UNITS.get(time_unit, time_unit if isinstance(time_unit, int) else 6),
+            priority=channel.get("priority", 0),
+            max_daq_list=channel.get("maxDaqList", 0xFF),
+        )
+    return result
+
+
+def resolve_event_channel(event, event_channels: dict):
+    """Map an event channel designator (number or [short-]name) to a channel number.
+
+    Raises
+    ------
+    ValueError
+        If `event` is a name not found in `event_channels`.
+    """
+    if event is None or isinstance(event, int):
+        return event
+    if isinstance(event, str):
+        if event.isdigit() or event.lower().startswith("0x"):
+            return int(event, 0)
+        for number, channel in event_channels.items():
+            if event in (channel.name, channel.short_name):
+                return number
+    raise ValueError("Unknown event channel '{}'.".format(event))
+
+
+def split_points_from_summary(measurement_summary):
+    """Addresses where blocks may be split across ODTs without tearing a signal apart.
+
+    Returns
+    -------
+    list of (ext, address)
+    """
+    intervals = defaultdict(list)
+    for _, address, ext, _, size, _ in measurement_summary:
+        intervals[ext or 0].append((address, address + (size or 0)))
+    result = []
+    for ext, ivs in intervals.items():
+        ivs.sort()
+        candidates = sorted({a for iv in ivs for a in iv})
+        starts = [iv[0] for iv in ivs]
+        max_end = []  # Running maximum of interval ends.
+        current = None
+        for _, end in ivs:
+            current = end if current is None else max(current, end)
+            max_end.append(current)
+        for address in candidates:
+            idx = bisect.bisect_left(starts, address) - 1  # Intervals starting strictly before `address`.
+            if idx < 0 or max_end[idx] <= address:
+                result.append((ext, address))
+    return result
+
+
+def max_write_daq_multiple_elements(max_cto: int) -> int:
+    """Number of ODT entries fitting into a single WRITE_DAQ_MULTIPLE command."""
+    return max(0, (max_cto - WRITE_DAQ_MULTIPLE_HEADER_SIZE) // WRITE_DAQ_MULTIPLE_ELEMENT_SIZE)
+
+
+def _str_keys(obj):
+    """Recursively convert mapping keys to str (`json.dumps` can't sort mixed int / str keys)."""
+    if isinstance(obj, dict):
+        return {str(k): _str_keys(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_str_keys(v) for v in obj]
+    return obj
+
+
+class DaqLayoutCache:
+    """Persist computed DAQ layouts (`DaqListSetup`s including packed ODTs) as JSON files.
+
+    Parameters
+    ----------
+    directory: str
+        Where to store the layout files.
+    """
+
+    LAYOUT_VERSION = 3  # Bump if packing or layout structure changes.
+    FILE_PREFIX = "daq_layout_"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @classmethod
+    def make_key(cls, a2l_hash: str, groups, event_config: dict, slave_properties: dict) -> str:
+        """Derive a cache key from everything that influences the layout."""
+        key = json.dumps(
+            {
+                "version": cls.LAYOUT_VERSION,
+                "a2l": a2l_hash,
+                "groups": list(groups),
+                "events": _str_keys(event_config),
+                "slave": _str_keys(slave_properties),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha1(key.encode("utf8")).hexdigest()
+
+    def file_name(self, key: str) -> str:
+        return os.path.join(self.directory, "{}{}.json".format(self.FILE_PREFIX, key))
+
+    def load(self, key: str):
+        """
+        Returns
+        -------
+        list of `DaqListSetup` or None, if there is no cached layout.
+        """
+        file_name = self.file_name(key)
+        if not os.path.exists(file_name):
+            return None
+        with open(file_name, "rt", encoding="utf8") as inf:
+            try:
+                data = json.load(inf)
+            except ValueError:
+                return None
+        if data.get("version") != self.LAYOUT_VERSION:
+            return None
+        return [self._setup_from_dict(d) for d in data["daq_lists"]]
+
+    def store(self, key: str, setups) -> None:
+        data = {
+            "version": self.LAYOUT_VERSION,
+            "daq_lists": [self._setup_to_dict(s) for s in setups],
+        }
+        with open(self.file_name(key), "wt", encoding="utf8") as outf:
+            json.dump(data, outf)
+
+    @staticmethod
+    def _setup_to_dict(setup: DaqListSetup) -> dict:
+        return {
+            "event_channel": setup.event_channel,
+            "prescaler": setup.prescaler,
+            "priority": setup.priority,
+            "blocks": [(b.name, b.address, b.length, b.ext) for b in setup.blocks],
+            "measurement_summary": [list(m) for m in setup.measurement_summary],
+            "odts": [[list(e) for e in odt] for odt in setup.odts or []],
+        }
+
+    @staticmethod
+    def _setup_from_dict(data: dict) -> DaqListSetup:
+        return DaqListSetup(
+            event_channel=data["event_channel"],
+            prescaler=data["prescaler"],
+            priority=data["priority"],
+            blocks=[McObject(*b) for b in data["blocks"]],
+            measurement_summary=[tuple(m) for m in data["measurement_summary"]],
+            odts=[[DaqEntry(*e) for e in odt] for odt in data["odts"]],
+        )
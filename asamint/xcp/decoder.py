@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Decode raw DAQ frames (DTOs) into per-signal arrays.
+
+For every ODT a NumPy structured dtype is compiled from the DAQ layout, so all frames
+of an ODT are converted with a single `np.frombuffer` call.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import defaultdict, namedtuple
+from logging import getLogger
+
+import numpy as np
+
+from asamint.asam import ByteOrder, get_np_dtype
+from asamint.utils.optimize import DaqList
+from asamint.xcp.daq import DAQ_ID_FIELD_SIZE, DAQ_TIMESTAMP_SIZE
+
+DAQ_TIMESTAMP_UNIT_TO_EXP = {
+    "DAQ_TIMESTAMP_UNIT_1PS": -12,
+    "DAQ_TIMESTAMP_UNIT_10PS": -11,
+    "DAQ_TIMESTAMP_UNIT_100PS": -10,
+    "DAQ_TIMESTAMP_UNIT_1NS": -9,
+    "DAQ_TIMESTAMP_UNIT_10NS": -8,
+    "DAQ_TIMESTAMP_UNIT_100NS": -7,
+    "DAQ_TIMESTAMP_UNIT_1US": -6,
+    "DAQ_TIMESTAMP_UNIT_10US": -5,
+    "DAQ_TIMESTAMP_UNIT_100US": -4,
+    "DAQ_TIMESTAMP_UNIT_1MS": -3,
+    "DAQ_TIMESTAMP_UNIT_10MS": -2,
+    "DAQ_TIMESTAMP_UNIT_100MS": -1,
+    "DAQ_TIMESTAMP_UNIT_1S": 0,
+}
+
+TIMESTAMP_FIELD = "_timestamp"
+
+OdtLayout = namedtuple("OdtLayout", "daq_idx odt_idx size fields")
+
+DecodedDaqList = namedtuple("DecodedDaqList", "daq_idx event_channel timestamps signals")
+
+
+class DaqDecoder:
+    """Compiled decoder for a DAQ layout.
+
+    Parameters
+    ----------
+    daq_setups: list of `DaqListSetup`
+        Including packed ODTs.
+
+    daq_info: dict
+        As returned by `Master.getDaqInfo()`.
+
+    byte_order: str
+        "INTEL" or "MOTOROLA" (s. `pyxcp.types.ByteOrder`), applies to DAQ header and timestamps.
+
+    measurement_byte_orders: dict
+        MEASUREMENT name ==> `asamint.asam.ByteOrder`. MEASUREMENTs not listed follow `byte_order`.
+
+    first_pids: list of int
+        FIRST_PID of every DAQ list (s. START_STOP_DAQ_LIST response), only relevant for absolute
+        ODT numbers. If None, ODTs are assumed to be numbered consecutively.
+
+    timestamps: bool
+        DAQ lists are running in timestamped mode (first ODT contains DAQ timestamp).
+
+    Note
+    ----
+    `decode()` is stateful: incomplete DAQ cycles at the end of a chunk are kept until the next call,
+    timestamp overflows are tracked across calls.
+    """
+
+    def __init__(
+        self,
+        daq_setups,
+        daq_info: dict,
+        byte_order: str = "INTEL",
+        measurement_byte_orders: dict = None,
+        first_pids: list = None,
+        timestamps: bool = True,
+    ):
+        self.logger = getLogger(self.__class__.__name__)
+        self.daq_setups = daq_setups
+        self.idf = daq_info["processor"]["keyByte"]["identificationField"]
+        self.idf_size = DAQ_ID_FIELD_SIZE[self.idf]
+        resolution = daq_info["resolution"]
+        self.timestamp_size = DAQ_TIMESTAMP_SIZE.get(resolution["timestampMode"]["size"], 0) if timestamps else 0
+        self.timestamp_resolution = (resolution.get("timestampTicks") or 1) * 10.0 ** DAQ_TIMESTAMP_UNIT_TO_EXP.get(
+            resolution["timestampMode"].get("unit"), -6
+        )
+        self.byte_order = ByteOrder.LITTLE_ENDIAN if byte_order == "INTEL" else ByteOrder.BIG_ENDIAN
+        self.measurement_byte_orders = measurement_byte_orders or {}
+        if first_pids is None:
+            first_pids = []
+            pid = 0
+            for setup in daq_setups:
+                first_pids.append(pid)
+                pid += len(setup.odts)
+        self.first_pids = first_pids
+        self.layouts = {}
+        self.pid_map = {}
+        self._build_layouts()
+        self._pending = defaultdict(list)  # (daq_idx, odt_idx) ==> list of (record array, host timestamps).
+        self._ts_state = {}  # daq_idx ==> (last raw timestamp, accumulated overflow).
+
+    def _build_layouts(self):
+        for daq_idx, setup in enumerate(self.daq_setups):
+            odt_fields = [[] for _ in setup.odts]
+            odt_payload_offsets = []
+            for odt_idx, odt in enumerate(setup.odts):
+                offset = self.idf_size + (self.timestamp_size if odt_idx == 0 else 0)
+                entry_offsets = []
+                for entry in odt:
+                    entry_offsets.append(offset)
+                    offset += entry.length
+                odt_payload_offsets.append((entry_offsets, offset))
+            if self.timestamp_size and setup.odts:
+                odt_fields[0].append(
+                    (TIMESTAMP_FIELD, "{}u{}".format(self._prefix(self.byte_order), self.timestamp_size), self.idf_size)
+                )
+            locations = DaqList(setup.odts, setup.measurement_summary).locations
+            placed = set()
+            for (name, address, ext, datatype, _, _), location in zip(setup.measurement_summary, locations.tolist()):
+                if name in placed:
+                    self.logger.debug("MEASUREMENT '{}' occurs more than once in DAQ list #{}, skipped.".format(name, daq_idx))
+                    continue
+                odt_idx, entry_idx, offset = location
+                if odt_idx < 0:
+                    self.logger.warning("MEASUREMENT '{}' @0x{:08x} not found in DAQ list #{}.".format(name, address, daq_idx))
+                    continue
+                byte_order = self.measurement_byte_orders.get(name, self.byte_order)
+                entry_offsets, _ = odt_payload_offsets[odt_idx]
+                odt_fields[odt_idx].append((name, get_np_dtype(datatype, byte_order), entry_offsets[entry_idx] + offset))
+                placed.add(name)
+            for odt_idx, fields in enumerate(odt_fields):
+                _, size = odt_payload_offsets[odt_idx]
+                self.layouts[(daq_idx, odt_idx)] = OdtLayout(daq_idx, odt_idx, size, fields)
+                self.pid_map[self._pid(daq_idx, odt_idx)] = (daq_idx, odt_idx)
+
+    @staticmethod
+    def _prefix(byte_order):
+        return ">" if byte_order == ByteOrder.BIG_ENDIAN else "<"
+
+    def _pid(self, daq_idx: int, odt_idx: int):
+        if self.idf == "IDF_ABS_ODT_NUMBER":
+            return self.first_pids[daq_idx] + odt_idx
+        return (odt_idx, daq_idx)
+
+    def frame_key(self, frame):
+        """Identification field of a DTO (as used in `pid_map`)."""
+        if self.idf == "IDF_ABS_ODT_NUMBER":
+            return frame[0]
+        elif self.idf == "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_BYTE":
+            return (frame[0], frame[1])
+        elif self.idf == "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD":
+            lo, hi = (frame[1], frame[2]) if self.byte_order == ByteOrder.LITTLE_ENDIAN else (frame[2], frame[1])
+            return (frame[0], lo | (hi << 8))
+        else:
+            lo, hi = (frame[2], frame[3]) if self.byte_order == ByteOrder.LITTLE_ENDIAN else (frame[3], frame[2])
+            return (frame[0], lo | (hi << 8))
+
+    def dtype(self, daq_idx: int, odt_idx: int, frame_length: int = None) -> np.dtype:
+        """Structured dtype of an ODT.
+
+        Parameters
+        ----------
+        frame_length: int
+            Actual DTO length, may be larger than ODT size due to padding (e.g. CAN).
+        """
+        layout = self.layouts[(daq_idx, odt_idx)]
+        return np.dtype(
+            {
+                "names": [f[0] for f in layout.fields],
+                "formats": [f[1] for f in layout.fields],
+                "offsets": [f[2] for f in layout.fields],
+                "itemsize": max(layout.size, frame_length or 0),
+            }
+        )
+
+    def decode(self, frames, host_timestamps=None):
+        """Decode a chunk of DTOs.
+
+        Parameters
+        ----------
+        frames: iterable of bytes-like
+            Raw DTOs (including identification field), in reception order.
+
+        host_timestamps: iterable of float
+            Optional host reception timestamps (used if DAQ lists aren't timestamped).
+
+        Returns
+        -------
+        list of `DecodedDaqList`
+            Complete DAQ cycles only, one entry per DAQ list.
+        """
+        if host_timestamps is None:
+            host_timestamps = [0.0] * len(frames)
+        buckets = defaultdict(lambda: ([], []))
+        pid_map = self.pid_map
+        frame_key = self.frame_key
+        for frame, timestamp in zip(frames, host_timestamps):
+            key = pid_map.get(frame_key(frame))
+            if key is None:
+                continue
+            bucket = buckets[(key, len(frame))]
+            bucket[0].append(frame)
+            bucket[1].append(timestamp)
+        for ((daq_idx, odt_idx), length), (data, timestamps) in buckets.items():
+            records = np.frombuffer(b"".join(data), dtype=self.dtype(daq_idx, odt_idx, length))
+            self._pending[(daq_idx, odt_idx)].append((records, np.asarray(timestamps, dtype=np.float64)))
+        return [self._assemble(daq_idx, setup) for daq_idx, setup in enumerate(self.daq_setups)]
+
+    def _assemble(self, daq_idx, setup):
+        odt_count = len(setup.odts)
+        parts = []
+        for odt_idx in range(odt_count):
+            pending = self._pending.pop((daq_idx, odt_idx), [])
+            fields = self.layouts[(daq_idx, odt_idx)].fields
+            if pending:
+                columns = {name: np.concatenate([p[0][name] for p in pending]) for name, _, _ in fields}
+                host_ts = np.concatenate([p[1] for p in pending])
+            else:
+                columns = {name: np.empty(0, dtype=fmt) for name, fmt, _ in fields}
+                host_ts = np.empty(0, dtype=np.float64)
+            parts.append((columns, host_ts))
+        count = min((len(host_ts) for _, host_ts in parts), default=0)
+        signals = {}
+        for odt_idx, (columns, host_ts) in enumerate(parts):
+            if len(host_ts) > count:
+                # Keep incomplete cycle for the next chunk.
+                remainder = np.zeros(len(host_ts) - count, dtype=[(n, c.dtype) for n, c in columns.items()])
+                for name, column in columns.items():
+                    remainder[name] = column[count:]
+                self._pending[(daq_idx, odt_idx)].append((remainder, host_ts[count:]))
+            for name, column in columns.items():
+                signals[name] = np.ascontiguousarray(column[:count])
+        if TIMESTAMP_FIELD in signals:
+            timestamps = self._unwrap_timestamps(daq_idx, signals.pop(TIMESTAMP_FIELD)) * self.timestamp_resolution
+        else:
+            timestamps = parts[0][1][:count] if parts else np.empty(0, dtype=np.float64)
+        return DecodedDaqList(daq_idx, setup.event_channel, timestamps, signals)
+
+    def _unwrap_timestamps(self, daq_idx, raw):
+        """Compensate overflows of the (1, 2 or 4 byte) DAQ timestamp counter."""
+        if not len(raw):
+            return raw.astype(np.float64)
+        modulus = 1 << (8 * self.timestamp_size)
+        last, overflow = self._ts_state.get(daq_idx, (None, 0))
+        raw = raw.astype(np.int64)
+        wraps = np.concatenate((([1] if last is not None and raw[0] < last else [0]), (np.diff(raw) < 0).astype(np.int64)))
+        total = np.cumsum(wraps) * modulus + overflow + raw
+        self._ts_state[daq_idx] = (int(raw[-1]), overflow + int(wraps.sum()) * modulus)
+        return total.astype(np.float64)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Paged download of memory images (e.g. flash emulation RAM behind a paging window).
+
+The image is split into pages, pages are addressed via an address mapper (logical address ==> (address extension, address)),
+written with DOWNLOAD (`Master.push` uses DOWNLOAD_NEXT if the slave supports master block mode)
+and verified by BUILD_CHECKSUM. Consecutive pages are written back-to-back, relying on the MTA being
+post-incremented, and verified afterwards, i.e. SET_MTA is only sent on page switches.
+Verified pages are recorded in a `DownloadJournal`, so an interrupted download resumes where it stopped.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import namedtuple
+import hashlib
+import json
+from logging import getLogger
+import os
+
+from pyxcp.types import XcpResponseError
+
+from asamint.exceptions import DownloadVerificationError
+from asamint.xcp.checksum import block_checksums
+from asamint.xcp.reco import struct_byte_order_prefix
+
+Page = namedtuple("Page", "ext address data source")
+
+FlashStats = namedtuple("FlashStats", "pages written resumed retries bytes set_mta")
+
+
+def paging_window(window: int, page_shift: int = 16, first_page: int = 0):
+    """Address mapper for a paging window: page number (`address >> page_shift`) becomes the address extension.
+
+    Parameters
+    ----------
+    window: int
+        Start address of the window, e.g. 0x8000
+
+    page_shift: int
+
+    first_page: int
+        Page number mapped to address extension 0.
+    """
+    mask = (1 << page_shift) - 1
+
+    def mapper(address: int):
+        return (address >> page_shift) - first_page, window + (address & mask)
+
+    return mapper
+
+
+def plan_pages(image, page_size: int = 0x1000, address_mapper=None):
+    """Split `image` into pages.
+
+    Parameters
+    ----------
+    image: `objutils.Image`
+
+    page_size: int
+        Pages don't cross `page_size` boundaries (of the logical address).
+
+    address_mapper: callable
+        logical address ==> (address extension, address); default: (0, address)
+
+    Returns
+    -------
+    list of `Page`
+        Sorted by (ext, address).
+    """
+    result = []
+    for section in image.sections:
+        data = bytes(section.data)
+        offset = 0
+        while offset < len(data):
+            source = section.start_address + offset
+            length = min((source // page_size + 1) * page_size - source, len(data) - offset)
+            ext, address = address_mapper(source) if address_mapper else (0, source)
+            result.append(Page(ext, address, data[offset : offset + length], source))
+            offset += length
+    return sorted(result, key=lambda p: (p.ext, p.address))
+
+
+def image_digest(pages) -> str:
+    digest = hashlib.sha1()
+    for page in pages:
+        digest.update("{}:{}:{};".format(page.ext, page.address, len(page.data)).encode("ascii"))
+        digest.update(page.data)
+    return digest.hexdigest()
+
+
+class DownloadJournal:
+    """Persistent record of verified pages.
+
+    Parameters
+    ----------
+    file_name: str
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.digest = None
+        self.done = set()
+
+    def load(self, digest: str) -> set:
+        """Pages already written of the image identified by `digest` (s. `image_digest`).
+
+        Returns
+        -------
+        set of tuples: (ext, address, length)
+        """
+        self.digest = digest
+        self.done = set()
+        if os.path.exists(self.file_name):
+            try:
+                with open(self.file_name, encoding="utf8") as inf:
+                    content = json.load(inf)
+            except (OSError, ValueError):
+                content = {}
+            if content.get("image") == digest:
+                self.done = {tuple(p) for p in content.get("pages", [])}
+        return self.done
+
+    def add(self, page: Page) -> None:
+        self.done.add((page.ext, page.address, len(page.data)))
+        temp_name = "{}.tmp".format(self.file_name)
+        with open(temp_name, "wt", encoding="utf8") as outf:
+            json.dump({"image": self.digest, "pages": sorted(self.done)}, outf)
+        os.replace(temp_name, self.file_name)
+
+    def finish(self) -> None:
+        if os.path.exists(self.file_name):
+            os.remove(self.file_name)
+        self.done = set()
+
+
+class PagedDownloader:
+    """Write an `objutils.Image` page by page.
+
+    Parameters
+    ----------
+    xcp_master:
+
+    page_size: int
+
+    address_mapper: callable
+        s. `plan_pages`, `paging_window`
+
+    verify: bool
+        Verify every page (BUILD_CHECKSUM, read back if not available).
+
+    retries: int
+        Number of re-writes of a page failing verification.
+
+    journal: `DownloadJournal`
+        Enables resuming of interrupted downloads.
+
+    callback: callable
+        Called with (number of pages done, number of pages).
+    """
+
+    def __init__(
+        self,
+        xcp_master,
+        page_size: int = 0x1000,
+        address_mapper=None,
+        verify: bool = True,
+        retries: int = 2,
+        journal: DownloadJournal = None,
+        callback=None,
+    ):
+        self.logger = getLogger(self.__class__.__name__)
+        self.xcp_master = xcp_master
+        self.page_size = page_size
+        self.address_mapper = address_mapper
+        self.verify = verify
+        self.retries = retries
+        self.journal = journal
+        self.callback = callback
+        self.byte_order = struct_byte_order_prefix(xcp_master.slaveProperties["byteOrder"])
+        self._use_checksum = True
+        self._expected = {}
+        self._mta = None
+        self._set_mta_count = 0
+
+    def _set_mta(self, ext: int, address: int) -> None:
+        if self._mta != (ext, address):
+            self.xcp_master.setMta(address, ext)
+            self._set_mta_count += 1
+
+    def _write(self, page: Page) -> None:
+        self._set_mta(page.ext, page.address)
+        self.xcp_master.push(page.data)
+        self._mta = (page.ext, page.address + len(page.data))  # DOWNLOAD post-increments the MTA.
+
+    def _verify(self, page: Page, pages) -> bool:
+        self._set_mta(page.ext, page.address)
+        self._mta = None
+        if self._use_checksum:
+            try:
+                response = self.xcp_master.buildChecksum(len(page.data))
+            except XcpResponseError as e:
+                self.logger.info("BUILD_CHECKSUM failed ({}), reading back.".format(e))
+                self._use_checksum = False
+                self._set_mta(page.ext, page.address)
+            else:
+                algorithm = str(response.checksumType)
+                if algorithm not in self._expected:
+                    # Local checksums of all pages in one go.
+                    values = block_checksums([p.data for p in pages], algorithm, self.byte_order)
+                    self._expected[algorithm] = {(p.ext, p.address): int(v) for p, v in zip(pages, values)}
+                return self._expected[algorithm][(page.ext, page.address)] == response.checksum
+        return bytes(self.xcp_master.pull(len(page.data))) == page.data
+
+    def runs(self, pages):
+        """Group `pages` into runs of consecutive pages (same address extension, no gaps)."""
+        result = []
+        for page in pages:
+            if result:
+                last = result[-1][-1]
+                if last.ext == page.ext and last.address + len(last.data) == page.address:
+                    result[-1].append(page)
+                    continue
+            result.append([page])
+        return result
+
+    def download(self, image) -> FlashStats:
+        """Write (and verify) `image`.
+
+        Raises
+        ------
+        `DownloadVerificationError`
+            A page still fails verification after `retries` re-writes.
+        """
+        pages = plan_pages(image, self.page_size, self.address_mapper)
+        done = self.journal.load(image_digest(pages)) if self.journal else set()
+        pending = [p for p in pages if (p.ext, p.address, len(p.data)) not in done]
+        if done:
+            self.logger.info("Resuming download, {} of {} pages already written.".format(len(pages) - len(pending), len(pages)))
+        self._use_checksum = True
+        self._expected = {}  # Local checksums of this image's pages.
+        self._mta = None
+        self._set_mta_count = 0
+        retries = 0
+        finished = len(pages) - len(pending)
+        for run in self.runs(pending):
+            for page in run:
+                self._write(page)
+            for page in run:
+                if self.verify:
+                    for _ in range(self.retries):
+                        if self._verify(page, pending):
+                            break
+                        retries += 1
+                        self.logger.warning("Verification of page 0x{:x}:0x{:08x} failed, retrying.".format(page.ext, page.address))
+                        self._write(page)
+                    else:
+                        if not self._verify(page, pending):
+                            raise DownloadVerificationError(
+                                "Verification of page 0x{:x}:0x{:08x} failed.".format(page.ext, page.address)
+                            )
+                if self.journal:
+                    self.journal.add(page)
+                finished += 1
+                if self.callback:
+                    self.callback(finished, len(pages))
+        if self.journal:
+            self.journal.finish()
+        return FlashStats(
+            pages=len(pages),
+            written=len(pending),
+            resumed=len(pages) - len(pending),
+            retries=retries,
+            bytes=sum(len(p.data) for p in pending),
+            set_mta=self._set_mta_count,
+        )
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Content-addressed store of uploaded ECU memory images.
+
+Images are keyed by `transfer.fingerprint` (EPK plus slave-side block checksums), so an unchanged ECU
+is served from disk after a few BUILD_CHECKSUM requests. Least recently used images are evicted
+if the number of images or their total size exceeds the configured limits.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from logging import getLogger
+import os
+
+from asamint.xcp.transfer import load_blocks, save_blocks
+
+
+class ImageStore:
+    """LRU-evicted directory of memory images.
+
+    Parameters
+    ----------
+    directory: str
+
+    max_entries: int
+
+    max_size: int
+        Upper limit (in bytes) of all stored images.
+    """
+
+    SUFFIX = ".npz"
+
+    def __init__(self, directory: str, max_entries: int = 20, max_size: int = 256 * 1024 * 1024):
+        self.logger = getLogger(self.__class__.__name__)
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_size = max_size
+
+    def file_name(self, key: str) -> str:
+        return os.path.join(self.directory, "{}{}".format(key, self.SUFFIX))
+
+    def get(self, key: str):
+        """
+        Returns
+        -------
+        dict or None
+            (ext, address, length) ==> bytes, s. `transfer.load_blocks`
+        """
+        if key is None or not os.path.exists(self.file_name(key)):
+            return None
+        try:
+            result = load_blocks(self.file_name(key))
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning("Removing unreadable image '{}': {}.".format(self.file_name(key), e))
+            os.remove(self.file_name(key))
+            return None
+        os.utime(self.file_name(key))  # Mark as recently used.
+        return result
+
+    def put(self, key: str, blocks, data) -> None:
+        """Store `blocks` (list of `McObject`) and their contents (list of bytes) and evict old images."""
+        if key is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        save_blocks(self.file_name(key), blocks, data)
+        self.evict()
+
+    def entries(self):
+        """
+        Returns
+        -------
+        list of tuples: (key, size, last access)
+            Most recently used first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.SUFFIX):
+                stat = entry.stat()
+                result.append((entry.name[: -len(self.SUFFIX)], stat.st_size, stat.st_mtime))
+        return sorted(result, key=lambda e: e[2], reverse=True)
+
+    def evict(self) -> None:
+        total_size = 0
+        for idx, (key, size, _) in enumerate(self.entries()):
+            total_size += size
+            if idx >= self.max_entries or (idx > 0 and total_size > self.max_size):
+                self.logger.info("Evicting image '{}'.".format(key))
+                os.remove(self.file_name(key))
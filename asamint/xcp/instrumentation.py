@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Instrumentation of XCP memory and DAQ operations.
+
+Usage
+-----
+
+.. code-block:: python
+
+    with instrumented(xcp_master) as statistics:
+        calibration_data.upload_parameters(xcp_master)
+    print(statistics.to_json())
+
+Methods of the master object are temporarily replaced by timing wrappers, i.e. code holding a
+reference to the master (e.g. `asamint.calibration`, `asamint.xcp`) is measured without any change.
+Outside of `instrumented()` the master is untouched, so there is no overhead at all.
+
+Note
+----
+Convenience functions like `pull` and `push` call lower level services (`upload`, `download`, ...)
+of the same object; these are recorded as well, i.e. the per-operation numbers overlap.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import functools
+import json
+import threading
+import time
+
+OPERATIONS = (
+    "setMta",
+    "pull",
+    "push",
+    "upload",
+    "shortUpload",
+    "download",
+    "downloadNext",
+    "buildChecksum",
+    "setCalPage",
+    "freeDaq",
+    "allocDaq",
+    "allocOdt",
+    "allocOdtEntry",
+    "setDaqPtr",
+    "writeDaq",
+    "writeDaqMultiple",
+    "setDaqListMode",
+    "startStopDaqList",
+    "startStopSynch",
+)
+
+# Upper bounds (in seconds) of latency histogram bins; the last bin is open.
+HISTOGRAM_BOUNDS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+def _payload_size(args, result) -> int:
+    """Bytes transferred: returned data (uploads) or data arguments (downloads)."""
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    return sum(len(arg) for arg in args if isinstance(arg, (bytes, bytearray)))
+
+
+class OperationStatistics:
+    """Counters of a single operation."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_time = 0.0
+        self.min_time = None
+        self.max_time = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def record(self, nbytes: int, duration: float, error: bool = False):
+        self.calls += 1
+        self.errors += error
+        self.bytes += nbytes
+        self.total_time += duration
+        self.min_time = duration if self.min_time is None else min(self.min_time, duration)
+        self.max_time = max(self.max_time, duration)
+        self.histogram[bisect_left(HISTOGRAM_BOUNDS, duration)] += 1
+
+    def report(self) -> dict:
+        labels = ["<={}ms".format(b * 1000) for b in HISTOGRAM_BOUNDS] + [">{}ms".format(HISTOGRAM_BOUNDS[-1] * 1000)]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "total_time": self.total_time,
+            "min_time": self.min_time,
+            "max_time": self.max_time,
+            "mean_time": self.total_time / self.calls if self.calls else None,
+            "throughput": self.bytes / self.total_time if self.total_time else None,  # Bytes per second.
+            "histogram": {label: count for label, count in zip(labels, self.histogram) if count},
+        }
+
+
+class TransferStatistics:
+    """Statistics of instrumented operations, thread-safe (one instance may be shared by several masters)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = {}
+        self.wall_time = 0.0
+
+    def record(self, operation: str, nbytes: int, duration: float, error: bool = False):
+        with self._lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = OperationStatistics()
+            stats.record(nbytes, duration, error)
+
+    def reset(self):
+        with self._lock:
+            self.operations.clear()
+            self.wall_time = 0.0
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "wall_time": self.wall_time,
+                "operations": {name: stats.report() for name, stats in sorted(self.operations.items())},
+            }
+
+    def to_json(self, file_name: str = None) -> str:
+        """JSON report, optionally written to `file_name`."""
+        result = json.dumps(self.report(), indent=2)
+        if file_name:
+            with open(file_name, "wt", encoding="utf8") as outf:
+                outf.write(result)
+        return result
+
+
+def _wrap(method, name: str, statistics: TransferStatistics):
+    perf_counter = time.perf_counter
+
+    @functools.wraps(method)
+    def wrapper(*args, **kws):
+        start = perf_counter()
+        try:
+            result = method(*args, **kws)
+        except Exception:
+            statistics.record(name, 0, perf_counter() - start, error=True)
+            raise
+        statistics.record(name, _payload_size(args, result), perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+@contextmanager
+def instrumented(*masters, statistics: TransferStatistics = None, operations=OPERATIONS):
+    """Record statistics of `operations` of all `masters` while the context is active.
+
+    Yields
+    ------
+    `TransferStatistics`
+    """
+    statistics = statistics if statistics is not None else TransferStatistics()
+    patched = []
+    for master in masters:
+        for name in operations:
+            method = getattr(master, name, None)
+            if method is None or name in vars(master):
+                continue
+            setattr(master, name, _wrap(method, name, statistics))
+            patched.append((master, name))
+    start = time.perf_counter()
+    try:
+        yield statistics
+    finally:
+        statistics.wall_time += time.perf_counter() - start
+        for master, name in patched:
+            delattr(master, name)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Run uploads, downloads and EPK checks against several ECUs concurrently.
+
+Every ECU (i.e. `pyxcp` master) is driven by its own worker thread; XCP transfers are I/O-bound,
+so the total wall time is close to that of the slowest ECU. Block layouts are computed once
+(e.g. `CalibrationData.parameter_blocks()`) and shared by all ECUs using the same A2L file.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+import threading
+import time
+
+from objutils import Image, Section
+
+from asamint.xcp.transfer import TransferCostModel, diff_image, download_blocks, upload_blocks
+
+EcuResult = namedtuple("EcuResult", "name ok value error duration")
+
+BatchResult = namedtuple("BatchResult", "results wall_time")
+
+
+class Orchestrator:
+    """Concurrent transfers to/from several ECUs.
+
+    Parameters
+    ----------
+    masters: dict
+        ECU name ==> connected `pyxcp` master.
+
+    max_workers: int
+        Defaults to one thread per ECU.
+
+    cost_model_parameters: dict
+        Keyword arguments for `TransferCostModel.from_slave_properties` (transport, bitrate, command_latency).
+    """
+
+    def __init__(self, masters: dict, max_workers: int = None, cost_model_parameters: dict = None):
+        self.logger = getLogger(self.__class__.__name__)
+        self.masters = OrderedDict(masters)
+        self.max_workers = max_workers or max(len(self.masters), 1)
+        self.cost_model_parameters = cost_model_parameters or {}
+        self._merged_layouts = {}
+        self._lock = threading.Lock()
+
+    def run(self, func, *args, **kws) -> BatchResult:
+        """Call `func(name, master, *args, **kws)` for every ECU concurrently.
+
+        Exceptions are caught and reported per ECU, i.e. a failing ECU doesn't affect the others.
+        """
+
+        def worker(name, master):
+            start = time.perf_counter()
+            try:
+                value = func(name, master, *args, **kws)
+            except Exception as e:
+                self.logger.error("ECU '{}': {}".format(name, e))
+                return EcuResult(name, False, None, e, time.perf_counter() - start)
+            return EcuResult(name, True, value, None, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(worker, name, master) for name, master in self.masters.items()]
+            results = OrderedDict((f.result().name, f.result()) for f in futures)
+        wall_time = time.perf_counter() - start
+        slowest = max((r.duration for r in results.values()), default=0.0)
+        self.logger.info("{} ECU(s) done in {:.3f}s (slowest ECU: {:.3f}s).".format(len(results), wall_time, slowest))
+        return BatchResult(results, wall_time)
+
+    def cost_model(self, master) -> TransferCostModel:
+        return TransferCostModel.from_slave_properties(master.slaveProperties, **self.cost_model_parameters)
+
+    def merged_layout(self, blocks, cost_model: TransferCostModel):
+        """Gap-merged `blocks`, shared by ECUs with identical transfer characteristics."""
+        key = (
+            tuple((b.ext, b.address, b.length) for b in blocks),
+            cost_model.max_cto,
+            cost_model.slave_block_mode,
+            cost_model.address_granularity,
+            cost_model.transport,
+            cost_model.bitrate,
+            cost_model.command_latency,
+        )
+        with self._lock:
+            if key not in self._merged_layouts:
+                self._merged_layouts[key] = cost_model.merge_blocks(blocks)[0]
+            return self._merged_layouts[key]
+
+    def check_epk(self, epk: str, address: int) -> BatchResult:
+        """Compare EPK of every ECU with `epk`; `value` of the results is the EPK read from the ECU."""
+
+        def check(name, master):
+            master.setMta(address)
+            epk_ecu = master.pull(len(epk)).decode("ascii")
+            if epk_ecu != epk:
+                raise ValueError("EPK is invalid -- expected '{}' got '{}'.".format(epk, epk_ecu))
+            return epk_ecu
+
+        return self.run(check)
+
+    def upload(self, blocks, references: dict = None, merge_gaps: bool = True) -> BatchResult:
+        """Fetch `blocks` from every ECU.
+
+        Parameters
+        ----------
+        blocks: list of `McObject`
+            Continuous blocks, e.g. from `CalibrationData.parameter_blocks()`.
+
+        references: dict
+            ECU name ==> previous contents (s. `transfer.ReferenceImage.load`), enables incremental uploads.
+
+        merge_gaps: bool
+            Bridge gaps according to the `TransferCostModel` of each ECU.
+
+        Returns
+        -------
+        `BatchResult`
+            `value` of the results is an `objutils.Image`.
+        """
+        references = references or {}
+
+        def upload(name, master):
+            cost_model = self.cost_model(master)
+            ecu_blocks = self.merged_layout(blocks, cost_model) if merge_gaps else blocks
+            data, stats = upload_blocks(master, ecu_blocks, references.get(name), cost_model)
+            self.logger.info("ECU '{}': {} block(s), {} bytes pulled.".format(name, stats.blocks, stats.bytes_pulled))
+            sections = [Section(start_address=b.address, data=d) for b, d in zip(ecu_blocks, data)]
+            return Image(sections=sections, join=False)
+
+        return self.run(upload)
+
+    def download(self, images, references: dict = None, verify: bool = False) -> BatchResult:
+        """Write `images` to every ECU, differential if `references` are given.
+
+        Parameters
+        ----------
+        images: `objutils.Image` or dict
+            Target contents, either the same for all ECUs or ECU name ==> `Image`.
+
+        references: dict
+            ECU name ==> current contents (`Image`).
+
+        verify: bool
+
+        Returns
+        -------
+        `BatchResult`
+            `value` of the results is a `transfer.DownloadStats`.
+        """
+        references = references or {}
+
+        def download(name, master):
+            image = images.get(name) if isinstance(images, dict) else images
+            if image is None:
+                return None
+            blocks, stats = diff_image(image, references.get(name), self.cost_model(master))
+            download_blocks(master, blocks, verify)
+            return stats
+
+        return self.run(download)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Streaming conversion of raw XCP recordings to MDF4.
+
+Stages
+------
+
+1. Read `.xmraw` containers in chunks of frames.
+2. Decode ODTs (`asamint.xcp.decoder.DaqDecoder`).
+3. Apply COMPU_METHODs.
+4. Append chunks incrementally to an MDF file, one channel group per DAQ list.
+
+Stages are connected by bounded queues, so memory consumption doesn't depend on
+the length of the recording; with `parallel=True` every stage runs in its own thread.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from logging import getLogger
+import queue
+import threading
+
+import numpy as np
+from asammdf import MDF, Signal
+
+from asamint.compu import evaluator
+from asamint.xcp.decoder import DaqDecoder
+from asamint.xcp.reco import XcpLogCategory, XcpLogFileReader
+
+_SENTINEL = None
+
+
+def read_frame_chunks(reader: XcpLogFileReader, chunk_size: int = 10000):
+    """Iterate over the frames of a log file in chunks.
+
+    Yields
+    ------
+    tuple: (frames, timestamps)
+        Lists of raw DTOs and host timestamps, at most `chunk_size` entries.
+    """
+    frames = []
+    timestamps = []
+    for frame in reader.frames:
+        if frame.category != XcpLogCategory.DAQ:
+            continue
+        frames.append(frame.payload)
+        timestamps.append(frame.timestamp)
+        if len(frames) >= chunk_size:
+            yield frames, timestamps
+            frames = []
+            timestamps = []
+    if frames:
+        yield frames, timestamps
+
+
+class CompuMethodConverter:
+    """Convert ECU-internal to physical values (s. `asamint.compu.evaluator`).
+
+    Parameters
+    ----------
+    session: SQLAlchemy session
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def compu_method(self, name: str):
+        return evaluator(self.session, name)
+
+    def unit(self, name: str):
+        if not name or name == "NO_COMPU_METHOD":
+            return None
+        return self.compu_method(name).unit
+
+    def __call__(self, name: str, values):
+        if not name or name == "NO_COMPU_METHOD":
+            return values
+        result = np.asarray(self.compu_method(name).int_to_physical(values))
+        if result.dtype.kind in "OUS":
+            return values  # Verbal conversions are kept as raw values.
+        return result
+
+
+class MdfStreamWriter:
+    """Append decoded DAQ lists to an MDF file chunk by chunk.
+
+    Parameters
+    ----------
+    daq_setups: list of `DaqListSetup`
+
+    mdf_version: str
+
+    units: dict
+        MEASUREMENT name ==> unit.
+    """
+
+    def __init__(self, daq_setups, mdf_version: str = "4.10", units: dict = None):
+        self.daq_setups = daq_setups
+        self.mdf = MDF(version=mdf_version)
+        self.units = units or {}
+        self._groups = {}  # DAQ list number ==> (MDF group index, channel names, dtypes).
+
+    def write(self, daq_idx: int, timestamps, signals: dict):
+        if not len(timestamps):
+            return
+        group = self._groups.get(daq_idx)
+        if group is None:
+            names = list(signals.keys())
+            setup = self.daq_setups[daq_idx]
+            self.mdf.append(
+                [
+                    Signal(
+                        samples=signals[name],
+                        timestamps=timestamps,
+                        name=name,
+                        unit=self.units.get(name) or "",
+                    )
+                    for name in names
+                ],
+                comment="DAQ list #{} / event channel {}".format(daq_idx, setup.event_channel),
+            )
+            dtypes = [signals[name].dtype for name in names]
+            self._groups[daq_idx] = (len(self.mdf.groups) - 1, names, dtypes)
+        else:
+            index, names, dtypes = group
+            self.mdf.extend(
+                index,
+                [(np.asarray(timestamps, dtype=np.float64), None)]
+                + [(signals[name].astype(dtype, copy=False), None) for name, dtype in zip(names, dtypes)],
+            )
+
+    def save(self, file_name: str):
+        self.mdf.save(dst=file_name, overwrite=True)
+        self.mdf.close()
+
+
+class DaqMdfPipeline:
+    """Convert a `.xmraw` recording to MDF.
+
+    Parameters
+    ----------
+    daq_setups: list of `DaqListSetup`
+        DAQ layout used for recording.
+
+    daq_info: dict
+        As returned by `Master.getDaqInfo()`.
+
+    byte_order: str
+        "INTEL" or "MOTOROLA".
+
+    converter: callable
+        (compu method name, values) ==> physical values, e.g. `CompuMethodConverter`.
+        If None, raw values are stored.
+
+    mdf_version: str
+
+    chunk_size: int
+        Number of frames processed at once.
+
+    queue_size: int
+        Maximum number of chunks in flight between two stages.
+
+    parallel: bool
+        Run stages in separate threads.
+
+    measurement_byte_orders: dict
+        MEASUREMENT name ==> `asamint.asam.ByteOrder`.
+
+    timestamps: bool
+        DTOs contain DAQ timestamps, otherwise host timestamps are used.
+    """
+
+    def __init__(
+        self,
+        daq_setups,
+        daq_info: dict,
+        byte_order: str = "INTEL",
+        converter=None,
+        mdf_version: str = "4.10",
+        chunk_size: int = 10000,
+        queue_size: int = 4,
+        parallel: bool = True,
+        measurement_byte_orders: dict = None,
+        timestamps: bool = True,
+    ):
+        self.logger = getLogger(self.__class__.__name__)
+        self.daq_setups = daq_setups
+        self.decoder = DaqDecoder(daq_setups, daq_info, byte_order, measurement_byte_orders, timestamps=timestamps)
+        self.converter = converter
+        self.mdf_version = mdf_version
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.parallel = parallel
+        self.compu_methods = {}
+        for setup in daq_setups:
+            for name, _, _, _, _, compu_method in setup.measurement_summary:
+                self.compu_methods[name] = compu_method
+
+    def decode(self, chunk):
+        frames, timestamps = chunk
+        return self.decoder.decode(frames, timestamps)
+
+    def convert(self, decoded):
+        result = []
+        for daq_list in decoded:
+            if self.converter is not None:
+                signals = {name: self.converter(self.compu_methods.get(name), values) for name, values in daq_list.signals.items()}
+            else:
+                signals = daq_list.signals
+            result.append(daq_list._replace(signals=signals))
+        return result
+
+    def units(self) -> dict:
+        unit_func = getattr(self.converter, "unit", None)
+        if unit_func is None:
+            return {}
+        return {name: unit_func(cm) for name, cm in self.compu_methods.items()}
+
+    def run(self, log_file_name: str, mdf_file_name: str):
+        """
+        Parameters
+        ----------
+        log_file_name: str
+            Don't specify extension.
+
+        mdf_file_name: str
+        """
+        reader = XcpLogFileReader(log_file_name)
+        writer = MdfStreamWriter(self.daq_setups, self.mdf_version, self.units())
+        chunks = read_frame_chunks(reader, self.chunk_size)
+        try:
+            if self.parallel:
+                self._run_parallel(chunks, writer)
+            else:
+                for chunk in chunks:
+                    for daq_list in self.convert(self.decode(chunk)):
+                        writer.write(daq_list.daq_idx, daq_list.timestamps, daq_list.signals)
+        finally:
+            reader.close()
+        writer.save(mdf_file_name)
+        self.logger.info("MDF file '{}' written.".format(mdf_file_name))
+
+    def _run_parallel(self, chunks, writer):
+        decode_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        abort = threading.Event()
+
+        def put(q, item):
+            while not abort.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def read_stage():
+            try:
+                for chunk in chunks:
+                    if abort.is_set():
+                        break
+                    put(decode_queue, chunk)
+            except Exception as e:
+                errors.append(e)
+                abort.set()
+            finally:
+                put(decode_queue, _SENTINEL)
+
+        def decode_stage():
+            try:
+                while not abort.is_set():
+                    try:
+                        chunk = decode_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if chunk is _SENTINEL:
+                        break
+                    put(write_queue, self.convert(self.decode(chunk)))
+            except Exception as e:
+                errors.append(e)
+                abort.set()
+            finally:
+                put(write_queue, _SENTINEL)
+
+        threads = [threading.Thread(target=read_stage, daemon=True), threading.Thread(target=decode_stage, daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                try:
+                    decoded = write_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if abort.is_set():
+                        break
+                    continue
+                if decoded is _SENTINEL:
+                    break
+                for daq_list in decoded:
+                    writer.write(daq_list.daq_idx, daq_list.timestamps, daq_list.signals)
+        except Exception:
+            abort.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Bandwidth / bus-load planning for DAQ configurations.
+
+Works on packed DAQ layouts (`DaqListSetup`s including ODTs) before anything is
+allocated on the ECU.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import Counter, namedtuple
+
+from asamint.xcp.daq import DAQ_ID_FIELD_SIZE, DAQ_TIMESTAMP_SIZE, event_cycle_time
+
+DaqLoad = namedtuple(
+    "DaqLoad",
+    "daq_idx event_channel cycle_time prescaler frames_per_second bytes_per_second bits_per_second",
+)
+
+BusLoadPlan = namedtuple("BusLoadPlan", "daq_loads frames_per_second bytes_per_second bus_load problems")
+
+MAX_PID = 0xFB  # 0xFC..0xFF are reserved for responses / events / errors.
+MAX_PRESCALER = 0xFF
+
+CAN_FD_DLC_SIZES = (8, 12, 16, 20, 24, 32, 48, 64)
+
+TRANSPORT_OVERHEAD_BYTES = {
+    # XCP header (LEN/CTR) + UDP + IPv4 + Ethernet header/FCS + preamble/IFG.
+    "ETH": 4 + 8 + 20 + 18 + 20,
+    # XCP header (LEN/CTR) + checksum.
+    "SXI": 2 + 2,
+}
+
+
+def can_frame_bits(payload_size: int) -> int:
+    """Worst-case length of a classic CAN frame (11-bit identifier, including bit stuffing)."""
+    data_bits = 8 * payload_size
+    return data_bits + 47 + (34 + data_bits - 1) // 4
+
+
+def frame_bits(payload_size: int, transport: str = "CAN", max_dto: int = 8, pad_frames: bool = False) -> int:
+    """Number of bits required to transmit a DTO of `payload_size` bytes.
+
+    Parameters
+    ----------
+    payload_size: int
+        DTO size including identification field and timestamp.
+
+    transport: str
+        "CAN", "CANFD", "ETH" or "SXI".
+
+    max_dto: int
+
+    pad_frames: bool
+        Frames are always padded to `max_dto` (CAN: MAX_DLC_REQUIRED).
+    """
+    if pad_frames:
+        payload_size = max_dto
+    if transport == "CAN":
+        return can_frame_bits(payload_size)
+    elif transport == "CANFD":
+        size = next((s for s in CAN_FD_DLC_SIZES if s >= payload_size), CAN_FD_DLC_SIZES[-1])
+        return can_frame_bits(size)  # Conservative: no bit rate switch taken into account.
+    elif transport == "SXI":
+        return 10 * (payload_size + TRANSPORT_OVERHEAD_BYTES["SXI"])  # Start and stop bits.
+    else:
+        return 8 * (payload_size + TRANSPORT_OVERHEAD_BYTES.get(transport, 0))
+
+
+class BandwidthPlanner:
+    """Estimate frame rates, data rates and bus load of DAQ configurations.
+
+    Parameters
+    ----------
+    daq_info: dict
+        As returned by `Master.getDaqInfo()`.
+
+    max_dto: int
+
+    event_channels: dict
+        Event channel number ==> `EventChannel`.
+
+    transport: str
+        "CAN", "CANFD", "ETH" or "SXI".
+
+    bitrate: int
+        Bus bitrate in bit/s.
+
+    pad_frames: bool
+
+    timestamps: bool
+        DAQ lists are running in timestamped mode.
+    """
+
+    def __init__(
+        self,
+        daq_info: dict,
+        max_dto: int,
+        event_channels: dict,
+        transport: str = "CAN",
+        bitrate: int = 500000,
+        pad_frames: bool = False,
+        timestamps: bool = True,
+    ):
+        self.daq_info = daq_info
+        self.max_dto = max_dto
+        self.event_channels = event_channels
+        self.transport = transport
+        self.bitrate = bitrate
+        self.pad_frames = pad_frames
+        self.idf = daq_info["processor"]["keyByte"]["identificationField"]
+        self.idf_size = DAQ_ID_FIELD_SIZE[self.idf]
+        resolution = daq_info["resolution"]
+        self.timestamp_size = DAQ_TIMESTAMP_SIZE.get(resolution["timestampMode"]["size"], 0) if timestamps else 0
+
+    def odt_sizes(self, setup) -> list:
+        """DTO sizes of a DAQ list (identification field, timestamp and ODT entries)."""
+        result = []
+        for odt_idx, odt in enumerate(setup.odts or []):
+            size = self.idf_size + (self.timestamp_size if odt_idx == 0 else 0)
+            result.append(size + sum(entry.length for entry in odt))
+        return result
+
+    def cycle_time(self, event_channel: int):
+        """Cycle time in seconds or None for sporadic / unknown event channels."""
+        channel = self.event_channels.get(event_channel)
+        if channel is None:
+            return None
+        cycle_time = event_cycle_time(channel.cycle, channel.time_unit)
+        return cycle_time or None
+
+    def daq_load(self, daq_idx: int, setup, prescaler: int = None) -> DaqLoad:
+        prescaler = prescaler or setup.prescaler or 1
+        cycle_time = self.cycle_time(setup.event_channel)
+        sizes = self.odt_sizes(setup)
+        if cycle_time is None:
+            rate = 0.0
+        else:
+            rate = 1.0 / (cycle_time * prescaler)
+        bits = sum(frame_bits(size, self.transport, self.max_dto, self.pad_frames) for size in sizes)
+        return DaqLoad(
+            daq_idx=daq_idx,
+            event_channel=setup.event_channel,
+            cycle_time=cycle_time,
+            prescaler=prescaler,
+            frames_per_second=len(sizes) * rate,
+            bytes_per_second=sum(sizes) * rate,
+            bits_per_second=bits * rate,
+        )
+
+    def check_resources(self, daq_setups) -> list:
+        """Check DAQ configuration against slave resources.
+
+        Returns
+        -------
+        list of str
+            Problem descriptions, empty if everything fits.
+        """
+        problems = []
+        processor = self.daq_info["processor"]
+        max_daq = processor.get("maxDaq") or 0
+        if max_daq and len(daq_setups) > max_daq - (processor.get("minDaq") or 0):
+            problems.append("{} DAQ lists required, slave provides {}.".format(len(daq_setups), max_daq))
+        odt_counts = [len(setup.odts or []) for setup in daq_setups]
+        if self.idf == "IDF_ABS_ODT_NUMBER":
+            if sum(odt_counts) > MAX_PID + 1:
+                problems.append("{} ODTs exceed absolute ODT number range ({}).".format(sum(odt_counts), MAX_PID + 1))
+        else:
+            for daq_idx, count in enumerate(odt_counts):
+                if count > MAX_PID + 1:
+                    problems.append("DAQ list #{}: {} ODTs exceed ODT number range.".format(daq_idx, count))
+        for daq_idx, setup in enumerate(daq_setups):
+            for odt_idx, size in enumerate(self.odt_sizes(setup)):
+                if size > self.max_dto:
+                    problems.append("DAQ list #{} / ODT #{}: {} bytes exceed MAX_DTO.".format(daq_idx, odt_idx, size))
+            if (setup.prescaler or 1) > 1 and not processor.get("properties", {}).get("prescalerSupported", True):
+                problems.append("DAQ list #{}: prescaler not supported by slave.".format(daq_idx))
+            if self.event_channels.get(setup.event_channel) is None and self.event_channels:
+                problems.append("DAQ list #{}: unknown event channel {}.".format(daq_idx, setup.event_channel))
+        for event_channel, count in Counter(setup.event_channel for setup in daq_setups).items():
+            channel = self.event_channels.get(event_channel)
+            if channel is not None and channel.max_daq_list and count > channel.max_daq_list:
+                problems.append(
+                    "Event channel {}: {} DAQ lists, maximum is {}.".format(event_channel, count, channel.max_daq_list)
+                )
+        return problems
+
+    def estimate(self, daq_setups, prescalers: dict = None) -> BusLoadPlan:
+        """
+        Parameters
+        ----------
+        daq_setups: list of `DaqListSetup`
+
+        prescalers: dict
+            DAQ list number ==> prescaler, overrides the prescalers of `daq_setups`.
+
+        Returns
+        -------
+        `BusLoadPlan`
+            `bus_load` is a fraction of `bitrate` (1.0 == 100%). Sporadic event channels are not accounted for.
+        """
+        prescalers = prescalers or {}
+        loads = [self.daq_load(daq_idx, setup, prescalers.get(daq_idx)) for daq_idx, setup in enumerate(daq_setups)]
+        return BusLoadPlan(
+            daq_loads=loads,
+            frames_per_second=sum(load.frames_per_second for load in loads),
+            bytes_per_second=sum(load.bytes_per_second for load in loads),
+            bus_load=sum(load.bits_per_second for load in loads) / self.bitrate,
+            problems=self.check_resources(daq_setups),
+        )
+
+    def suggest_prescalers(self, daq_setups, target_load: float) -> dict:
+        """Increase prescalers of the most demanding DAQ lists until `target_load` is met.
+
+        Returns
+        -------
+        dict
+            DAQ list number ==> prescaler (all DAQ lists) or None, if `target_load` can't be reached.
+        """
+        prescalers = {daq_idx: setup.prescaler or 1 for daq_idx, setup in enumerate(daq_setups)}
+        target_bits = target_load * self.bitrate
+        while True:
+            loads = self.estimate(daq_setups, prescalers).daq_loads
+            total = sum(load.bits_per_second for load in loads)
+            if total <= target_bits:
+                return prescalers
+            candidates = [load for load in loads if load.prescaler < MAX_PRESCALER and load.bits_per_second > 0.0]
+            if not candidates:
+                return None
+            worst = max(candidates, key=lambda load: load.bits_per_second)
+            # Smallest prescaler bringing this DAQ list down by the excess (or at least one step).
+            excess = total - target_bits
+            base = worst.bits_per_second * worst.prescaler
+            required = base / max(worst.bits_per_second - excess, base / MAX_PRESCALER)
+            prescalers[worst.daq_idx] = min(MAX_PRESCALER, max(worst.prescaler + 1, int(required + 0.999999)))
+
+    def suggest_event_assignments(self, daq_setups, prescalers: dict) -> dict:
+        """Propose slower event channels instead of prescalers.
+
+        For every DAQ list with an increased prescaler the fastest cyclic event channel not faster
+        than the effective sampling period is chosen.
+
+        Returns
+        -------
+        dict
+            DAQ list number ==> event channel number.
+        """
+        result = {}
+        for daq_idx, setup in enumerate(daq_setups):
+            prescaler = prescalers.get(daq_idx, setup.prescaler or 1)
+            cycle_time = self.cycle_time(setup.event_channel)
+            if cycle_time is None or prescaler <= (setup.prescaler or 1):
+                continue
+            period = cycle_time * prescaler
+            candidates = [
+                (channel_time, number)
+                for number, channel_time in ((n, self.cycle_time(n)) for n in self.event_channels)
+                if channel_time is not None and channel_time >= period * (1.0 - 1e-9)
+            ]
+            if candidates:
+                result[daq_idx] = min(candidates)[1]
+        return result
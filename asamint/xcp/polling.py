@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Polling acquisition for MEASUREMENTs not reachable by DAQ.
+
+Requested addresses are merged into continuous blocks, each block is fetched with a single
+SHORT_UPLOAD (or SET_MTA + UPLOADs if larger than MAX_CTO). Samples are timestamped on the host
+and recorded as pseudo-DTOs, so the `.xmraw` / MDF pipeline of `XCPMeasurement` is used unchanged:
+every polling rate corresponds to a DAQ list, every block to an ODT.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+import bisect
+from collections import defaultdict
+import heapq
+import struct
+import time
+
+from asamint.a2l.groups import GroupResolver
+from asamint.asam import TYPE_SIZES
+from asamint.utils.optimize import McObject, make_continuous_blocks
+from asamint.xcp import XCPMeasurement
+from asamint.xcp.daq import DaqEntry, DaqListSetup
+from asamint.xcp.reco import Worker, struct_byte_order_prefix
+
+POLLING_DAQ_INFO = {
+    "processor": {
+        "minDaq": 0,
+        "maxDaq": 0,
+        "keyByte": {
+            "identificationField": "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD",
+            "addressExtension": "AE_DIFFERENT_WITHIN_ODT",
+        },
+    },
+    "resolution": {
+        "timestampTicks": 0,
+        "maxOdtEntrySizeDaq": 0,
+        "granularityOdtEntrySizeDaq": 1,
+        "timestampMode": {"unit": "DAQ_TIMESTAMP_UNIT_1US", "fixed": False, "size": "NO_TIME_STAMP"},
+    },
+}
+
+MAX_POLLING_BLOCKS = 0x100  # The ODT number field of the record header is a single byte.
+
+
+def polling_layout(measurement_summary, rates: dict, max_cto: int) -> list:
+    """Group MEASUREMENTs by polling rate and merge them into upload blocks.
+
+    Parameters
+    ----------
+    measurement_summary: list of tuples
+        (name, address, ext, datatype, size, compu method name)
+
+    rates: dict
+        MEASUREMENT name ==> polling rate in Hz.
+
+    max_cto: int
+        Blocks up to MAX_CTO - 1 bytes can be fetched with a single SHORT_UPLOAD.
+
+    Returns
+    -------
+    list of `DaqListSetup`
+        One entry per polling rate (and per `MAX_POLLING_BLOCKS` blocks), fastest first;
+        `event_channel` is the polling rate, each ODT consists of a single entry covering one block.
+    """
+    by_rate = defaultdict(list)
+    for meas in measurement_summary:
+        by_rate[rates[meas[0]]].append(meas)
+    result = []
+    for rate in sorted(by_rate, reverse=True):
+        summary = by_rate[rate]
+        objects = [McObject(name, address, size, ext) for name, address, ext, _, size, _ in summary]
+        blocks = make_continuous_blocks(objects, upper_bound=max_cto - 1)
+        starts = [(block.ext, block.address) for block in blocks]
+        parts = defaultdict(list)
+        for meas in summary:
+            _, address, ext, _, _, _ = meas
+            parts[(bisect.bisect_right(starts, (ext, address)) - 1) // MAX_POLLING_BLOCKS].append(meas)
+        for part in sorted(parts):
+            part_blocks = blocks[part * MAX_POLLING_BLOCKS : (part + 1) * MAX_POLLING_BLOCKS]
+            result.append(
+                DaqListSetup(
+                    event_channel=rate,
+                    prescaler=1,
+                    priority=0,
+                    blocks=part_blocks,
+                    measurement_summary=parts[part],
+                    odts=[[DaqEntry(0xFF, block.length, block.address, block.ext)] for block in part_blocks],
+                )
+            )
+    return result
+
+
+class PollingScheduler:
+    """Keep track of due times of polling groups.
+
+    Parameters
+    ----------
+    periods: list of float
+        Polling period (in seconds) of every group.
+
+    start: float
+        Time of the first poll.
+
+    Note
+    ----
+    If polling can't keep up, missed cycles are skipped (and counted in `overruns`)
+    instead of being caught up in a burst.
+    """
+
+    def __init__(self, periods, start: float = 0.0):
+        self.periods = list(periods)
+        self.overruns = [0] * len(self.periods)
+        self._heap = [(start, idx) for idx in range(len(self.periods))]
+        heapq.heapify(self._heap)
+
+    def next_due(self):
+        """
+        Returns
+        -------
+        tuple: (due time, group index)
+        """
+        return self._heap[0]
+
+    def done(self, now: float):
+        """Reschedule the group returned by `next_due()` after it has been polled at `now`."""
+        due, idx = heapq.heappop(self._heap)
+        period = self.periods[idx]
+        next_due = due + period
+        if next_due <= now:
+            missed = int((now - next_due) // period) + 1
+            self.overruns[idx] += missed
+            next_due += missed * period
+        heapq.heappush(self._heap, (next_due, idx))
+
+
+class XCPPolling(XCPMeasurement):
+    """Polling based acquisition, for MEASUREMENTs DAQ can't reach."""
+
+    EXPERIMENT_PARAMETER_MAP = {
+        **XCPMeasurement.EXPERIMENT_PARAMETER_MAP,
+        #                               Type    Req'd   Default
+        "POLLING_RATES": (dict, False, {}),  # GROUP or MEASUREMENT name ==> rate in Hz.
+        "DEFAULT_POLLING_RATE": (float, False, 10.0),
+    }
+
+    def collect_measurements(self, groups=None):
+        """
+        Returns
+        -------
+        tuple: (measurement_summary, rates)
+        """
+        if groups is None:
+            groups = self.experiment_config.get("GROUPS")
+        configured = self.experiment_config.get("POLLING_RATES")
+        default_rate = self.experiment_config.get("DEFAULT_POLLING_RATE")
+        resolver = GroupResolver(self.session, self.a2l_hash)
+        measurement_summary = []
+        rates = {}
+        for name in groups:
+            group_rates = {}
+            for path, measurements in resolver.walk(name):
+                parent_rate = group_rates[path[:-1]] if len(path) > 1 else default_rate
+                group_rate = group_rates[path] = configured.get(path[-1], parent_rate)
+                for meas in measurements:
+                    if meas.is_virtual or meas.name in rates:
+                        continue
+                    rates[meas.name] = float(configured.get(meas.name, group_rate))
+                    measurement_summary.append(
+                        (meas.name, meas.address, meas.ext, meas.datatype, TYPE_SIZES.get(meas.datatype), meas.compu_method)
+                    )
+        return measurement_summary, rates
+
+    def poll_block(self, xcp_master, max_cto: int, entry: DaqEntry) -> bytes:
+        if entry.length <= max_cto - 1:
+            return xcp_master.shortUpload(entry.length, entry.address, entry.ext)
+        xcp_master.setMta(entry.address, entry.ext)
+        return xcp_master.pull(entry.length)
+
+    def start_polling(self, xcp_master, groups=None, duration: float = 10.0, log_file_name: str = "polling"):
+        """Poll MEASUREMENTs of `groups` for `duration` seconds and convert the recording to MDF.
+
+        Returns
+        -------
+        str
+            Name of the MDF file.
+        """
+        slp = xcp_master.slaveProperties
+        max_cto = slp["maxCto"]
+        measurement_summary, rates = self.collect_measurements(groups)
+        setups = polling_layout(measurement_summary, rates, max_cto)
+        for idx, setup in enumerate(setups):
+            self.logger.info("Polling group #{}: {} Hz, {} request(s) per cycle.".format(idx, setup.event_channel, len(setup.odts)))
+        header = struct.Struct("{}BH".format(struct_byte_order_prefix(slp["byteOrder"])))
+        worker = Worker(log_file_name)
+        worker.start()
+        start = time.perf_counter()
+        scheduler = PollingScheduler([1.0 / setup.event_channel for setup in setups], start)
+        counter = 0
+        try:
+            while setups:
+                due, idx = scheduler.next_due()
+                if due - start >= duration:
+                    break
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                timestamp = time.time()
+                frames = []
+                for odt_idx, odt in enumerate(setups[idx].odts):
+                    data = self.poll_block(xcp_master, max_cto, odt[0])
+                    frames.append((counter & 0xFFFF, timestamp, header.pack(odt_idx, idx) + bytes(data)))
+                    counter += 1
+                worker.frame_queue.put(frames)
+                scheduler.done(time.perf_counter())
+        finally:
+            worker.shutdown_event.set()
+            worker.join()
+        for idx, overruns in enumerate(scheduler.overruns):
+            if overruns:
+                self.logger.warning("Polling group #{}: {} cycle(s) missed.".format(idx, overruns))
+        return self.convert_to_mdf(log_file_name, slp, POLLING_DAQ_INFO, setups, timestamps=False)
@@ -88,6 +88,10 @@ class XcpLogCategory(enum.IntEnum):
     """ """
 
     DAQ = 1
+    CMD = 2  # Command (s. `asamint.xcp.replay`).
+    RES = 3  # Positive response.
+    ERR = 4  # Negative response.
+    SESSION = 5  # Session information, e.g. slave properties.
 
 
 class XcpLogFileParseError(Exception):
@@ -151,9 +155,19 @@ class XcpLogFileWriter:
         self._is_closed = False
 
     def add_xcp_frames(self, xcp_frames: list):
-        for counter, timestamp, raw_data in xcp_frames:
+        self.add_records((XcpLogCategory.DAQ, counter, timestamp, raw_data) for counter, timestamp, raw_data in xcp_frames)
+
+    def add_records(self, records):
+        """Add records of any category.
+
+        Parameters
+        ----------
+        records: iterable of tuples
+            (category, counter, timestamp, payload)
+        """
+        for category, counter, timestamp, raw_data in records:
             length = len(raw_data)
-            item = DAQ_RECORD_STRUCT.pack(1, counter, timestamp, length) + raw_data
+            item = DAQ_RECORD_STRUCT.pack(category, counter, timestamp, length) + raw_data
             self.intermediate_storage.append(item)
             self.container_size_uncompressed += len(item)
             if self.container_size_uncompressed > self.chunk_size:
@@ -365,57 +379,49 @@ class Worker(Process):
                 continue
             else:
                 log_writer.add_xcp_frames(frames)
+        while True:  # Don't lose frames queued before shutdown.
+            try:
+                frames = self.frame_queue.get(block=True, timeout=0.1)
+            except Exception:
+                break
+            else:
+                log_writer.add_xcp_frames(frames)
         log_writer.close()
         self.frame_queue.close()
         self.frame_queue.join_thread()
 
 
 class LogConverter(Process):
-    def __init__(self, slave_properties, daq_info, log_file_name):
+    """Decode a raw measurement file.
+
+    Parameters
+    ----------
+    slave_properties: dict
+
+    daq_info: dict
+        As returned by `Master.getDaqInfo()`.
+
+    log_file_name: str
+        Don't specify extension.
+
+    daq_setups: list of `DaqListSetup`
+        DAQ layout used for recording; if None, frames are only counted.
+
+    chunk_size: int
+        Number of frames decoded at once.
+    """
+
+    def __init__(self, slave_properties, daq_info, log_file_name, daq_setups=None, chunk_size: int = 10000):
         super(LogConverter, self).__init__()
         self.daq_info = daq_info
         self.slave_properties = slave_properties
         self.byte_order_prefix = struct_byte_order_prefix(slave_properties["byteOrder"])
-
+        self.daq_setups = daq_setups
+        self.chunk_size = chunk_size
         self.log_file_name = log_file_name
 
     def run(self):
-
-        DAQ_TIMESTAMP_FORMAT = {
-            "S1": "B",
-            "S2": "H",
-            "S4": "L",
-        }
-
-        DAQ_PID_FORMAT = {
-            "IDF_ABS_ODT_NUMBER": "B",
-            "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_BYTE": "BB",
-            "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD": "BH",
-            "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD_ALIGNED": "BxH",
-        }
-
-        daq_pro = self.daq_info.get("processor")
-        daq_key_byte = daq_pro.get("keyByte")
-        daq_resolution = self.daq_info.get("resolution")
-        time_stamp_mode = daq_resolution.get("timestampMode")
-        time_stamp_size = time_stamp_mode.get("size")
-        idf = daq_key_byte["identificationField"]
-
-        if idf:
-            daq_pid_struct = struct.Struct("{}{}".format(self.byte_order_prefix, DAQ_PID_FORMAT.get(idf)))
-            # daq_pid_size = daq_pid_struct.size
-        else:
-            daq_pid_struct = None
-            # daq_pid_size = 0
-        ts_format = DAQ_TIMESTAMP_FORMAT.get(time_stamp_size)
-        if ts_format:
-            pass
-            # daq_timestamp_struct = struct.Struct("{}{}".format(self.byte_order_prefix, ts_format))
-            # daq_timestamp_size = daq_timestamp_struct.size
-        else:
-            pass
-            # daq_timestamp_struct = None
-            # daq_timestamp_size = 0
+        from asamint.xcp.decoder import DaqDecoder
 
         reader = XcpLogFileReader(self.log_file_name)
         print("# of containers:    ", reader.num_containers)
@@ -425,12 +431,23 @@ class LogConverter(Process):
         print("Compression ratio:   {:3.3f}".format(reader.compression_ratio or 0.0))
         print("-" * 32, end="\n\n")
         print("Processing frames...")
-        for frame in reader.frames:
-            cat, counter, timestamp, data = frame
-            if daq_pid_struct:
-                # daq_pid = daq_pid_struct.unpack(data[:daq_pid_size])
-                # daq_timestamp = daq_timestamp_struct.unpack(data[daq_pid_size : daq_pid_size + daq_timestamp_size])
-                # payload = data[daq_pid_size + daq_timestamp_size :]
-                pass
-                # print("PID/TS", daq_pid, daq_timestamp, "DATA:", payload.tolist())
+        if self.daq_setups:
+            decoder = DaqDecoder(self.daq_setups, self.daq_info, self.slave_properties["byteOrder"])
+            sample_counts = [0] * len(self.daq_setups)
+            frames = []
+            timestamps = []
+            for frame in reader.frames:
+                if frame.category != XcpLogCategory.DAQ:
+                    continue
+                frames.append(frame.payload)
+                timestamps.append(frame.timestamp)
+                if len(frames) >= self.chunk_size:
+                    for daq_list in decoder.decode(frames, timestamps):
+                        sample_counts[daq_list.daq_idx] += len(daq_list.timestamps)
+                    frames = []
+                    timestamps = []
+            for daq_list in decoder.decode(frames, timestamps):
+                sample_counts[daq_list.daq_idx] += len(daq_list.timestamps)
+            for daq_idx, count in enumerate(sample_counts):
+                print("DAQ list #{}: {} samples".format(daq_idx, count))
         print("OK, done.")
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Record and replay XCP sessions.
+
+`SessionRecorder` is a proxy of a `pyxcp` master; every command (method call), its response
+or error, and every DTO delivered to `cro_callback` is written with a timestamp to a `.xmraw`
+file (s. `asamint.xcp.reco`, categories CMD/RES/ERR/DAQ). `ReplayMaster` plays such a session back,
+either as fast as possible or in real time, so `CalibrationData` / `XCPMeasurement` runs can be
+profiled without hardware.
+
+Usage
+-----
+
+.. code-block:: python
+
+    with SessionRecorder(xcp_master, "session") as recorder:
+        calibration_data.upload_parameters(recorder)
+
+    replay = ReplayMaster("session")
+    calibration_data.upload_parameters(replay)
+
+Note
+----
+Recording takes place at the level of the master API used by `asamint` (e.g. `pull`, not the
+individual UPLOAD packets), i.e. replay is exact as long as `asamint` issues the same calls.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+import builtins
+from collections import namedtuple
+from collections.abc import Mapping
+import enum
+import json
+from logging import getLogger
+import threading
+import time
+
+import numpy as np
+from pyxcp.types import XcpResponseError
+
+from asamint.exceptions import ReplayMismatchError
+from asamint.xcp.reco import XcpLogCategory, XcpLogFileReader, XcpLogFileWriter
+
+
+class AttrDict(dict):
+    """`dict` with attribute access (replayed `Container`s, slave properties, ...)."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def encode(value):
+    """Convert command arguments and responses to JSON-serializable objects."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        return {"__bytes__": bytes(value).hex()}
+    elif isinstance(value, np.ndarray):
+        return {"__bytes__": value.tobytes().hex()}
+    elif isinstance(value, enum.Enum):
+        return value.name
+    elif hasattr(value, "_asdict"):
+        return {"__record__": type(value).__name__, "fields": {k: encode(v) for k, v in value._asdict().items()}}
+    elif isinstance(value, Mapping):
+        return {"__dict__": [[encode(k), encode(v)] for k, v in value.items() if not str(k).startswith("_")]}
+    elif isinstance(value, (list, tuple)):
+        return [encode(v) for v in value]
+    return str(value)
+
+
+def decode(value):
+    """Inverse of `encode`; records become namedtuples, mappings `AttrDict`s."""
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    elif isinstance(value, dict):
+        if "__bytes__" in value:
+            return bytes.fromhex(value["__bytes__"])
+        elif "__record__" in value:
+            fields = value["fields"]
+            return namedtuple(value["__record__"], list(fields))(**{k: decode(v) for k, v in fields.items()})
+        elif "__dict__" in value:
+            return AttrDict((decode(k), decode(v)) for k, v in value["__dict__"])
+    return value
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf8")
+
+
+class SessionRecorder:
+    """Recording proxy of a `pyxcp` master.
+
+    Parameters
+    ----------
+    xcp_master:
+
+    file_name: str
+        Don't specify extension.
+
+    prealloc: int
+        s. `XcpLogFileWriter`
+    """
+
+    def __init__(self, xcp_master, file_name: str, prealloc: int = 100):
+        self.__dict__.update(
+            _master=xcp_master,
+            _writer=XcpLogFileWriter(file_name, prealloc=prealloc),
+            _lock=threading.Lock(),
+            _start=time.perf_counter(),
+            _sequence=0,
+            _cro_callback=None,
+            logger=getLogger(self.__class__.__name__),
+        )
+        self._record_session()
+
+    def _write(self, category, payload: bytes, counter: int = None) -> None:
+        with self._lock:
+            if counter is None:
+                counter = self._sequence
+                self.__dict__["_sequence"] = (self._sequence + 1) & 0xFFFF
+            self._writer.add_records([(category, counter, time.perf_counter() - self._start, payload)])
+
+    def _record_session(self) -> None:
+        properties = getattr(self._master, "slaveProperties", None)
+        self._write(XcpLogCategory.SESSION, _dumps({"slaveProperties": encode(properties)}))
+
+    def __getattr__(self, name):
+        attr = getattr(self._master, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def method(*args, **kws):
+            self._write(XcpLogCategory.CMD, _dumps({"name": name, "args": encode(args), "kws": encode(kws)}))
+            try:
+                result = attr(*args, **kws)
+            except Exception as e:
+                self._write(XcpLogCategory.ERR, _dumps({"type": type(e).__name__, "args": encode(e.args)}))
+                raise
+            self._write(XcpLogCategory.RES, _dumps(encode(result)))
+            if name == "connect":
+                self._record_session()
+            return result
+
+        return method
+
+    def __setattr__(self, name, value):
+        if name == "cro_callback":
+            self.__dict__["_cro_callback"] = value
+            self._master.cro_callback = self._dto_callback
+        else:
+            setattr(self._master, name, value)
+
+    def _dto_callback(self, category, response, counter, length, timestamp):
+        self._write(XcpLogCategory.DAQ, bytes(response), counter)
+        if self._cro_callback is not None:
+            self._cro_callback(category, response, counter, length, timestamp)
+
+    def close(self) -> None:
+        with self._lock:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ReplayMaster:
+    """Play back a session recorded by `SessionRecorder`.
+
+    Parameters
+    ----------
+    file_name: str
+        Don't specify extension.
+
+    realtime: bool
+        Reproduce recorded timing (responses and DTOs aren't delivered before their recorded time),
+        otherwise run as fast as possible.
+
+    strict: bool
+        Command arguments must match the recording (otherwise only command names are checked).
+
+    Note
+    ----
+    DTOs recorded before a response are delivered to `cro_callback` before that command returns;
+    call `finish()` to deliver DTOs recorded after the last command.
+    """
+
+    def __init__(self, file_name: str, realtime: bool = False, strict: bool = True):
+        self.logger = getLogger(self.__class__.__name__)
+        reader = XcpLogFileReader(file_name)
+        self.records = [(r.category, r.counter, r.timestamp, bytes(r.payload)) for r in reader.frames]
+        reader.close()
+        self.realtime = realtime
+        self.strict = strict
+        self.cro_callback = None
+        self.slaveProperties = None
+        self._position = 0
+        self._start = None
+        self._deliver(self._next_command_index())
+
+    def _wait(self, timestamp: float) -> None:
+        if self.realtime:
+            delay = self._start + timestamp - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _deliver(self, end: int) -> None:
+        """Process DTOs and session records up to (excluding) `end`."""
+        if self._start is None:
+            self._start = time.perf_counter()
+        for category, counter, timestamp, payload in self.records[self._position : end]:
+            if category == XcpLogCategory.SESSION:
+                self.slaveProperties = decode(json.loads(payload)["slaveProperties"])
+            elif category == XcpLogCategory.DAQ and self.cro_callback is not None:
+                self._wait(timestamp)
+                response = np.frombuffer(payload, dtype=np.uint8)
+                self.cro_callback(XcpLogCategory.DAQ, response, counter, len(payload), self._start + timestamp)
+        self._position = max(self._position, end)
+
+    def _next_command_index(self, start: int = None, categories=(XcpLogCategory.CMD,)) -> int:
+        for idx in range(self._position if start is None else start, len(self.records)):
+            if self.records[idx][0] in categories:
+                return idx
+        return len(self.records)
+
+    def _replay(self, name: str, args, kws):
+        idx = self._next_command_index()
+        self._deliver(idx)
+        if idx >= len(self.records):
+            raise ReplayMismatchError("Session exhausted, unexpected command '{}'.".format(name))
+        command = json.loads(self.records[idx][3])
+        if command["name"] != name:
+            raise ReplayMismatchError("Expected command '{}', got '{}'.".format(command["name"], name))
+        if self.strict:
+            actual = json.loads(_dumps({"args": encode(args), "kws": encode(kws)}))
+            if actual["args"] != command["args"] or actual["kws"] != command["kws"]:
+                raise ReplayMismatchError("Arguments of '{}' differ from recording.".format(name))
+        self._position = idx + 1
+        res_idx = self._next_command_index(categories=(XcpLogCategory.RES, XcpLogCategory.ERR))
+        self._deliver(res_idx)
+        if res_idx >= len(self.records):
+            raise ReplayMismatchError("Response to '{}' missing.".format(name))
+        category, _, timestamp, payload = self.records[res_idx]
+        self._position = res_idx + 1
+        self._wait(timestamp)
+        if category == XcpLogCategory.ERR:
+            error = json.loads(payload)
+            exc_type = XcpResponseError if error["type"] == "XcpResponseError" else getattr(builtins, error["type"], None)
+            if not (isinstance(exc_type, type) and issubclass(exc_type, Exception)):
+                exc_type = RuntimeError
+            raise exc_type(*decode(error["args"]))
+        return decode(json.loads(payload))
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def method(*args, **kws):
+            return self._replay(name, args, kws)
+
+        return method
+
+    def finish(self) -> None:
+        """Deliver remaining DTOs."""
+        self._deliver(len(self.records))
+
+    @property
+    def exhausted(self) -> bool:
+        return self._next_command_index() >= len(self.records)
@@ -0,0 +1,571 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""In-process simulated XCP slave.
+
+`SimulatedSlave` implements the subset of the `pyxcp.master.Master` API used by `asamint`
+(memory transfers, BUILD_CHECKSUM, DAQ configuration), backed by an `objutils.Image`.
+Running DAQ lists produce DTOs at the configured event channel rates, which are delivered
+to `cro_callback` like a real transport does, so uploads, downloads and measurements can be
+benchmarked and tested without hardware.
+
+Usage
+-----
+
+.. code-block:: python
+
+    slave = SimulatedSlave(image, max_cto=8, max_dto=8, latency=0.0005)
+    slave.connect()
+    calibration_data.upload_parameters(slave)
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import namedtuple
+from logging import getLogger
+import struct
+import threading
+import time
+
+import numpy as np
+from objutils import Image, Section
+from pyxcp.types import XcpResponseError
+
+from asamint.xcp.checksum import checksum
+from asamint.xcp.daq import DAQ_TIMESTAMP_SIZE, DaqEntry
+from asamint.xcp.reco import XcpLogCategory, struct_byte_order_prefix
+
+BuildChecksumResponse = namedtuple("BuildChecksumResponse", "checksumType checksum")
+
+StartStopDaqListResponse = namedtuple("StartStopDaqListResponse", "firstPid")
+
+DaqFrame = namedtuple("DaqFrame", "counter timestamp frame")
+
+TIMESTAMP_UNITS = {
+    "DAQ_TIMESTAMP_UNIT_1NS": 1e-9,
+    "DAQ_TIMESTAMP_UNIT_10NS": 1e-8,
+    "DAQ_TIMESTAMP_UNIT_100NS": 1e-7,
+    "DAQ_TIMESTAMP_UNIT_1US": 1e-6,
+    "DAQ_TIMESTAMP_UNIT_10US": 1e-5,
+    "DAQ_TIMESTAMP_UNIT_100US": 1e-4,
+    "DAQ_TIMESTAMP_UNIT_1MS": 1e-3,
+    "DAQ_TIMESTAMP_UNIT_10MS": 1e-2,
+    "DAQ_TIMESTAMP_UNIT_100MS": 1e-1,
+    "DAQ_TIMESTAMP_UNIT_1S": 1.0,
+}
+
+EVENT_CHANNEL_TIME_UNITS = {
+    "EVENT_CHANNEL_TIME_UNIT_1NS": 1e-9,
+    "EVENT_CHANNEL_TIME_UNIT_10NS": 1e-8,
+    "EVENT_CHANNEL_TIME_UNIT_100NS": 1e-7,
+    "EVENT_CHANNEL_TIME_UNIT_1US": 1e-6,
+    "EVENT_CHANNEL_TIME_UNIT_10US": 1e-5,
+    "EVENT_CHANNEL_TIME_UNIT_100US": 1e-4,
+    "EVENT_CHANNEL_TIME_UNIT_1MS": 1e-3,
+    "EVENT_CHANNEL_TIME_UNIT_10MS": 1e-2,
+    "EVENT_CHANNEL_TIME_UNIT_100MS": 1e-1,
+    "EVENT_CHANNEL_TIME_UNIT_1S": 1.0,
+}
+
+DAQ_MODE_TIMESTAMP = 0x10
+
+DEFAULT_EVENT_CHANNELS = (
+    {"name": "1ms", "cycle": 1, "unit": "EVENT_CHANNEL_TIME_UNIT_1MS", "priority": 0, "maxDaqList": 0xFF},
+    {"name": "10ms", "cycle": 10, "unit": "EVENT_CHANNEL_TIME_UNIT_1MS", "priority": 0, "maxDaqList": 0xFF},
+    {"name": "100ms", "cycle": 100, "unit": "EVENT_CHANNEL_TIME_UNIT_1MS", "priority": 0, "maxDaqList": 0xFF},
+)
+
+
+class SlaveProperties(dict):
+    """`dict` with attribute access, like `Master.slaveProperties`."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class DaqListState:
+    def __init__(self):
+        self.odts = []
+        self.event_channel = 0
+        self.prescaler = 1
+        self.mode = 0
+        self.selected = False
+        self.running = False
+        self.first_pid = 0
+        self.next_time = None
+
+
+class SimulatedSlave:
+    """In-process XCP slave.
+
+    Parameters
+    ----------
+    image: `objutils.Image`
+        Memory contents of address extension 0; other address extensions may be set via `memory`.
+
+    max_cto: int
+
+    max_dto: int
+
+    byte_order: str
+        "INTEL" or "MOTOROLA"
+
+    slave_block_mode: bool
+
+    master_block_mode: bool
+
+    max_bs: int
+
+    checksum_type: str
+        s. `asamint.xcp.checksum.ALGORITHMS`
+
+    latency: float
+        Seconds per command (request/response round trip).
+
+    identification_field: str
+        DAQ identification field type, e.g. "IDF_ABS_ODT_NUMBER".
+
+    timestamp_size: str
+        "S1", "S2", "S4" or "" (no timestamps).
+
+    timestamp_unit: str
+
+    timestamp_ticks: int
+
+    event_channels: list of dict
+        Like the `channels` part of `Master.getDaqInfo()`.
+
+    rate_scale: float
+        Event channels fire `rate_scale` times faster than their nominal cycle.
+
+    stimulus: callable
+        Called as `stimulus(slave, time)` before every DAQ sample, e.g. to generate synthetic signals
+        by writing to `slave.memory`.
+
+    realtime: bool
+        Deliver DTOs from a background thread while DAQ lists are running; otherwise
+        DTOs are only produced by explicit calls of `daq_frames()` (deterministic, as fast as possible).
+    """
+
+    def __init__(
+        self,
+        image=None,
+        max_cto: int = 8,
+        max_dto: int = 8,
+        byte_order: str = "INTEL",
+        slave_block_mode: bool = True,
+        master_block_mode: bool = True,
+        max_bs: int = 0xFF,
+        checksum_type: str = "XCP_CRC_32",
+        latency: float = 0.0,
+        identification_field: str = "IDF_ABS_ODT_NUMBER",
+        timestamp_size: str = "S4",
+        timestamp_unit: str = "DAQ_TIMESTAMP_UNIT_1US",
+        timestamp_ticks: int = 1,
+        event_channels=DEFAULT_EVENT_CHANNELS,
+        rate_scale: float = 1.0,
+        stimulus=None,
+        realtime: bool = True,
+    ):
+        self.logger = getLogger(self.__class__.__name__)
+        self.memory = {0: image if image is not None else Image(sections=[Section(0, bytes(0x10000))], join=False)}
+        self.slaveProperties = SlaveProperties(
+            maxCto=max_cto,
+            maxDto=max_dto,
+            byteOrder=byte_order,
+            slaveBlockMode=slave_block_mode,
+            masterBlockMode=master_block_mode,
+            maxBs=max_bs,
+            minSt=0,
+            bytesPerElement=1,
+            addressGranularity="BYTE",
+            optionalCommMode=False,
+            supportsCalpag=True,
+            supportsDaq=True,
+            supportsPgm=False,
+            supportsStim=False,
+            transportLayer="SIMULATED",
+        )
+        self.checksum_type = checksum_type
+        self.latency = latency
+        self.identification_field = identification_field
+        self.timestamp_size = timestamp_size
+        self.timestamp_unit = timestamp_unit
+        self.timestamp_ticks = timestamp_ticks
+        self.event_channels = list(event_channels)
+        self.rate_scale = rate_scale
+        self.stimulus = stimulus
+        self.realtime = realtime
+        self.cro_callback = None
+        self.connected = False
+        self.commands = 0
+        self.mta = (0, 0)
+        self.daq_lists = []
+        self._daq_ptr = None
+        self._download_remaining = 0
+        self._lock = threading.RLock()
+        self._daq_thread = None
+        self._daq_stop = threading.Event()
+        self.daq_time = 0.0
+        self._counter = 0
+        self._byte_order = struct_byte_order_prefix(byte_order)
+
+    # Helpers.
+
+    def _command(self):
+        if not self.connected:
+            raise XcpResponseError("ERR_CMD_UNKNOWN")
+        self.commands += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _image(self, ext: int):
+        if ext not in self.memory:
+            raise XcpResponseError("ERR_OUT_OF_RANGE")
+        return self.memory[ext]
+
+    def read(self, address: int, length: int, ext: int = 0) -> bytes:
+        try:
+            return bytes(self._image(ext).read(address, length))
+        except Exception as e:
+            if isinstance(e, XcpResponseError):
+                raise
+            raise XcpResponseError("ERR_ACCESS_DENIED")
+
+    def write(self, address: int, data: bytes, ext: int = 0) -> None:
+        try:
+            self._image(ext).write(address, bytes(data))
+        except Exception as e:
+            if isinstance(e, XcpResponseError):
+                raise
+            raise XcpResponseError("ERR_ACCESS_DENIED")
+
+    def _transfer(self, length: int, download: bool = False) -> None:
+        if download:
+            max_length = (self.slaveProperties.maxCto - 2) * max(self.slaveProperties.maxBs, 1)
+            if not self.slaveProperties.masterBlockMode:
+                max_length = self.slaveProperties.maxCto - 2
+        elif self.slaveProperties.slaveBlockMode:
+            max_length = 0xFF
+        else:
+            max_length = self.slaveProperties.maxCto - 1
+        if length > max_length:
+            raise XcpResponseError("ERR_OUT_OF_RANGE")
+
+    # Standard commands.
+
+    def connect(self, mode: int = 0):
+        self.connected = True
+        self.commands += 1
+        return self.slaveProperties
+
+    def disconnect(self):
+        self._command()
+        self._stop_daq()
+        self.connected = False
+
+    def getDaqInfo(self) -> dict:
+        self._command()
+        return {
+            "processor": {
+                "minDaq": 0,
+                "maxDaq": 0xFFFF,
+                "keyByte": {
+                    "identificationField": self.identification_field,
+                    "addressExtension": "AE_DIFFERENT_WITHIN_ODT",
+                    "optimisationType": "OM_DEFAULT",
+                },
+            },
+            "resolution": {
+                "timestampTicks": self.timestamp_ticks,
+                "maxOdtEntrySizeDaq": 0xFF,
+                "granularityOdtEntrySizeDaq": 1,
+                "maxOdtEntrySizeStim": 0,
+                "granularityOdtEntrySizeStim": 1,
+                "timestampMode": {"unit": self.timestamp_unit, "fixed": False, "size": self.timestamp_size},
+            },
+            "channels": [dict(channel) for channel in self.event_channels],
+        }
+
+    # Memory transfers.
+
+    def setMta(self, address: int, addressExt: int = 0):
+        self._command()
+        self.mta = (addressExt, address)
+
+    def upload(self, length: int) -> bytes:
+        self._command()
+        self._transfer(length)
+        ext, address = self.mta
+        result = self.read(address, length, ext)
+        self.mta = (ext, address + length)
+        return result
+
+    def shortUpload(self, length: int, address: int, addressExt: int = 0) -> bytes:
+        self._command()
+        if length > self.slaveProperties.maxCto - 1:
+            raise XcpResponseError("ERR_OUT_OF_RANGE")
+        result = self.read(address, length, addressExt)
+        self.mta = (addressExt, address + length)
+        return result
+
+    def pull(self, length: int) -> bytes:
+        """Convenience function, like `Master.pull`."""
+        chunk_size = 0xFF if self.slaveProperties.slaveBlockMode else self.slaveProperties.maxCto - 1
+        result = []
+        while length > 0:
+            size = min(length, chunk_size)
+            result.append(self.upload(size))
+            length -= size
+        return b"".join(result)
+
+    def download(self, data: bytes, blockModeLength: int = None):
+        self._command()
+        total = blockModeLength if blockModeLength is not None else len(data)
+        self._transfer(total, download=True)
+        self._write_mta(data)
+        self._download_remaining = total - len(data)
+
+    def downloadNext(self, data: bytes, remainingBlockLength: int, last: bool = False):
+        if not self.slaveProperties.masterBlockMode or remainingBlockLength != self._download_remaining:
+            raise XcpResponseError("ERR_SEQUENCE")
+        self.commands += 1  # No response (unless last), no latency.
+        if last and self.latency:
+            time.sleep(self.latency)
+        self._write_mta(data)
+        self._download_remaining -= len(data)
+
+    def _write_mta(self, data: bytes) -> None:
+        ext, address = self.mta
+        self.write(address, data, ext)
+        self.mta = (ext, address + len(data))
+
+    def push(self, data: bytes):
+        """Convenience function, like `Master.push` (DOWNLOAD_NEXT in master block mode)."""
+        packet_size = self.slaveProperties.maxCto - 2
+        if self.slaveProperties.masterBlockMode:
+            block_size = min(packet_size * max(self.slaveProperties.maxBs, 1), 0xFF)
+        else:
+            block_size = packet_size
+        for offset in range(0, len(data), block_size):
+            block = data[offset : offset + block_size]
+            self.download(block[:packet_size], len(block))
+            for pos in range(packet_size, len(block), packet_size):
+                self.downloadNext(block[pos : pos + packet_size], len(block) - pos, pos + packet_size >= len(block))
+
+    def buildChecksum(self, blocksize: int) -> BuildChecksumResponse:
+        self._command()
+        ext, address = self.mta
+        value = checksum(self.read(address, blocksize, ext), self.checksum_type, self._byte_order)
+        self.mta = (ext, address + blocksize)
+        return BuildChecksumResponse(self.checksum_type, value)
+
+    # DAQ.
+
+    def freeDaq(self):
+        self._command()
+        self._stop_daq()
+        self.daq_lists = []
+
+    def allocDaq(self, daqCount: int):
+        self._command()
+        self.daq_lists = [DaqListState() for _ in range(daqCount)]
+
+    def allocOdt(self, daqListNumber: int, odtCount: int):
+        self._command()
+        self.daq_lists[daqListNumber].odts = [[] for _ in range(odtCount)]
+        pid = 0
+        for daq_list in self.daq_lists:
+            daq_list.first_pid = pid
+            pid += len(daq_list.odts)
+
+    def allocOdtEntry(self, daqListNumber: int, odtNumber: int, odtEntriesCount: int):
+        self._command()
+        self.daq_lists[daqListNumber].odts[odtNumber] = [None] * odtEntriesCount
+
+    def setDaqPtr(self, daqListNumber: int, odtNumber: int, odtEntryNumber: int):
+        self._command()
+        self._daq_ptr = [daqListNumber, odtNumber, odtEntryNumber]
+
+    def _write_odt_entry(self, bitOffset: int, entrySize: int, addressExt: int, address: int):
+        daq_idx, odt_idx, entry_idx = self._daq_ptr
+        odt = self.daq_lists[daq_idx].odts[odt_idx]
+        if entry_idx >= len(odt):
+            raise XcpResponseError("ERR_OUT_OF_RANGE")
+        odt[entry_idx] = DaqEntry(bitOffset, entrySize, address, addressExt)
+        self._daq_ptr[2] += 1
+
+    def writeDaq(self, bitOffset: int, entrySize: int, addressExt: int, address: int):
+        self._command()
+        self._write_odt_entry(bitOffset, entrySize, addressExt, address)
+
+    def writeDaqMultiple(self, daqElements: list):
+        self._command()
+        for element in daqElements:
+            self._write_odt_entry(element["bitOffset"], element["size"], element["addressExt"], element["address"])
+
+    def setDaqListMode(self, mode: int, daqListNumber: int, eventChannelNumber: int, prescaler: int, priority: int):
+        self._command()
+        daq_list = self.daq_lists[daqListNumber]
+        daq_list.mode = mode
+        daq_list.event_channel = eventChannelNumber
+        daq_list.prescaler = max(prescaler, 1)
+
+    def startStopDaqList(self, mode: int, daqListNumber: int) -> StartStopDaqListResponse:
+        self._command()
+        daq_list = self.daq_lists[daqListNumber]
+        if mode == 0x00:
+            daq_list.running = False
+        elif mode == 0x01:
+            daq_list.running = True
+            self._start_daq()
+        else:
+            daq_list.selected = True
+        return StartStopDaqListResponse(daq_list.first_pid)
+
+    def startStopSynch(self, mode: int):
+        self._command()
+        with self._lock:
+            for daq_list in self.daq_lists:
+                if mode == 0x00:
+                    daq_list.running = False
+                elif daq_list.selected:
+                    daq_list.running = mode == 0x01
+                    daq_list.selected = False
+        if any(d.running for d in self.daq_lists):
+            self._start_daq()
+        else:
+            self._stop_daq()
+
+    # DAQ traffic generation.
+
+    def event_period(self, event_channel: int) -> float:
+        """Period (in seconds) of an event channel, scaled by `rate_scale`."""
+        channel = self.event_channels[event_channel]
+        return channel["cycle"] * EVENT_CHANNEL_TIME_UNITS.get(channel["unit"], 1e-3) / self.rate_scale
+
+    def _header(self, daq_list: DaqListState, daq_idx: int, odt_idx: int) -> bytes:
+        idf = self.identification_field
+        if idf == "IDF_ABS_ODT_NUMBER":
+            return bytes([(daq_list.first_pid + odt_idx) & 0xFF])
+        elif idf == "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_BYTE":
+            return bytes([odt_idx, daq_idx & 0xFF])
+        elif idf == "IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD":
+            return bytes([odt_idx]) + struct.pack("{}H".format(self._byte_order), daq_idx)
+        return bytes([odt_idx, 0]) + struct.pack("{}H".format(self._byte_order), daq_idx)
+
+    def sample(self, daq_idx: int, timestamp: float) -> list:
+        """DTOs of one DAQ cycle of a DAQ list.
+
+        Parameters
+        ----------
+        timestamp: float
+            Seconds of DAQ clock (s. `daq_time`).
+
+        Returns
+        -------
+        list of bytes
+        """
+        daq_list = self.daq_lists[daq_idx]
+        timestamp_bytes = DAQ_TIMESTAMP_SIZE.get(self.timestamp_size, 0) if daq_list.mode & DAQ_MODE_TIMESTAMP else 0
+        result = []
+        for odt_idx, odt in enumerate(daq_list.odts):
+            frame = [self._header(daq_list, daq_idx, odt_idx)]
+            if odt_idx == 0 and timestamp_bytes:
+                ticks = int(timestamp / (TIMESTAMP_UNITS.get(self.timestamp_unit, 1e-6) * (self.timestamp_ticks or 1)))
+                ticks &= (1 << (8 * timestamp_bytes)) - 1
+                frame.append(ticks.to_bytes(timestamp_bytes, "little" if self._byte_order == "<" else "big"))
+            for entry in odt:
+                if entry is not None:
+                    frame.append(self.read(entry.address, entry.length, entry.ext))
+            frame = b"".join(frame)
+            if len(frame) > self.slaveProperties.maxDto:
+                raise XcpResponseError("ERR_DAQ_CONFIG")
+            result.append(frame)
+        return result
+
+    def daq_frames(self, duration: float):
+        """Advance the DAQ clock by `duration` seconds and generate the DTOs of all running DAQ lists (no waiting).
+
+        Returns
+        -------
+        list of `DaqFrame`
+            Sorted by timestamp (seconds of DAQ clock).
+        """
+        end = self.daq_time + duration
+        schedule = []
+        for daq_idx, daq_list in enumerate(self.daq_lists):
+            if not daq_list.running:
+                daq_list.next_time = None
+                continue
+            if daq_list.next_time is None:
+                daq_list.next_time = self.daq_time
+            period = self.event_period(daq_list.event_channel) * daq_list.prescaler
+            times = np.arange(daq_list.next_time, end, period)
+            if len(times):
+                daq_list.next_time = float(times[-1]) + period
+            schedule.extend((t, daq_idx) for t in times.tolist())
+        self.daq_time = end
+        schedule.sort()
+        result = []
+        for t, daq_idx in schedule:
+            if self.stimulus:
+                self.stimulus(self, t)
+            for frame in self.sample(daq_idx, t):
+                result.append(DaqFrame(self._counter & 0xFFFF, t, frame))
+                self._counter += 1
+        return result
+
+    def _start_daq(self):
+        if not self.realtime:
+            return
+        if self._daq_thread is not None and self._daq_thread.is_alive():
+            return
+        self._daq_stop.clear()
+        self._daq_thread = threading.Thread(target=self._run_daq, name="SimulatedDaq", daemon=True)
+        self._daq_thread.start()
+
+    def _stop_daq(self):
+        if self._daq_thread is not None and self._daq_thread is not threading.current_thread():
+            self._daq_stop.set()
+            self._daq_thread.join()
+        self._daq_thread = None
+
+    def _run_daq(self):
+        offset = time.perf_counter() - self.daq_time  # Host time of DAQ clock zero.
+        while not self._daq_stop.is_set():
+            with self._lock:
+                try:
+                    frames = self.daq_frames(time.perf_counter() - offset - self.daq_time)
+                except XcpResponseError as e:
+                    self.logger.error("DAQ stopped: {}.".format(e))
+                    break
+            if self.cro_callback is not None:
+                for frame in frames:
+                    response = np.frombuffer(frame.frame, dtype=np.uint8)
+                    self.cro_callback(XcpLogCategory.DAQ, response, frame.counter, len(frame.frame), offset + frame.timestamp)
+            self._daq_stop.wait(0.001)
@@ -0,0 +1,551 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Memory transfers (SET_MTA + UPLOAD / DOWNLOAD): cost model, incremental uploads and differential downloads.
+
+Every block costs at least one SET_MTA round trip, plus one UPLOAD per MAX_CTO - 1 bytes
+(or per 255 elements if the slave supports block mode). On slow transports, these round trips
+dominate -- uploading a few unused bytes between two blocks is often cheaper than a separate request,
+and comparing BUILD_CHECKSUM results against a previous upload is cheaper than re-fetching unchanged blocks.
+Likewise, downloads are restricted to the byte ranges that actually differ from the current contents.
+"""
+
+__copyright__ = """
+   pySART - Simplified AUTOSAR-Toolkit for Python.
+
+   (C) 2022 by Christoph Schueler <cpu12.gems.googlemail.com>
+
+   All Rights Reserved
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   s. FLOSS-EXCEPTION.txt
+"""
+
+from collections import namedtuple
+import hashlib
+from logging import getLogger
+import os
+
+import numpy as np
+from objutils import Image, Section
+from pyxcp.types import XcpResponseError
+
+from asamint.exceptions import DownloadVerificationError
+from asamint.utils.optimize import McObject
+from asamint.xcp.checksum import block_checksums, checksum
+from asamint.xcp.planner import frame_bits
+from asamint.xcp.reco import struct_byte_order_prefix
+
+TransferStats = namedtuple(
+    "TransferStats",
+    "blocks round_trips round_trips_saved bytes gap_bytes estimated_time estimated_time_saved",
+)
+
+UploadStats = namedtuple("UploadStats", "blocks checked unchanged pulled bytes_pulled bytes_skipped")
+
+DownloadStats = namedtuple("DownloadStats", "blocks bytes changed_bytes total_bytes round_trips")
+
+SET_MTA_SIZE = 8
+UPLOAD_SIZE = 2
+MAX_BLOCK_ELEMENTS = 0xFF  # UPLOAD: number of data elements is a BYTE.
+
+
+class TransferCostModel:
+    """Estimate the duration of memory uploads and downloads.
+
+    Parameters
+    ----------
+    max_cto: int
+
+    slave_block_mode: bool
+        UPLOAD may request up to 255 elements, answered by consecutive response packets.
+
+    master_block_mode: bool
+        DOWNLOAD may be followed by up to `max_bs` - 1 DOWNLOAD_NEXT packets without waiting for responses.
+
+    max_bs: int
+
+    address_granularity: int
+        Bytes per element (1, 2 or 4).
+
+    transport: str
+        "CAN", "CANFD", "ETH" or "SXI".
+
+    bitrate: int
+        Bus bitrate in bit/s.
+
+    command_latency: float
+        Seconds per request/response round trip, on top of the time spent on the wire
+        (slave processing, driver and OS scheduling delays).
+
+    pad_frames: bool
+    """
+
+    def __init__(
+        self,
+        max_cto: int,
+        slave_block_mode: bool = False,
+        master_block_mode: bool = False,
+        max_bs: int = 1,
+        address_granularity: int = 1,
+        transport: str = "CAN",
+        bitrate: int = 500000,
+        command_latency: float = 0.001,
+        pad_frames: bool = False,
+    ):
+        self.max_cto = max_cto
+        self.slave_block_mode = slave_block_mode
+        self.master_block_mode = master_block_mode
+        self.max_bs = max_bs
+        self.address_granularity = address_granularity
+        self.transport = transport
+        self.bitrate = bitrate
+        self.command_latency = command_latency
+        self.pad_frames = pad_frames
+        self.packet_payload = max_cto - 1  # PID.
+        self.checksum_round_trips = 2  # SET_MTA + BUILD_CHECKSUM.
+        if slave_block_mode:
+            self.request_payload = MAX_BLOCK_ELEMENTS * address_granularity
+        else:
+            self.request_payload = self.packet_payload
+        self.download_packet_payload = max_cto - 2  # PID + number of elements.
+        if master_block_mode:
+            self.download_payload = min(max(max_bs, 1) * self.download_packet_payload, MAX_BLOCK_ELEMENTS * address_granularity)
+        else:
+            self.download_payload = self.download_packet_payload
+
+    @classmethod
+    def from_slave_properties(cls, slave_properties, **kws):
+        """Create a cost model from `Master.slaveProperties`; `kws` as in the constructor."""
+        return cls(
+            max_cto=slave_properties["maxCto"],
+            slave_block_mode=bool(slave_properties.get("slaveBlockMode", False)),
+            master_block_mode=bool(slave_properties.get("masterBlockMode", False)),
+            max_bs=slave_properties.get("maxBs") or 1,
+            address_granularity=slave_properties.get("bytesPerElement") or 1,
+            **kws
+        )
+
+    def round_trips(self, length: int, download: bool = False) -> int:
+        """SET_MTA plus UPLOADs required to fetch (or DOWNLOAD sequences to write) `length` bytes."""
+        payload = self.download_payload if download else self.request_payload
+        return 1 + -(-length // payload)
+
+    def _bits(self, payload_size: int) -> int:
+        return frame_bits(payload_size, self.transport, self.max_cto, self.pad_frames)
+
+    def transfer_time(self, length: int, download: bool = False) -> float:
+        """Estimated duration (in seconds) of fetching (or writing) a block of `length` bytes."""
+        requests = self.round_trips(length, download) - 1
+        if download:
+            header, packet_payload, handshake = 2, self.download_packet_payload, self._bits(1)  # Positive response.
+        else:
+            header, packet_payload, handshake = 1, self.packet_payload, self._bits(UPLOAD_SIZE)
+        full_packets, remaining = divmod(length, packet_payload)
+        bits = self._bits(SET_MTA_SIZE) + requests * handshake + full_packets * self._bits(self.max_cto)
+        if remaining:
+            bits += self._bits(remaining + header)
+        return (requests + 1) * self.command_latency + bits / self.bitrate
+
+    def merge_blocks(self, blocks, max_length: int = None, download: bool = False):
+        """Merge neighbouring blocks, whenever transferring the gap is cheaper than another request.
+
+        Parameters
+        ----------
+        blocks: list of `McObject`
+            Non-overlapping, sorted by (ext, address) -- as returned by `make_continuous_blocks`.
+
+        max_length: int
+            Merged blocks don't exceed `max_length` bytes.
+
+        download: bool
+            Use DOWNLOAD instead of UPLOAD costs.
+
+        Returns
+        -------
+        tuple: (list of `McObject`, `TransferStats`)
+        """
+        result = []
+        gap_bytes = 0
+        for block in blocks:
+            if result:
+                current = result[-1]
+                gap = block.address - (current.address + current.length)
+                merged_length = block.address + block.length - current.address
+                if (
+                    block.ext == current.ext
+                    and gap >= 0
+                    and (max_length is None or merged_length <= max_length)
+                    and self.transfer_time(merged_length, download)
+                    <= self.transfer_time(current.length, download) + self.transfer_time(block.length, download)
+                ):
+                    result[-1] = McObject("", current.address, merged_length, current.ext)
+                    gap_bytes += gap
+                    continue
+            result.append(McObject("", block.address, block.length, block.ext))
+        round_trips_before = sum(self.round_trips(b.length, download) for b in blocks)
+        round_trips = sum(self.round_trips(b.length, download) for b in result)
+        time_before = sum(self.transfer_time(b.length, download) for b in blocks)
+        estimated_time = sum(self.transfer_time(b.length, download) for b in result)
+        stats = TransferStats(
+            blocks=len(result),
+            round_trips=round_trips,
+            round_trips_saved=round_trips_before - round_trips,
+            bytes=sum(b.length for b in result),
+            gap_bytes=gap_bytes,
+            estimated_time=estimated_time,
+            estimated_time_saved=time_before - estimated_time,
+        )
+        return result, stats
+
+
+def load_blocks(file_name: str) -> dict:
+    """Read blocks written by `save_blocks`.
+
+    Returns
+    -------
+    dict
+        (ext, address, length) ==> bytes
+    """
+    with np.load(file_name) as npz:
+        exts, addresses, lengths, data = npz["ext"], npz["address"], npz["length"], npz["data"].tobytes()
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return {
+        (int(ext), int(address), int(length)): data[offsets[idx] : offsets[idx + 1]]
+        for idx, (ext, address, length) in enumerate(zip(exts, addresses, lengths))
+    }
+
+
+def save_blocks(file_name: str, blocks, data) -> None:
+    """Save `blocks` (list of `McObject`) and their contents (list of bytes) as `.npz` file."""
+    with open(file_name, "wb") as outf:
+        np.savez(
+            outf,
+            ext=np.array([b.ext for b in blocks], dtype=np.int64),
+            address=np.array([b.address for b in blocks], dtype=np.int64),
+            length=np.array([b.length for b in blocks], dtype=np.int64),
+            data=np.frombuffer(b"".join(bytes(d) for d in data), dtype=np.uint8),
+        )
+
+
+class ReferenceImage:
+    """Blocks of the most recent upload, used as reference for incremental uploads.
+
+    Parameters
+    ----------
+    cache_dir: str
+
+    key: str
+        Identifies the A2L database (e.g. `AsamBaseType.a2l_hash`) and the kind of upload;
+        if None, nothing is loaded or stored.
+    """
+
+    FILE_PREFIX = "reference_"
+
+    def __init__(self, cache_dir: str, key: str):
+        self.cache_dir = cache_dir
+        self.key = key
+
+    def file_name(self) -> str:
+        return os.path.join(self.cache_dir, "{}{}.npz".format(self.FILE_PREFIX, self.key))
+
+    def load(self) -> dict:
+        """
+        Returns
+        -------
+        dict
+            (ext, address, length) ==> bytes
+        """
+        if self.key is None or not os.path.exists(self.file_name()):
+            return {}
+        return load_blocks(self.file_name())
+
+    def store(self, blocks, data) -> None:
+        """Save `blocks` (list of `McObject`) and their contents (list of bytes)."""
+        if self.key is None or not os.path.isdir(self.cache_dir):
+            return
+        save_blocks(self.file_name(), blocks, data)
+
+
+def remote_checksums(xcp_master, blocks, indices=None) -> dict:
+    """BUILD_CHECKSUM of `blocks` (or of the blocks at `indices`), computed by the slave.
+
+    Stops at the first negative response (BUILD_CHECKSUM unsupported, block size out of range, ...).
+
+    Returns
+    -------
+    dict
+        block index ==> (checksum type, checksum)
+    """
+    result = {}
+    for idx in range(len(blocks)) if indices is None else indices:
+        block = blocks[idx]
+        try:
+            xcp_master.setMta(block.address, block.ext)
+            response = xcp_master.buildChecksum(block.length)
+        except XcpResponseError as e:
+            getLogger("remote_checksums").info("BUILD_CHECKSUM failed ({}).".format(e))
+            break
+        result[idx] = (str(response.checksumType), response.checksum)
+    return result
+
+
+def image_unchanged(xcp_master, image, ext: int = 0) -> bool:
+    """Check by BUILD_CHECKSUM, if slave memory still matches `image` (e.g. a cached copy of CalRAM).
+
+    Returns
+    -------
+    bool
+        False, if any section differs or couldn't be checked.
+    """
+    blocks = [McObject("", section.start_address, section.length, ext) for section in image.sections]
+    remote = remote_checksums(xcp_master, blocks)
+    if len(remote) != len(blocks):
+        return False
+    byte_order = struct_byte_order_prefix(xcp_master.slaveProperties["byteOrder"])
+    for idx, section in enumerate(image.sections):
+        algorithm, value = remote[idx]
+        try:
+            if checksum(bytes(section.data), algorithm, byte_order) != value:
+                return False
+        except ValueError:
+            return False
+    return True
+
+
+def fingerprint(epk: str, blocks, remote: dict):
+    """Content key of an ECU memory image: EPK, block layout and slave-side checksums.
+
+    Returns
+    -------
+    str or None
+        None, if checksums are missing.
+    """
+    if len(remote) != len(blocks):
+        return None
+    digest = hashlib.sha1((epk or "").encode("utf8"))
+    for idx, block in enumerate(blocks):
+        algorithm, value = remote[idx]
+        digest.update("{}:{}:{}:{}:{};".format(block.ext, block.address, block.length, algorithm, value).encode("ascii"))
+    return digest.hexdigest()
+
+
+def upload_blocks(xcp_master, blocks, reference: dict = None, cost_model: TransferCostModel = None, remote: dict = None):
+    """Fetch `blocks` from the slave.
+
+    If a `reference` is given, the slave computes BUILD_CHECKSUM for every block with known
+    previous contents (and more than two round trips of transfer), only blocks whose checksum
+    differs from the local one are pulled. Checksums already obtained (`remote`) are reused.
+    If BUILD_CHECKSUM is unsupported or rejected (e.g. block size out of range), blocks are pulled.
+
+    Note
+    ----
+    Additive checksums (XCP_ADD_xx) may miss changes (e.g. swapped bytes); CRCs are preferable.
+
+    Parameters
+    ----------
+    xcp_master:
+
+    blocks: list of `McObject`
+
+    reference: dict
+        (ext, address, length) ==> bytes, s. `ReferenceImage.load`
+
+    cost_model: `TransferCostModel`
+
+    remote: dict
+        Already known slave-side checksums, s. `remote_checksums`.
+
+    Returns
+    -------
+    tuple: (list of bytes, `UploadStats`)
+    """
+    logger = getLogger("upload_blocks")
+    reference = reference or {}
+    result = [None] * len(blocks)
+    known = [idx for idx, block in enumerate(blocks) if (block.ext, block.address, block.length) in reference]
+    if remote is None:
+        if cost_model:
+            known = [idx for idx in known if cost_model.round_trips(blocks[idx].length) > cost_model.checksum_round_trips]
+        remote = remote_checksums(xcp_master, blocks, known)
+    else:
+        remote = {idx: remote[idx] for idx in known if idx in remote}
+    by_algorithm = {}
+    for idx, (algorithm, _) in remote.items():
+        by_algorithm.setdefault(algorithm, []).append(idx)
+    byte_order = struct_byte_order_prefix(xcp_master.slaveProperties["byteOrder"])
+    for algorithm, indices in by_algorithm.items():
+        data = [reference[(blocks[idx].ext, blocks[idx].address, blocks[idx].length)] for idx in indices]
+        try:
+            local = block_checksums(data, algorithm, byte_order)
+        except ValueError:
+            logger.info("Checksum algorithm '{}' not available locally.".format(algorithm))
+            continue
+        for idx, value in zip(indices, local):
+            if int(value) == remote[idx][1]:
+                block = blocks[idx]
+                result[idx] = reference[(block.ext, block.address, block.length)]
+    unchanged = [idx for idx, data in enumerate(result) if data is not None]
+    for idx, block in enumerate(blocks):
+        if result[idx] is None:
+            xcp_master.setMta(block.address, block.ext)
+            result[idx] = xcp_master.pull(block.length)
+    bytes_skipped = sum(blocks[idx].length for idx in unchanged)
+    stats = UploadStats(
+        blocks=len(blocks),
+        checked=len(remote),
+        unchanged=len(unchanged),
+        pulled=len(blocks) - len(unchanged),
+        bytes_pulled=sum(b.length for b in blocks) - bytes_skipped,
+        bytes_skipped=bytes_skipped,
+    )
+    return result, stats
+
+
+def changed_ranges(data, current=None, start: int = 0):
+    """Byte ranges where `data` differs from `current`.
+
+    Parameters
+    ----------
+    data: bytes-like
+
+    current: `numpy.ndarray` of int16
+        Same length as `data`, -1 marks unknown bytes (always considered changed).
+
+    start: int
+        Address of the first byte.
+
+    Returns
+    -------
+    list of `McObject`
+    """
+    new = np.frombuffer(bytes(data), dtype=np.uint8)
+    changed = np.ones(len(new), dtype=bool) if current is None else new != current
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], changed.view(np.int8), [0]))))
+    return [McObject("", start + int(lo), int(hi - lo)) for lo, hi in zip(edges[::2], edges[1::2])]
+
+
+def _current_contents(image, address: int, length: int):
+    """Contents of `image` in [address, address + length), -1 where not covered."""
+    result = np.full(length, -1, dtype=np.int16)
+    if image is None:
+        return result
+    for section in image.sections:
+        lo = max(address, section.start_address)
+        hi = min(address + length, section.start_address + section.length)
+        if lo < hi:
+            offset = lo - section.start_address
+            result[lo - address : hi - address] = np.frombuffer(bytes(section.data[offset : offset + hi - lo]), dtype=np.uint8)
+    return result
+
+
+def diff_image(target, current=None, cost_model: TransferCostModel = None, ext: int = 0):
+    """Blocks to download to turn `current` into `target`.
+
+    Changed ranges are merged (within sections of `target`) as long as this is cheaper
+    according to `cost_model`.
+
+    Parameters
+    ----------
+    target: `objutils.Image`
+
+    current: `objutils.Image`
+        Current contents of ECU memory (e.g. from `upload_calram`); bytes not covered are downloaded.
+
+    cost_model: `TransferCostModel`
+
+    ext: int
+        Address extension.
+
+    Returns
+    -------
+    tuple: (list of (`McObject`, bytes), `DownloadStats`)
+    """
+    result = []
+    changed_bytes = 0
+    total_bytes = 0
+    for section in target.sections:
+        start = section.start_address
+        data = bytes(section.data)
+        ranges = changed_ranges(data, None if current is None else _current_contents(current, start, len(data)), start)
+        changed_bytes += sum(r.length for r in ranges)
+        total_bytes += len(data)
+        if cost_model is not None:
+            ranges, _ = cost_model.merge_blocks(ranges, download=True)
+        for r in ranges:
+            offset = r.address - start
+            result.append((McObject("", r.address, r.length, ext), data[offset : offset + r.length]))
+    stats = DownloadStats(
+        blocks=len(result),
+        bytes=sum(block.length for block, _ in result),
+        changed_bytes=changed_bytes,
+        total_bytes=total_bytes,
+        round_trips=sum(cost_model.round_trips(block.length, True) for block, _ in result) if cost_model else None,
+    )
+    return result, stats
+
+
+def patched_image(image, blocks):
+    """Copy of `image` with `blocks` (list of (`McObject`, bytes)) written to it; data outside of `image` is ignored."""
+    sections = []
+    for section in image.sections:
+        start, end = section.start_address, section.start_address + section.length
+        data = bytearray(section.data)
+        for block, block_data in blocks:
+            lo, hi = max(start, block.address), min(end, block.address + block.length)
+            if lo < hi:
+                data[lo - start : hi - start] = block_data[lo - block.address : hi - block.address]
+        sections.append(Section(start_address=start, data=data))
+    return Image(sections=sections, join=False)
+
+
+def download_blocks(xcp_master, blocks, verify: bool = False) -> None:
+    """Write blocks to the slave (DOWNLOAD / DOWNLOAD_NEXT, depending on master block mode).
+
+    Parameters
+    ----------
+    xcp_master:
+
+    blocks: list of (`McObject`, bytes)
+        s. `diff_image`
+
+    verify: bool
+        Compare BUILD_CHECKSUM of every written block with the local checksum
+        (or read back, if BUILD_CHECKSUM is not available).
+
+    Raises
+    ------
+    `DownloadVerificationError`
+    """
+    byte_order = struct_byte_order_prefix(xcp_master.slaveProperties["byteOrder"])
+    use_checksum = True
+    for block, data in blocks:
+        xcp_master.setMta(block.address, block.ext)
+        xcp_master.push(data)
+        if not verify:
+            continue
+        xcp_master.setMta(block.address, block.ext)
+        if use_checksum:
+            try:
+                response = xcp_master.buildChecksum(block.length)
+                algorithm = str(response.checksumType)
+                ok = checksum(data, algorithm, byte_order) == response.checksum
+            except (XcpResponseError, ValueError):
+                use_checksum = False
+                xcp_master.setMta(block.address, block.ext)
+        if not use_checksum:
+            ok = bytes(xcp_master.pull(block.length)) == bytes(data)
+        if not ok:
+            raise DownloadVerificationError("Verification of block {!r} failed.".format(block))
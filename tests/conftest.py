@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+import time
+
+import pytest
+from pyxcp import checksum as reference_checksum
+
+BuildChecksumResponse = namedtuple("BuildChecksumResponse", "checksumType checksum")
+
+
+class FakeMaster:
+    """Memory-backed stand-in for `pyxcp.master.Master`.
+
+    Parameters
+    ----------
+    memory: bytearray or list of bytearrays
+        A list is indexed by address extension (e.g. flash pages), a single bytearray ignores it.
+
+    checksum_type: str
+        BUILD_CHECKSUM algorithm, computed by the `pyxcp` reference implementation.
+
+    latency: float
+        Seconds per request (setMta, pull, push, buildChecksum).
+
+    fail_at: int
+        Number of the push (starting at 1) which loses the connection.
+
+    corrupt: int
+        Number of pushes, the first byte of which is flipped.
+    """
+
+    slaveProperties = {"maxCto": 8, "byteOrder": "INTEL"}
+
+    def __init__(self, memory, checksum_type="XCP_CRC_32", latency=0.0, fail_at=None, corrupt=0):
+        self.memory = memory
+        self.checksum_type = checksum_type
+        self.latency = latency
+        self.fail_at = fail_at
+        self.corrupt = corrupt
+        self.ext = 0
+        self.mta = 0
+        self.pulled = []
+        self.pushed = []
+
+    def _request(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def segment(self):
+        """Memory of the current address extension."""
+        return self.memory[self.ext] if isinstance(self.memory, list) else self.memory
+
+    def setMta(self, address, ext=0):
+        self._request()
+        self.mta, self.ext = address, ext
+
+    def upload(self, length):
+        result = bytes(self.segment()[self.mta : self.mta + length])
+        self.mta += length
+        return result
+
+    def pull(self, length):
+        """Like `Master.pull`, UPLOADs of up to maxCto - 1 bytes."""
+        self._request()
+        self.pulled.append(self.mta)
+        chunk_size = self.slaveProperties["maxCto"] - 1
+        result = b""
+        while len(result) < length:
+            result += self.upload(min(chunk_size, length - len(result)))
+        return result
+
+    def push(self, data):
+        self._request()
+        self.pushed.append((self.mta, len(data)))
+        if len(self.pushed) == self.fail_at:
+            raise ConnectionError("Lost connection.")
+        data = bytearray(data)
+        if self.corrupt and data:
+            self.corrupt -= 1
+            data[0] ^= 0xFF
+        self.segment()[self.mta : self.mta + len(data)] = data
+        self.mta += len(data)  # DOWNLOAD post-increments the MTA.
+
+    def buildChecksum(self, length):
+        self._request()
+        value = reference_checksum.check(bytes(self.segment()[self.mta : self.mta + length]), self.checksum_type)
+        return BuildChecksumResponse(self.checksum_type, value)
+
+
+@pytest.fixture
+def fake_master():
+    """Factory of `FakeMaster`s, takes the same arguments."""
+    return FakeMaster
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from asamint.asam import AsamBaseType
+from asamint.utils import sha1_file_digest
+
+A2L = """ASAP2_VERSION 1 71
+/begin PROJECT {} ""
+  /begin MODULE M "" /end MODULE
+/end PROJECT
+"""
+
+
+class Dummy(AsamBaseType):
+    def on_init(self, project_config, experiment_config, *args, **kws):
+        self.loadConfig(project_config, experiment_config)
+
+
+def make(a2l_file):
+    return Dummy({"A2L_FILE": a2l_file, "PROJECT": "p", "SHORTNAME": "s"}, {"SUBJECT": "s", "SHORTNAME": "s"})
+
+
+def test_a2l_hash(tmp_path, monkeypatch):
+    from pya2l import DB
+
+    monkeypatch.chdir(tmp_path)
+    for name in ("a", "b"):
+        (tmp_path / "{}.a2l".format(name)).write_text(A2L.format(name))
+    monkeypatch.setattr(AsamBaseType, "_session_obj", DB().open_create("a.a2l"), raising=False)
+    assert make("a").a2l_hash == sha1_file_digest(str(tmp_path / "a.a2l"))
+    assert make("b.a2l").a2l_hash == sha1_file_digest(str(tmp_path / "b.a2l"))  # Not shared between A2L files.
+    assert make("missing").a2l_hash is None
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+from objutils import Image, Section
+import pytest
+
+from asamint.asam import ByteOrder, get_section_reader
+from asamint.calibration.bulk import FlatImage, read_scalars
+from asamint.utils import ffs
+
+
+@pytest.fixture
+def image():
+    return Image(sections=[Section(0x1000, bytearray(os.urandom(256))), Section(0x4000, bytearray(os.urandom(64)))], join=False)
+
+
+@pytest.mark.parametrize("datatype", ["UBYTE", "SBYTE", "UWORD", "SWORD", "ULONG", "SLONG", "A_UINT64", "A_INT64"])
+@pytest.mark.parametrize("byte_order", [ByteOrder.LITTLE_ENDIAN, ByteOrder.BIG_ENDIAN])
+def test_read_scalars_like_read_numeric(image, datatype, byte_order):
+    addresses = [0x1000, 0x1003, 0x4030, 0x103F]
+    masks = [0, 0x0F, 0x70, None]
+    values, valid = read_scalars(FlatImage(image), addresses, datatype, byte_order, masks)
+    assert valid.all()
+    reader = get_section_reader(datatype, byte_order)
+    expected = [
+        image.read_numeric(a, reader, bit_mask=m) >> ffs(m) if m else image.read_numeric(a, reader)
+        for a, m in zip(addresses, masks)
+    ]
+    assert values.tolist() == expected
+
+
+def test_floats_and_invalid_addresses(image):
+    values, valid = read_scalars(FlatImage(image), [0x1010, 0x10FE, 0x2000, 0x4000], "FLOAT32_IEEE", ByteOrder.BIG_ENDIAN)
+    assert valid.tolist() == [True, False, False, True]
+    reader = get_section_reader("FLOAT32_IEEE", ByteOrder.BIG_ENDIAN)
+    assert values[0] == pytest.approx(image.read_numeric(0x1010, reader), nan_ok=True)
+    with pytest.raises(TypeError):
+        read_scalars(FlatImage(image), [0x1010], "FLOAT32_IEEE", ByteOrder.BIG_ENDIAN, [0xFF])
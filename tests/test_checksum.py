@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+from pyxcp import checksum as reference
+
+from asamint.xcp.checksum import ALGORITHMS, block_checksums, checksum
+
+TEST = bytes(range(1, 17)) + bytes(range(0xF1, 0x100)) + b"\x00"
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_matches_pyxcp(algorithm):
+    blocks = [os.urandom(n) for n in (1, 2, 3, 7, 8, 33, 100, 257, 1024)]
+    assert list(block_checksums(blocks, algorithm)) == [reference.check(b, algorithm) for b in blocks]
+
+
+def test_motorola_word_sums():
+    assert checksum(TEST, "XCP_ADD_22", ">") == 0x0710
+    assert checksum(TEST, "XCP_ADD_24", ">") == 0x00080710
+    assert checksum(TEST, "XCP_ADD_44", ">") == 0xFC040B10
+
+
+def test_unsupported():
+    with pytest.raises(ValueError):
+        checksum(TEST, "XCP_USER_DEFINED")
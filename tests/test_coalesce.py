@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from asamint.utils.optimize import coalesce_blocks
+from asamint.utils.optimize import DaqList
+from asamint.utils.optimize import McObject
+
+
+def reference(items, max_gap=0):
+    result = []
+    for ext, address, length in sorted(items):
+        if result and result[-1][0] == ext and address <= result[-1][1] + result[-1][2] + max_gap:
+            last_ext, last_address, last_length = result[-1]
+            result[-1] = (ext, last_address, max(last_address + last_length, address + length) - last_address)
+        else:
+            result.append((ext, address, length))
+    return result
+
+
+def test_empty():
+    blocks = coalesce_blocks([], [])
+    assert len(blocks) == 0
+    assert blocks.to_list() == []
+
+
+def test_partial_overlap():
+    blocks = coalesce_blocks([0x1000, 0x1002], [4, 4])
+    assert blocks.to_list() == [McObject("", 0x1000, 6)]
+
+
+def test_max_gap():
+    blocks = coalesce_blocks([0x1000, 0x1006, 0x1010], [4, 2, 1], max_gap=2)
+    assert [(b.address, b.length) for b in blocks] == [(0x1000, 8), (0x1010, 1)]
+    assert list(blocks.block_index) == [0, 0, 1]
+
+
+def test_block_index_and_views():
+    blocks = coalesce_blocks([0x2000, 0x1000, 0x1004], [2, 4, 4], exts=[0, 1, 1])
+    assert list(blocks.block_index) == [0, 1, 1]
+    assert blocks[1] == McObject("", 0x1000, 8, ext=1)
+    assert blocks.total_length == 10
+
+
+def test_against_reference():
+    rng = np.random.default_rng(42)
+    addresses = rng.integers(0, 4096, 2000)
+    lengths = rng.integers(1, 9, 2000)
+    exts = rng.integers(0, 3, 2000)
+    for max_gap in (0, 3):
+        blocks = coalesce_blocks(addresses, lengths, exts, max_gap=max_gap)
+        expected = reference(zip(exts.tolist(), addresses.tolist(), lengths.tolist()), max_gap)
+        assert list(zip(blocks.ext.tolist(), blocks.address.tolist(), blocks.length.tolist())) == expected
+
+
+def test_max_length():
+    blocks = coalesce_blocks(np.arange(0x1000, 0x1000 + 40, 4), [4] * 10, max_length=12)
+    assert [(b.address, b.length) for b in blocks] == [(0x1000, 12), (0x100C, 12), (0x1018, 12), (0x1024, 4)]
+    assert max(b.length for b in blocks) <= 12
+
+
+def test_daq_list_resolve():
+    odts = [
+        [McObject("", 0x1000, 4), McObject("", 0x2000, 2, ext=1)],
+        [McObject("", 0x1004, 2)],
+    ]
+    summary = [
+        ("a", 0x1002, 0, "UWORD", 2, "NO_COMPU_METHOD"),
+        ("b", 0x2000, 1, "UBYTE", 1, "NO_COMPU_METHOD"),
+        ("c", 0x1005, 0, "UBYTE", 1, "NO_COMPU_METHOD"),
+        ("d", 0x2000, 0, "UBYTE", 1, "NO_COMPU_METHOD"),
+        ("e", 0x0FFF, 0, "UBYTE", 1, "NO_COMPU_METHOD"),
+    ]
+    daq_list = DaqList(odts, summary)
+    assert daq_list.locations.tolist() == [(0, 0, 2), (0, 1, 0), (1, 0, 1), (-1, -1, -1), (-1, -1, -1)]
+    assert daq_list.find(0x1003) == (0, 0, 3)
+    assert daq_list.find(0x1006) is None
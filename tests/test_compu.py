@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from pya2l.api.inspect import CompuMethod
+
+from asamint.compu import _formula, clear_cache, evaluator, translate_formula
+
+A2L = """ASAP2_VERSION 1 71
+/begin PROJECT P ""
+  /begin MODULE M ""
+    /begin MOD_PAR ""
+      SYSTEM_CONSTANT "OFFSET" "10"
+    /end MOD_PAR
+    /begin COMPU_METHOD CM.IDENTICAL "" IDENTICAL "%6.2" "-" /end COMPU_METHOD
+    /begin COMPU_METHOD CM.LINEAR "" LINEAR "%6.2" "km/h" COEFFS_LINEAR 0.5 -3 /end COMPU_METHOD
+    /begin COMPU_METHOD CM.RAT_FUNC "" RAT_FUNC "%6.2" "rpm" COEFFS 0 4 8 0 0 2 /end COMPU_METHOD
+    /begin COMPU_METHOD CM.FORM "" FORM "%6.2" "V"
+      /begin FORMULA "sqrt(X1) + pow(X1, 2) + sysc(OFFSET)" /end FORMULA
+    /end COMPU_METHOD
+    /begin COMPU_METHOD CM.TAB_INTP "" TAB_INTP "%6.2" "" COMPU_TAB_REF TAB.INTP /end COMPU_METHOD
+    /begin COMPU_METHOD CM.TAB_NOINTP "" TAB_NOINTP "%6.2" "" COMPU_TAB_REF TAB.NOINTP /end COMPU_METHOD
+    /begin COMPU_METHOD CM.TAB_VERB "" TAB_VERB "%6.2" "" COMPU_TAB_REF VTAB /end COMPU_METHOD
+    /begin COMPU_METHOD CM.TAB_VERB_RANGE "" TAB_VERB "%6.2" "" COMPU_TAB_REF VTAB.RANGE /end COMPU_METHOD
+    /begin COMPU_TAB TAB.INTP "" TAB_INTP 3 0 0 10 100 20 400 DEFAULT_VALUE_NUMERIC -1 /end COMPU_TAB
+    /begin COMPU_TAB TAB.NOINTP "" TAB_NOINTP 3 1 10 2 20 5 50 DEFAULT_VALUE_NUMERIC -1 /end COMPU_TAB
+    /begin COMPU_VTAB VTAB "" TAB_VERB 3 0 "off" 1 "on" 3 "error" DEFAULT_VALUE "unknown" /end COMPU_VTAB
+    /begin COMPU_VTAB_RANGE VTAB.RANGE "" 2 0 9 "low" 10 20 "high" DEFAULT_VALUE "invalid" /end COMPU_VTAB_RANGE
+  /end MODULE
+/end PROJECT
+"""
+
+RAW = np.array([0, 1, 2, 3, 5, 7, 10, 15, 20], dtype=np.uint16)
+
+
+@pytest.fixture(scope="module")
+def session(tmp_path_factory):
+    from pya2l import DB
+
+    path = tmp_path_factory.mktemp("a2l") / "compu.a2l"
+    path.write_text(A2L)
+    db = DB()
+    session = db.import_a2l(str(path))
+    yield session
+    clear_cache(session)
+    session.close()
+
+
+@pytest.mark.parametrize("name", ["CM.IDENTICAL", "CM.LINEAR", "CM.RAT_FUNC"])
+def test_numeric_matches_pya2l(session, name):
+    cm = evaluator(session, name)
+    expected = CompuMethod.get(session, name).int_to_physical(RAW)
+    assert np.allclose(cm(RAW), expected)
+    for raw, value in zip(RAW.tolist(), np.asarray(expected).tolist()):
+        assert cm(raw) == pytest.approx(value)
+
+
+@pytest.mark.parametrize("name", ["CM.TAB_NOINTP", "CM.TAB_VERB", "CM.TAB_VERB_RANGE"])
+def test_lookup_matches_pya2l(session, name):
+    cm = evaluator(session, name)
+    reference = CompuMethod.get(session, name)
+    values = [-1, 0, 1, 2, 3, 4, 5, 9, 10, 20, 21]
+    assert [cm(v) for v in values] == [reference.int_to_physical(v) for v in values]
+    assert cm(np.array(values)).tolist() == [reference.int_to_physical(v) for v in values]
+
+
+def test_without_compute_extras(session):
+    # `pya2l` needs scipy / numexpr for these.
+    expected = np.sqrt(RAW) + RAW.astype(float) ** 2 + 10
+    assert np.allclose(evaluator(session, "CM.FORM")(RAW), expected)
+    assert evaluator(session, "CM.FORM")(4) == pytest.approx(28.0)
+    expected = np.interp(RAW, [0, 10, 20], [0, 100, 400])
+    assert np.allclose(evaluator(session, "CM.TAB_INTP")(RAW), expected)
+
+
+def test_table_out_of_range(session):
+    cm = evaluator(session, "CM.TAB_INTP")
+    assert cm(30) == -1
+    assert cm(np.array([5, 30])).tolist() == [50.0, -1.0]
+
+
+def test_cached_per_session(session):
+    cm = evaluator(session, "CM.LINEAR")
+    assert evaluator(session, "CM.LINEAR") is cm
+    assert (cm.unit, cm.conversionType) == ("km/h", "LINEAR")
+    assert evaluator(session, None) is evaluator(session, "NO_COMPU_METHOD")
+    assert isinstance(cm(4), float)
+
+
+def test_translate_formula():
+    assert translate_formula("ACOS(X) && !X1") == "arccos(X) and not X1"
+    assert translate_formula("X ^ 2 + 0x10", legacy=True) == "X ** 2 + 16"
+    assert translate_formula("pow(X, 3) + sysc(C)", {"C": 2}) == "(X ** 3) + (2)"
+
+
+def test_logical_formula():
+    function = _formula("logic", translate_formula("X1 > 1 && X1 < 5 || !(X1 != 9)"))
+    values = np.array([0.0, 2.5, 5.0, 9.0])
+    assert function(values).tolist() == [False, True, False, True]
+    assert _formula("bits", translate_formula("(X & 0x0F) << 1"))(np.array([0x1F, 3])).tolist() == [30, 6]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "().__class__.__base__.__subclasses__().__len__() + X",
+        "__import__('os').getpid()",
+        "sqrt(X, out=X)",
+        "Y + 1",
+        "X +",
+    ],
+)
+def test_rejected_formula(expression):
+    with pytest.raises(ValueError):
+        _formula("evil", expression)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from asamint.xcp.daq import EventChannel
+from asamint.xcp.daq import event_cycle_time
+from asamint.xcp.daq import parse_if_data_daq_event
+from asamint.xcp.daq import parse_if_data_events
+from asamint.xcp.daq import resolve_event_channel
+
+IF_DATA_DAQ = """
+/begin IF_DATA XCP
+  /begin DAQ
+    DYNAMIC 0x00 0x03 0x00 OPTIMISATION_TYPE_DEFAULT ADDRESS_EXTENSION_FREE IDENTIFICATION_FIELD_TYPE_ABSOLUTE
+    GRANULARITY_ODT_ENTRY_SIZE_DAQ_BYTE 0xF8 OVERLOAD_INDICATION_PID
+    /begin EVENT
+      "Key T3" "T3" 0x0000 DAQ 0xFF 0x00 0x00 0x00
+    /end EVENT
+    /begin EVENT
+      "10ms" "10ms" 0x0001 DAQ 0xFF 0x0A 0x06 0x00
+    /end EVENT
+    /begin EVENT
+      "100ms" "100ms" 0x0002 DAQ 0xFF 0x64 0x06 0x01
+    /end EVENT
+  /end DAQ
+/end IF_DATA
+"""
+
+
+@pytest.fixture
+def events():
+    return parse_if_data_events(IF_DATA_DAQ)
+
+
+def test_parse_events(events):
+    assert sorted(events) == [0, 1, 2]
+    assert events[1] == EventChannel(
+        number=1, name="10ms", short_name="10ms", cycle=10, time_unit=6, priority=0, max_daq_list=0xFF
+    )
+    assert events[2].cycle == 100
+    assert events[2].priority == 1
+
+
+def test_cycle_time(events):
+    assert event_cycle_time(events[0].cycle, events[0].time_unit) == 0.0
+    assert event_cycle_time(events[1].cycle, events[1].time_unit) == pytest.approx(0.01)
+    assert event_cycle_time(events[2].cycle, events[2].time_unit) == pytest.approx(0.1)
+
+
+def test_parse_fixed_event_list():
+    fixed, default = parse_if_data_daq_event(
+        "/begin IF_DATA XCP /begin DAQ_EVENT FIXED_EVENT_LIST EVENT 0x0002 /end DAQ_EVENT /end IF_DATA"
+    )
+    assert fixed == [2]
+    assert default == []
+
+
+def test_parse_default_event_list():
+    fixed, default = parse_if_data_daq_event(
+        """/begin IF_DATA XCP
+          /begin DAQ_EVENT VARIABLE
+            /begin DEFAULT_EVENT_LIST EVENT 0x0001 EVENT 0x0002 /end DEFAULT_EVENT_LIST
+          /end DAQ_EVENT
+        /end IF_DATA"""
+    )
+    assert fixed == []
+    assert default == [1, 2]
+
+
+def test_resolve_event_channel(events):
+    assert resolve_event_channel(None, events) is None
+    assert resolve_event_channel(2, events) == 2
+    assert resolve_event_channel("0x01", events) == 1
+    assert resolve_event_channel("100ms", events) == 2
+    assert resolve_event_channel("T3", events) == 0
+    with pytest.raises(ValueError):
+        resolve_event_channel("1s", events)
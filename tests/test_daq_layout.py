@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from asamint.utils.optimize import McObject
+from asamint.xcp.daq import DaqEntry
+from asamint.xcp.daq import DaqLayoutCache
+from asamint.xcp.daq import DaqListSetup
+from asamint.xcp.daq import max_write_daq_multiple_elements
+
+
+@pytest.fixture
+def setups():
+    return [
+        DaqListSetup(
+            event_channel=1,
+            prescaler=1,
+            priority=0,
+            blocks=[McObject("", 0x1000, 4), McObject("", 0x2000, 2)],
+            measurement_summary=[("a", 0x1000, 0, "ULONG", 4, "NO_COMPU_METHOD"), ("b", 0x2000, 0, "UWORD", 2, "CM.b")],
+            odts=[[DaqEntry(0xFF, 4, 0x1000, 0), DaqEntry(0xFF, 2, 0x2000, 0)]],
+        ),
+        DaqListSetup(
+            event_channel=2,
+            prescaler=10,
+            priority=0,
+            blocks=[McObject("", 0x3000, 1)],
+            measurement_summary=[("c", 0x3000, 0, "UBYTE", 1, "NO_COMPU_METHOD")],
+            odts=[[DaqEntry(0xFF, 1, 0x3000, 0)]],
+        ),
+    ]
+
+
+def test_write_daq_multiple_elements():
+    assert max_write_daq_multiple_elements(8) == 0
+    assert max_write_daq_multiple_elements(10) == 1
+    assert max_write_daq_multiple_elements(255) == 31
+
+
+def test_cache_roundtrip(tmp_path, setups):
+    cache = DaqLayoutCache(str(tmp_path))
+    key = DaqLayoutCache.make_key("a2lhash", ["G1"], {}, {"maxDto": 8})
+    assert cache.load(key) is None
+    cache.store(key, setups)
+    loaded = cache.load(key)
+    assert loaded == setups
+    assert loaded[0].odts[0][1] == DaqEntry(bitoff=0xFF, length=2, address=0x2000, ext=0)
+
+
+def test_cache_key_depends_on_inputs():
+    key = DaqLayoutCache.make_key("a2lhash", ["G1"], {}, {"maxDto": 8})
+    assert key == DaqLayoutCache.make_key("a2lhash", ["G1"], {}, {"maxDto": 8})
+    assert key != DaqLayoutCache.make_key("a2lhash", ["G1", "G2"], {}, {"maxDto": 8})
+    assert key != DaqLayoutCache.make_key("a2lhash", ["G1"], {}, {"maxDto": 64})
+    assert key != DaqLayoutCache.make_key("other", ["G1"], {}, {"maxDto": 8})
+
+
+def test_cache_key_depends_on_packing_mode():
+    key = DaqLayoutCache.make_key("a2lhash", ["G1"], {}, {"maxDto": 8, "exactPacking": False})
+    assert key != DaqLayoutCache.make_key("a2lhash", ["G1"], {}, {"maxDto": 8, "exactPacking": True})
+
+
+def test_cache_key_mixed_keys():
+    events = {"channels": {"G1": 1, "m1": "10ms"}, "prescalers": {2: 4, "100ms": 2}, "default": 3}
+    key = DaqLayoutCache.make_key("a2lhash", ["G1"], events, {"maxDto": 8})
+    assert key == DaqLayoutCache.make_key("a2lhash", ["G1"], events, {"maxDto": 8})
+    assert key != DaqLayoutCache.make_key("a2lhash", ["G1"], dict(events, prescalers={2: 8, "100ms": 2}), {"maxDto": 8})
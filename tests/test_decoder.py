@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import struct
+
+import numpy as np
+import pytest
+
+from asamint.utils.optimize import McObject
+from asamint.xcp.daq import DaqEntry
+from asamint.xcp.daq import DaqListSetup
+from asamint.xcp.decoder import DaqDecoder
+
+
+def daq_info(idf="IDF_ABS_ODT_NUMBER", ts_size="S2"):
+    return {
+        "processor": {"keyByte": {"identificationField": idf, "addressExtension": "AE_DIFFERENT_WITHIN_ODT"}},
+        "resolution": {
+            "timestampTicks": 10,
+            "maxOdtEntrySizeDaq": 0,
+            "granularityOdtEntrySizeDaq": 1,
+            "timestampMode": {"unit": "DAQ_TIMESTAMP_UNIT_1US", "fixed": False, "size": ts_size},
+        },
+    }
+
+
+@pytest.fixture
+def setups():
+    return [
+        DaqListSetup(
+            event_channel=1,
+            prescaler=1,
+            priority=0,
+            blocks=[McObject("", 0x1000, 6), McObject("", 0x2000, 1)],
+            measurement_summary=[
+                ("u32", 0x1000, 0, "ULONG", 4, "NO_COMPU_METHOD"),
+                ("s16", 0x1004, 0, "SWORD", 2, "NO_COMPU_METHOD"),
+                ("u8", 0x2000, 0, "UBYTE", 1, "NO_COMPU_METHOD"),
+            ],
+            odts=[[DaqEntry(0xFF, 4, 0x1000, 0)], [DaqEntry(0xFF, 2, 0x1004, 0), DaqEntry(0xFF, 1, 0x2000, 0)]],
+        ),
+        DaqListSetup(
+            event_channel=2,
+            prescaler=1,
+            priority=0,
+            blocks=[McObject("", 0x3000, 4)],
+            measurement_summary=[("f32", 0x3000, 0, "FLOAT32_IEEE", 4, "NO_COMPU_METHOD")],
+            odts=[[DaqEntry(0xFF, 4, 0x3000, 0)]],
+        ),
+    ]
+
+
+def frames_for(cycle, ts):
+    return [
+        struct.pack("<BHL", 0, ts, 1000 + cycle),
+        struct.pack("<BhB", 1, -cycle, cycle & 0xFF),
+        struct.pack("<BHf", 2, ts, cycle * 0.5),
+    ]
+
+
+def test_dtypes(setups):
+    decoder = DaqDecoder(setups, daq_info())
+    dt = decoder.dtype(0, 0)
+    assert dt.itemsize == 7
+    assert dt.fields["_timestamp"][1] == 1
+    assert dt.fields["u32"][1] == 3
+    dt = decoder.dtype(0, 1)
+    assert dt.fields["s16"] == (np.dtype("<i2"), 1)
+    assert dt.fields["u8"] == (np.dtype("u1"), 3)
+
+
+def test_decode(setups):
+    decoder = DaqDecoder(setups, daq_info())
+    frames = []
+    for cycle in range(5):
+        frames.extend(frames_for(cycle, cycle * 100))
+    daq0, daq1 = decoder.decode(frames)
+    assert np.array_equal(daq0.signals["u32"], [1000, 1001, 1002, 1003, 1004])
+    assert np.array_equal(daq0.signals["s16"], [0, -1, -2, -3, -4])
+    assert np.array_equal(daq0.signals["u8"], [0, 1, 2, 3, 4])
+    assert np.allclose(daq0.timestamps, np.arange(5) * 100 * 10e-6)
+    assert np.allclose(daq1.signals["f32"], [0.0, 0.5, 1.0, 1.5, 2.0])
+    assert daq1.event_channel == 2
+
+
+def test_incomplete_cycle_is_kept(setups):
+    decoder = DaqDecoder(setups, daq_info())
+    f0 = frames_for(0, 0)
+    f1 = frames_for(1, 10)
+    daq0, _ = decoder.decode(f0 + f1[:1])
+    assert len(daq0.signals["u32"]) == 1
+    daq0, _ = decoder.decode(f1[1:])
+    assert np.array_equal(daq0.signals["u32"], [1001])
+    assert np.array_equal(daq0.signals["s16"], [-1])
+
+
+def test_timestamp_overflow(setups):
+    decoder = DaqDecoder(setups, daq_info())
+    frames = frames_for(0, 0xFFF0) + frames_for(1, 0x0010)
+    daq0, _ = decoder.decode(frames)
+    assert np.allclose(daq0.timestamps / 10e-6, [0xFFF0, 0x10010])
+    daq0, _ = decoder.decode(frames_for(2, 0x0020))
+    assert np.allclose(daq0.timestamps / 10e-6, [0x10020])
+
+
+def test_relative_odt_numbers_and_padding(setups):
+    decoder = DaqDecoder(setups, daq_info("IDF_REL_ODT_NUMBER_ABS_DAQ_LIST_NUMBER_WORD_ALIGNED", "NO_TIME_STAMP"))
+    frames = [
+        struct.pack("<BxHL", 0, 0, 42) + b"\x00\x00",  # CAN padding.
+        struct.pack("<BxHhB", 1, 0, -7, 9),
+        struct.pack("<BxHf", 0, 1, 1.25),
+    ]
+    daq0, daq1 = decoder.decode(frames, host_timestamps=[1.0, 1.1, 1.2])
+    assert np.array_equal(daq0.signals["u32"], [42])
+    assert np.array_equal(daq0.signals["s16"], [-7])
+    assert np.array_equal(daq0.timestamps, [1.0])
+    assert np.array_equal(daq1.signals["f32"], [1.25])
+
+
+def test_repeated_measurements(setups):
+    setups[0].measurement_summary.append(("u32", 0x1000, 0, "ULONG", 4, "NO_COMPU_METHOD"))
+    decoder = DaqDecoder(setups, daq_info())
+    assert decoder.dtype(0, 0).names == ("_timestamp", "u32")
+    daq0, _ = decoder.decode(frames_for(0, 0) + frames_for(1, 100))
+    assert np.array_equal(daq0.signals["u32"], [1000, 1001])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from objutils import Image, Section
+import pytest
+
+from asamint.exceptions import DownloadVerificationError
+from asamint.xcp.flash import DownloadJournal, PagedDownloader, paging_window, plan_pages
+
+PAGE_SIZE = 0x400
+
+
+def paged_slave(fake_master, num_pages, **hooks):
+    """Flash emulation RAM behind a paging window at 0x8000, page number is the address extension."""
+    return fake_master([bytearray(0x8000 + PAGE_SIZE) for _ in range(num_pages)], **hooks)
+
+
+def make_image(num_pages):
+    return Image(
+        sections=[Section(start_address=(0x10 + idx) << 16, data=bytes([idx + 1]) * (2 * PAGE_SIZE)) for idx in range(num_pages)],
+        join=False,
+    )
+
+
+def page_contents(slave, ext):
+    return bytes(slave.memory[ext][0x8000 : 0x8000 + 2 * PAGE_SIZE])
+
+
+def test_plan_pages():
+    pages = plan_pages(make_image(2), PAGE_SIZE, paging_window(0x8000 - PAGE_SIZE, page_shift=16, first_page=0x10))
+    assert [(p.ext, p.address, len(p.data)) for p in pages] == [
+        (0, 0x7C00, PAGE_SIZE),
+        (0, 0x8000, PAGE_SIZE),
+        (1, 0x7C00, PAGE_SIZE),
+        (1, 0x8000, PAGE_SIZE),
+    ]
+
+
+def test_paged_download(fake_master):
+    slave = paged_slave(fake_master, 4)
+    downloader = PagedDownloader(slave, PAGE_SIZE, paging_window(0x8000, first_page=0x10))
+    stats = downloader.download(make_image(4))
+    assert (stats.pages, stats.written, stats.retries) == (8, 8, 0)
+    assert all(page_contents(slave, idx) == bytes([idx + 1]) * (2 * PAGE_SIZE) for idx in range(4))
+    assert stats.set_mta == 4 + 8  # One per run for writing, one per page for verification.
+
+
+def test_retry_and_failure(fake_master):
+    slave = paged_slave(fake_master, 1, corrupt=1)
+    stats = PagedDownloader(slave, PAGE_SIZE, paging_window(0x8000, first_page=0x10)).download(make_image(1))
+    assert stats.retries == 1
+    assert page_contents(slave, 0) == bytes([1]) * (2 * PAGE_SIZE)
+    slave.corrupt = 10
+    with pytest.raises(DownloadVerificationError):
+        PagedDownloader(slave, PAGE_SIZE, paging_window(0x8000, first_page=0x10), retries=2).download(make_image(1))
+
+
+def test_different_images(fake_master):
+    slave = paged_slave(fake_master, 2)
+    downloader = PagedDownloader(slave, PAGE_SIZE, paging_window(0x8000, first_page=0x10))
+    downloader.download(make_image(2))
+    image = Image(
+        sections=[Section(start_address=(0x10 + idx) << 16, data=bytes([0x80 + idx]) * (2 * PAGE_SIZE)) for idx in range(2)],
+        join=False,
+    )
+    stats = downloader.download(image)  # Same addresses, other contents.
+    assert stats.retries == 0
+    assert all(page_contents(slave, idx) == bytes([0x80 + idx]) * (2 * PAGE_SIZE) for idx in range(2))
+
+
+def test_resume(tmp_path, fake_master):
+    journal = DownloadJournal(str(tmp_path / "flash.journal"))
+    slave = paged_slave(fake_master, 4, fail_at=5)
+    downloader = PagedDownloader(slave, PAGE_SIZE, paging_window(0x8000, first_page=0x10), journal=journal)
+    with pytest.raises(ConnectionError):
+        downloader.download(make_image(4))
+    assert len(journal.done) == 4
+    slave.fail_at = None
+    stats = downloader.download(make_image(4))
+    assert (stats.resumed, stats.written) == (4, 4)
+    assert all(page_contents(slave, idx) == bytes([idx + 1]) * (2 * PAGE_SIZE) for idx in range(4))
+    assert not (tmp_path / "flash.journal").exists()
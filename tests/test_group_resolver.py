@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from asamint.a2l.groups import GroupResolver
+
+A2L = """ASAP2_VERSION 1 71
+/begin PROJECT P ""
+  /begin MODULE M ""
+    /begin COMPU_METHOD CM.LIN "" LINEAR "%6.2" "" COEFFS_LINEAR 2 0 /end COMPU_METHOD
+    /begin MEASUREMENT m1 "" UWORD CM.LIN 0 0 0 65535 ECU_ADDRESS 0x1000 /end MEASUREMENT
+    /begin MEASUREMENT m2 "" UBYTE NO_COMPU_METHOD 0 0 0 255 ECU_ADDRESS 0x1002 ECU_ADDRESS_EXTENSION 1 /end MEASUREMENT
+    /begin MEASUREMENT m3 "" ULONG NO_COMPU_METHOD 0 0 0 4294967295 ECU_ADDRESS 0x2000
+      /begin IF_DATA XCP /begin DAQ_EVENT FIXED_EVENT_LIST EVENT 0x0002 /end DAQ_EVENT /end IF_DATA
+    /end MEASUREMENT
+    /begin GROUP G1 "" ROOT
+      /begin REF_MEASUREMENT m1 /end REF_MEASUREMENT
+      /begin SUB_GROUP G2 /end SUB_GROUP
+    /end GROUP
+    /begin GROUP G2 ""
+      /begin REF_MEASUREMENT m2 m3 /end REF_MEASUREMENT
+      /begin SUB_GROUP G3 /end SUB_GROUP
+    /end GROUP
+    /begin GROUP G3 ""
+      /begin REF_MEASUREMENT m1 /end REF_MEASUREMENT
+      /begin SUB_GROUP G1 /end SUB_GROUP
+    /end GROUP
+  /end MODULE
+/end PROJECT
+"""
+
+
+@pytest.fixture(scope="module")
+def session(tmp_path_factory):
+    from pya2l import DB
+
+    path = tmp_path_factory.mktemp("a2l") / "groups.a2l"
+    path.write_text(A2L)
+    db = DB()
+    session = db.import_a2l(str(path))
+    yield session
+    session.close()
+
+
+def test_walk_cuts_cycles(session):
+    resolver = GroupResolver(session)
+    paths = [path for path, _ in resolver.walk("G1")]
+    assert paths == [("G1",), ("G1", "G2"), ("G1", "G2", "G3")]
+
+
+def test_measurements(session):
+    resolver = GroupResolver(session)
+    m1, m2, m3 = resolver.measurements("G1")
+    assert (m1.name, m1.address, m1.ext, m1.datatype, m1.compu_method) == ("m1", 0x1000, 0, "UWORD", "CM.LIN")
+    assert (m2.name, m2.address, m2.ext) == ("m2", 0x1002, 1)
+    assert m3.name == "m3"
+    assert "FIXED_EVENT_LIST" in m3.if_data[0]
+    assert [m.name for m in resolver.measurements("G2", recursive=False)] == ["m2", "m3"]
+
+
+def test_unknown_group(session):
+    assert GroupResolver(session).measurements("nope") == []
+
+
+def test_memoized_per_key(session):
+    GroupResolver.clear_cache()
+    GroupResolver(session, key="demo").load(["G2"])
+    assert "G3" in GroupResolver(session, key="demo")._groups
+    assert GroupResolver(session, key="other")._groups == {}
+    GroupResolver.clear_cache()
+
+
+def test_overlapping_groups(session, tmp_path, monkeypatch):
+    from asamint.asam import AsamBaseType
+    from asamint.xcp import XCPMeasurement
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(AsamBaseType, "_session_obj", session, raising=False)
+    measurement = XCPMeasurement({"A2L_FILE": "groups.a2l", "PROJECT": "p", "SHORTNAME": "s"}, {"SUBJECT": "s", "SHORTNAME": "s"})
+    setups = measurement.setup_groups(["G1", "G2"])  # m1 is in G1 and G3, G2 is a sub-group of G1.
+    assert [(s.event_channel, [m[0] for m in s.measurement_summary]) for s in setups] == [(2, ["m3"]), (3, ["m1", "m2"])]
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+from asamint.utils.optimize import McObject
+from asamint.xcp.image_store import ImageStore
+from asamint.xcp.transfer import fingerprint
+
+BLOCKS = [McObject("", 0x1000, 4), McObject("", 0x2000, 2, ext=1)]
+DATA = [b"\x01\x02\x03\x04", b"\x05\x06"]
+
+
+def test_round_trip(tmp_path):
+    store = ImageStore(str(tmp_path / "images"))
+    assert store.get("abc") is None
+    store.put("abc", BLOCKS, DATA)
+    assert store.get("abc") == {(0, 0x1000, 4): DATA[0], (1, 0x2000, 2): DATA[1]}
+
+
+def test_lru_eviction(tmp_path):
+    store = ImageStore(str(tmp_path), max_entries=2)
+    for idx, key in enumerate(("a", "b")):
+        store.put(key, BLOCKS, DATA)
+        os.utime(store.file_name(key), (idx, idx))
+    store.get("a")  # "b" is now least recently used.
+    store.put("c", BLOCKS, DATA)
+    assert sorted(key for key, _, _ in store.entries()) == ["a", "c"]
+
+
+def test_size_limit(tmp_path):
+    store = ImageStore(str(tmp_path), max_size=1)
+    store.put("a", BLOCKS, DATA)
+    os.utime(store.file_name("a"), (0, 0))
+    store.put("b", BLOCKS, DATA)
+    assert [key for key, _, _ in store.entries()] == ["b"]  # The most recent image is always kept.
+
+
+def test_fingerprint():
+    remote = {0: ("XCP_CRC_32", 0x1234), 1: ("XCP_CRC_32", 0x5678)}
+    key = fingerprint("EPK_1", BLOCKS, remote)
+    assert key == fingerprint("EPK_1", BLOCKS, dict(remote))
+    assert key != fingerprint("EPK_2", BLOCKS, remote)
+    assert key != fingerprint("EPK_1", BLOCKS, {**remote, 1: ("XCP_CRC_32", 0x5679)})
+    assert fingerprint("EPK_1", BLOCKS, {0: remote[0]}) is None
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from asamint.utils.optimize import McObject
+from asamint.xcp.instrumentation import TransferStatistics, instrumented
+from asamint.xcp.transfer import upload_blocks
+
+
+def test_statistics(fake_master):
+    slave = fake_master(bytearray(range(256)), fail_at=2)
+    blocks = [McObject("", 0x00, 16), McObject("", 0x40, 7)]
+    with instrumented(slave) as statistics:
+        data, _ = upload_blocks(slave, blocks)
+        slave.push(b"\x01\x02")
+        with pytest.raises(ConnectionError):
+            slave.push(b"\x03")
+    assert data[1] == bytes(range(0x40, 0x47))
+    report = json.loads(statistics.to_json())
+    operations = report["operations"]
+    assert operations["setMta"]["calls"] == 2
+    assert operations["pull"]["calls"] == 2 and operations["pull"]["bytes"] == 23
+    assert operations["upload"]["calls"] == 4  # Nested round-trips of `pull`.
+    assert operations["push"]["calls"] == 2 and operations["push"]["errors"] == 1 and operations["push"]["bytes"] == 2
+    assert sum(operations["upload"]["histogram"].values()) == 4
+    assert report["wall_time"] > 0
+
+
+def test_restored_after_context(fake_master):
+    slave = fake_master(bytearray(16))
+    statistics = TransferStatistics()
+    with instrumented(slave, statistics=statistics, operations=("pull",)):
+        assert "pull" in vars(slave)
+        slave.pull(4)
+    assert "pull" not in vars(slave)
+    slave.pull(4)
+    assert statistics.report()["operations"]["pull"]["calls"] == 1
+    assert "upload" not in statistics.operations
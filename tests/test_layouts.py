@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from asamint.a2l.layouts import LayoutExtractor, MemoryLayout, ValueLayout, value_layouts
+
+A2L = """ASAP2_VERSION 1 71
+/begin PROJECT P ""
+  /begin MODULE M ""
+    /begin RECORD_LAYOUT RL.VALUE.UWORD FNC_VALUES 1 UWORD COLUMN_DIR DIRECT /end RECORD_LAYOUT
+    /begin RECORD_LAYOUT RL.VALUE.FLOAT32 FNC_VALUES 1 FLOAT32_IEEE COLUMN_DIR DIRECT /end RECORD_LAYOUT
+    /begin RECORD_LAYOUT RL.ASCII FNC_VALUES 1 UBYTE COLUMN_DIR DIRECT /end RECORD_LAYOUT
+    /begin RECORD_LAYOUT RL.CURVE
+      NO_AXIS_PTS_X 1 UBYTE
+      AXIS_PTS_X 2 SWORD INDEX_INCR DIRECT
+      FNC_VALUES 3 UWORD COLUMN_DIR DIRECT
+      RESERVED 4 WORD
+    /end RECORD_LAYOUT
+    /begin RECORD_LAYOUT RL.MAP FNC_VALUES 1 SLONG ROW_DIR DIRECT IDENTIFICATION 2 UWORD /end RECORD_LAYOUT
+    /begin RECORD_LAYOUT RL.AXIS NO_AXIS_PTS_X 1 UWORD AXIS_PTS_X 2 FLOAT32_IEEE INDEX_INCR DIRECT /end RECORD_LAYOUT
+    /begin CHARACTERISTIC v "" VALUE 0x4000 RL.VALUE.UWORD 0 NO_COMPU_METHOD 0 65535 /end CHARACTERISTIC
+    /begin CHARACTERISTIC v2 "" VALUE 0x4002 RL.VALUE.FLOAT32 0 NO_COMPU_METHOD 0 100 ECU_ADDRESS_EXTENSION 2 /end CHARACTERISTIC
+    /begin COMPU_METHOD CM.LIN "" LINEAR "%6.2" "km/h" COEFFS_LINEAR 2 1 /end COMPU_METHOD
+    /begin CHARACTERISTIC v3 "speed" VALUE 0x4008 RL.VALUE.UWORD 0 CM.LIN 0 65535
+      BIT_MASK 0x0FF0 BYTE_ORDER MSB_FIRST DISPLAY_IDENTIFIER v_3
+      /begin DEPENDENT_CHARACTERISTIC "X1" v /end DEPENDENT_CHARACTERISTIC
+    /end CHARACTERISTIC
+    /begin CHARACTERISTIC blk "" VAL_BLK 0x4010 RL.VALUE.UWORD 0 NO_COMPU_METHOD 0 65535 MATRIX_DIM 3 4 /end CHARACTERISTIC
+    /begin CHARACTERISTIC txt "" ASCII 0x4040 RL.ASCII 0 NO_COMPU_METHOD 0 255 NUMBER 16 /end CHARACTERISTIC
+    /begin CHARACTERISTIC crv "" CURVE 0x4100 RL.CURVE 0 NO_COMPU_METHOD 0 65535
+      /begin AXIS_DESCR STD_AXIS NO_INPUT_QUANTITY NO_COMPU_METHOD 8 0 100 /end AXIS_DESCR
+    /end CHARACTERISTIC
+    /begin CHARACTERISTIC map "" MAP 0x4200 RL.MAP 0 NO_COMPU_METHOD 0 100
+      /begin AXIS_DESCR COM_AXIS NO_INPUT_QUANTITY NO_COMPU_METHOD 5 0 100 AXIS_PTS_REF ax /end AXIS_DESCR
+      /begin AXIS_DESCR FIX_AXIS NO_INPUT_QUANTITY NO_COMPU_METHOD 3 0 2 FIX_AXIS_PAR 0 1 3 /end AXIS_DESCR
+    /end CHARACTERISTIC
+    /begin AXIS_PTS ax "" 0x4300 NO_INPUT_QUANTITY RL.AXIS 0 NO_COMPU_METHOD 5 0 100 /end AXIS_PTS
+  /end MODULE
+/end PROJECT
+"""
+
+
+@pytest.fixture(scope="module")
+def session(tmp_path_factory):
+    from pya2l import DB
+
+    path = tmp_path_factory.mktemp("a2l") / "layouts.a2l"
+    path.write_text(A2L)
+    db = DB()
+    session = db.import_a2l(str(path))
+    yield session
+    session.close()
+
+
+def test_layouts(session):
+    layouts = LayoutExtractor(session).layouts()
+    assert {name: (l.address, l.ext, l.size) for name, l in layouts.items()} == {
+        "v": (0x4000, 0, 2),
+        "v2": (0x4002, 2, 4),
+        "v3": (0x4008, 0, 2),
+        "blk": (0x4010, 0, 24),
+        "txt": (0x4040, 0, 16),
+        "crv": (0x4100, 0, 1 + 8 * 2 + 8 * 2 + 2),
+        "map": (0x4200, 0, 5 * 3 * 4 + 2),
+        "ax": (0x4300, 0, 2 + 5 * 4),
+    }
+    assert layouts["crv"].category == "CHARACTERISTIC"
+    assert layouts["ax"].category == "AXIS_PTS"
+
+
+def test_sizes_match_inspect(session):
+    from pya2l.api.inspect import Characteristic
+
+    layouts = LayoutExtractor(session).layouts()
+    for name in ("v", "v2", "txt", "crv", "map"):
+        assert layouts[name].size == Characteristic(session, name).total_allocated_memory
+
+
+def test_cached_per_key(session, tmp_path):
+    LayoutExtractor.clear_cache()
+    extractor = LayoutExtractor(session, key="abc", cache_dir=str(tmp_path))
+    layouts = extractor.layouts()
+    assert (tmp_path / "param_layouts_abc.json").exists()
+    assert LayoutExtractor(None, key="abc").layouts() is layouts
+    LayoutExtractor.clear_cache()
+    assert LayoutExtractor(None, key="abc", cache_dir=str(tmp_path)).layouts() == layouts
+    assert isinstance(layouts["v"], MemoryLayout)
+    LayoutExtractor.clear_cache()
+
+
+def test_value_layouts(session):
+    layouts = value_layouts(session)
+    assert sorted(layouts) == ["v", "v2", "v3"]
+    assert layouts["v"] == ValueLayout("v", 0x4000, 0, "UWORD", None, None, "NO_COMPU_METHOD", "", None, None, False)
+    assert layouts["v2"].ext == 2 and layouts["v2"].datatype == "FLOAT32_IEEE"
+    assert layouts["v3"] == ValueLayout("v3", 0x4008, 0, "UWORD", "MSB_FIRST", 0x0FF0, "CM.LIN", "speed", "v_3", "km/h", True)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from asamint.calibration.lazy import LazyParameters
+
+
+@pytest.fixture
+def parameters():
+    calls = []
+    axis_pts = LazyParameters(["ax"], lambda name: calls.append(name) or "axis {}".format(name))
+    references = {"c1": "c2", "c2": None, "c3": "c3"}
+
+    def load_curve(name):
+        calls.append(name)
+        ref = references[name]
+        return (name, curves[ref] if ref else axis_pts["ax"])
+
+    curves = LazyParameters(["c1", "c2", "c3"], load_curve)
+    return axis_pts, curves, calls
+
+
+def test_decoded_on_first_access(parameters):
+    axis_pts, curves, calls = parameters
+    assert len(curves) == 3 and "c1" in curves
+    assert calls == []
+    assert curves["c1"] == ("c1", ("c2", "axis ax"))
+    assert calls == ["c1", "c2", "ax"]  # Dependencies are decoded on demand...
+    assert curves["c1"] is curves["c1"]
+    assert calls == ["c1", "c2", "ax"]  # ... and cached.
+    assert curves.pending() == ["c3"]
+    with pytest.raises(KeyError):
+        curves["c4"]
+
+
+def test_materialize(parameters):
+    axis_pts, curves, calls = parameters
+    del curves["c3"]  # Self-reference.
+    assert list(curves.materialize()) == ["c1", "c2"]
+    assert curves.pending() == [] and axis_pts.is_loaded("ax")
+    curves["c0"] = "explicit"
+    assert list(curves.items())[-1] == ("c0", "explicit")
+
+
+def test_circular_reference(parameters):
+    _, curves, _ = parameters
+    with pytest.raises(ValueError):
+        curves["c3"]
+    assert not curves.is_loaded("c3")
@@ -123,3 +123,32 @@ def test_mc_index():
     assert mo.index(0x1004) == 4
     with pytest.raises(ValueError):
         assert mo.index(0x1005)
+
+
+def test_address_extensions_not_merged():
+    blocks = make_continuous_blocks(
+        [
+            McObject("a", 0x1000, 4, ext=1),
+            McObject("b", 0x1000, 2, ext=0),
+            McObject("c", 0x1004, 4, ext=1),
+            McObject("d", 0x1002, 2, ext=0),
+        ]
+    )
+    assert blocks == [
+        McObject(name="", address=0x1000, length=4, ext=0),
+        McObject(name="", address=0x1000, length=8, ext=1),
+    ]
+    assert McObject("", 0x1000, 4, ext=0) != McObject("", 0x1000, 4, ext=1)
+
+
+def test_upper_bound_per_extension():
+    blocks = make_continuous_blocks(
+        [McObject("", 0x1000 + 4 * i, 4, ext=ext) for ext in (0, 2) for i in range(3)],
+        upper_bound=8,
+    )
+    assert [(b.ext, b.address, b.length) for b in blocks] == [
+        (0, 0x1000, 8),
+        (0, 0x1008, 4),
+        (2, 0x1000, 8),
+        (2, 0x1008, 4),
+    ]
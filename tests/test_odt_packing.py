@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from asamint.utils.optimize import McObject
+from asamint.utils.optimize.odt_packing import OdtItem
+from asamint.utils.optimize.odt_packing import align_items
+from asamint.utils.optimize.odt_packing import pack_odts
+from asamint.xcp.daq import split_points_from_summary
+
+
+@pytest.fixture
+def blocks():
+    return [
+        McObject(name="", address=0x000E10BA, length=2),
+        McObject(name="", address=0x000E10BE, length=2),
+        McObject(name="", address=0x000E41F4, length=4),
+        McObject(name="", address=0x000E51FC, length=4),
+        McObject(name="", address=0x00125288, length=4),
+        McObject(name="", address=0x00125294, length=4),
+        McObject(name="", address=0x001252A1, length=1),
+        McObject(name="", address=0x001252A4, length=4),
+        McObject(name="", address=0x00125438, length=3),
+        McObject(name="", address=0x0012543C, length=1),
+    ]
+
+
+def total_bytes(bins):
+    return sum(e.length for b in bins for e in b.entries)
+
+
+def test_empty():
+    assert pack_odts([], bin_size=7) == []
+
+
+def test_single_odt(blocks):
+    bins = pack_odts(blocks, bin_size=253)
+    assert len(bins) == 1
+    assert bins[0].residual_capacity == 253 - 29
+    assert bins[0].entries[0] == OdtItem(0x000E10BA, 2, 0)
+
+
+def test_splitting_saves_odts(blocks):
+    assert len(pack_odts(blocks, bin_size=6, split=False)) == 6
+    bins = pack_odts(blocks, bin_size=6)
+    assert len(bins) == 5  # ceil(29 / 6)
+    assert total_bytes(bins) == 29
+
+
+def test_max_entry_size():
+    bins = pack_odts([McObject("", 0x1000, 20)], bin_size=7, max_entry_size=4)
+    assert len(bins) == 3
+    assert all(e.length <= 4 for b in bins for e in b.entries)
+    assert total_bytes(bins) == 20
+
+
+def test_granularity():
+    assert align_items([McObject("", 0x1001, 3), McObject("", 0x1006, 1)], granularity=4) == [OdtItem(0x1000, 8, 0)]
+    bins = pack_odts([McObject("", 0x1001, 3)], bin_size=8, granularity=4)
+    assert bins[0].entries == [OdtItem(0x1000, 4, 0)]
+
+
+def test_split_points():
+    bins = pack_odts([McObject("", 0x1000, 10)], bin_size=7, split_points=[(0, 0x1004), (0, 0x1008)])
+    assert [b.entries for b in bins] == [[OdtItem(0x1000, 4, 0)], [OdtItem(0x1004, 6, 0)]]
+
+
+def test_unsplittable_block():
+    with pytest.raises(ValueError):
+        pack_odts([McObject("", 0x1000, 10)], bin_size=7, split_points=[])
+
+
+def test_reserved_first_odt():
+    bins = pack_odts([McObject("", 0x1000, 6), McObject("", 0x2000, 2)], bin_size=6, reserved=4, split=False)
+    assert bins[0].length == 2
+    assert bins[0].entries == [OdtItem(0x2000, 2, 0)]
+
+
+def test_address_extension_per_odt():
+    class Obj:
+        def __init__(self, address, length, ext):
+            self.address, self.length, self.ext = address, length, ext
+
+    items = [Obj(0x1000, 2, 0), Obj(0x1000, 2, 1)]
+    assert len(pack_odts(items, bin_size=8)) == 1
+    bins = pack_odts(items, bin_size=8, address_extension="AE_SAME_FOR_ALL_ODT")
+    assert [[e.ext for e in b.entries] for b in bins] == [[0], [1]]
+    with pytest.raises(ValueError):
+        pack_odts(items, bin_size=8, address_extension="AE_SAME_FOR_ALL_DAQ")
+
+
+def test_exact_beats_heuristic():
+    # FFD needs three bins (4 + 4), (3 + 3 + 3), (3), optimum is two: (4 + 3 + 3), (4 + 3 + 3).
+    items = [McObject("", 0x1000 + 0x10 * i, length) for i, length in enumerate((4, 3, 3, 4, 3, 3))]
+    assert len(pack_odts(items, bin_size=10, split=False)) == 3
+    exact = pack_odts(items, bin_size=10, split=False, exact=True)
+    assert len(exact) == 2
+    assert total_bytes(exact) == 20
+
+
+def test_split_points_from_summary():
+    summary = [
+        ("a", 0x1000, 0, "ULONG", 4, "NO_COMPU_METHOD"),
+        ("b", 0x1002, 0, "UWORD", 2, "NO_COMPU_METHOD"),
+        ("c", 0x1004, 0, "UWORD", 2, "NO_COMPU_METHOD"),
+    ]
+    assert split_points_from_summary(summary) == [(0, 0x1000), (0, 0x1004), (0, 0x1006)]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+from objutils import Image, Section
+
+from asamint.utils.optimize import McObject
+from asamint.xcp.orchestrator import Orchestrator
+
+
+def make_slaves(fake_master, count):
+    return {"ECU{}".format(idx): fake_master(bytearray(os.urandom(0x100)), latency=0.01) for idx in range(count)}
+
+
+def test_concurrent_upload(fake_master):
+    slaves = make_slaves(fake_master, 6)
+    blocks = [McObject("", 0x00, 16), McObject("", 0x12, 4), McObject("", 0x80, 8)]
+    batch = Orchestrator(slaves).upload(blocks)
+    assert all(r.ok for r in batch.results.values())
+    assert batch.wall_time < sum(r.duration for r in batch.results.values()) / 2
+    for name, result in batch.results.items():
+        assert result.value.read(0x12, 4) == slaves[name].memory[0x12:0x16]
+        assert result.value.read(0x80, 8) == slaves[name].memory[0x80:0x88]
+
+
+def test_failures_are_isolated(fake_master):
+    slaves = make_slaves(fake_master, 3)
+    slaves["ECU0"].memory[0:4] = b"EPK1"
+    slaves["ECU1"].memory[0:4] = b"EPK1"
+    slaves["ECU2"].memory[0:4] = b"EPK2"
+    batch = Orchestrator(slaves).check_epk("EPK1", 0)
+    assert [r.ok for r in batch.results.values()] == [True, True, False]
+    assert isinstance(batch.results["ECU2"].error, ValueError)
+
+
+def test_differential_download(fake_master):
+    slaves = make_slaves(fake_master, 4)
+    references = {name: Image(sections=[Section(0, bytes(s.memory))], join=False) for name, s in slaves.items()}
+    images = {}
+    for name, slave in slaves.items():
+        target = bytearray(slave.memory)
+        target[0x40:0x48] = bytes(8)
+        images[name] = Image(sections=[Section(0, bytes(target))], join=False)
+    batch = Orchestrator(slaves).download(images, references, verify=True)
+    for name, result in batch.results.items():
+        assert result.ok and result.value.changed_bytes <= 8
+        assert slaves[name].memory[0x40:0x48] == bytes(8)
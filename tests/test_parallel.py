@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import time
+
+import numpy as np
+from objutils import Image, Section
+import pytest
+
+from asamint.asam import AsamBaseType
+from asamint.calibration import CalibrationData
+from asamint.calibration.lazy import LazyParameters
+from asamint.calibration.parallel import SharedImage, attach_image, curve_axis_levels, stages
+
+A2L = """ASAP2_VERSION 1 71
+/begin PROJECT P ""
+  /begin MODULE M ""
+    /begin MOD_COMMON "" BYTE_ORDER MSB_LAST /end MOD_COMMON
+    /begin COMPU_METHOD CM.LIN "" LINEAR "%6.2" "km/h" COEFFS_LINEAR 2 1 /end COMPU_METHOD
+    /begin RECORD_LAYOUT RL.UWORD FNC_VALUES 1 UWORD COLUMN_DIR DIRECT /end RECORD_LAYOUT
+    /begin CHARACTERISTIC v1 "" VALUE 0x1000 RL.UWORD 0 CM.LIN 0 65535 /end CHARACTERISTIC
+    /begin CHARACTERISTIC v2 "" VALUE 0x1002 RL.UWORD 0 NO_COMPU_METHOD 0 65535 /end CHARACTERISTIC
+    /begin CHARACTERISTIC b1 "" VAL_BLK 0x1010 RL.UWORD 0 NO_COMPU_METHOD 0 65535 NUMBER 2 /end CHARACTERISTIC
+    /begin CHARACTERISTIC b2 "" VAL_BLK 0x1020 RL.UWORD 0 NO_COMPU_METHOD 0 65535 NUMBER 2 /end CHARACTERISTIC
+    /begin CHARACTERISTIC b3 "" VAL_BLK 0x1030 RL.UWORD 0 NO_COMPU_METHOD 0 65535 NUMBER 2 /end CHARACTERISTIC
+  /end MODULE
+/end PROJECT
+"""
+
+A2L_AXES = """ASAP2_VERSION 1 71
+/begin PROJECT P ""
+  /begin MODULE M ""
+    /begin MOD_COMMON "" BYTE_ORDER MSB_LAST /end MOD_COMMON
+    /begin COMPU_METHOD CM.LIN "" LINEAR "%6.2" "km/h" COEFFS_LINEAR 2 1 /end COMPU_METHOD
+    /begin RECORD_LAYOUT RL.UWORD FNC_VALUES 1 UWORD COLUMN_DIR DIRECT /end RECORD_LAYOUT
+    /begin RECORD_LAYOUT RL.AXIS AXIS_PTS_X 1 UWORD INDEX_INCR DIRECT /end RECORD_LAYOUT
+    /begin CHARACTERISTIC v1 "" VALUE 0x1000 RL.UWORD 0 CM.LIN 0 65535 /end CHARACTERISTIC
+    /begin AXIS_PTS ax "" 0x1010 NO_INPUT_QUANTITY RL.AXIS 0 NO_COMPU_METHOD 4 0 65535 /end AXIS_PTS
+    /begin CHARACTERISTIC c1 "" CURVE 0x1020 RL.UWORD 0 CM.LIN 0 65535
+      /begin AXIS_DESCR COM_AXIS NO_INPUT_QUANTITY NO_COMPU_METHOD 4 0 65535 AXIS_PTS_REF ax /end AXIS_DESCR
+    /end CHARACTERISTIC
+    /begin CHARACTERISTIC c2 "" CURVE 0x1030 RL.UWORD 0 NO_COMPU_METHOD 0 65535
+      /begin AXIS_DESCR CURVE_AXIS NO_INPUT_QUANTITY NO_COMPU_METHOD 4 0 65535 CURVE_AXIS_REF c1 /end AXIS_DESCR
+    /end CHARACTERISTIC
+    /begin CHARACTERISTIC c3 "" CURVE 0x2000 RL.UWORD 0 CM.LIN 0 65535
+      /begin AXIS_DESCR CURVE_AXIS NO_INPUT_QUANTITY NO_COMPU_METHOD 4 0 65535 CURVE_AXIS_REF c2 /end AXIS_DESCR
+    /end CHARACTERISTIC
+  /end MODULE
+/end PROJECT
+"""
+
+
+def make_image():
+    return Image(sections=[Section(0x1000, bytes(range(0x40))), Section(0x2000, bytes(range(0x80, 0x90)))], join=False)
+
+
+def test_shared_image():
+    image = make_image()
+    with SharedImage(image) as shared_image:
+        view = attach_image(shared_image.spec)
+        assert [(s.start_address, bytes(s.data)) for s in view.sections] == [
+            (s.start_address, bytes(s.data)) for s in image.sections
+        ]
+        assert view.read(0x2004, 4) == bytes(range(0x84, 0x88))
+        assert view.read_numeric(0x1002, "uint16_be") == 0x0203
+        shared_image.shm.buf[0x2004 - 0x2000 + 0x40] = 0xFF  # No private copy.
+        assert view.read(0x2004, 1) == b"\xff"
+
+
+def test_stages():
+    refs = {
+        "c1": [("CURVE", "c2")],
+        "c2": [("CURVE", "c3")],
+        "c3": [("AXIS_PTS", "ax")],
+        "m1": [("CURVE", "c1"), ("AXIS_PTS", "ax")],
+    }
+    assert curve_axis_levels(["c0", "c1", "c2", "c3"], refs) == [["c3"], ["c2"], ["c1"]]
+    parameters = {category: LazyParameters([], None) for category in ("VAL_BLK", "ASCII", "CUBOID", "CUBE_4", "CUBE_5")}
+    parameters["AXIS_PTS"] = LazyParameters(["ax"], None)
+    parameters["CURVE"] = LazyParameters(["c0", "c1", "c2", "c3"], None)
+    parameters["MAP"] = LazyParameters(["m1"], None)
+    plan = stages(parameters, refs, batch_size=2)
+    assert [[(b.category, b.names) for b in stage] for stage in plan] == [
+        [("AXIS_PTS", ["ax"])],
+        [("CURVE", ["c3"])],
+        [("CURVE", ["c2"])],
+        [("CURVE", ["c1"])],
+        [("CURVE", ["c0"]), ("MAP", ["m1"])],
+    ]
+
+
+class BlockData(CalibrationData):
+    def save(self):
+        pass
+
+    def _load_value_block(self, name):
+        address = {"b1": 0x1010, "b2": 0x1020, "b3": 0x1030}[name]
+        return (name, os.getpid(), bytes(self.image.read(address, 4)))
+
+
+def test_parallel_load_hex(tmp_path, monkeypatch):
+    from pya2l import DB
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "par.a2l").write_text(A2L)
+    monkeypatch.setattr(AsamBaseType, "_session_obj", DB().open_create("par.a2l"), raising=False)
+    data = BlockData({"A2L_FILE": "par.a2l", "PROJECT": "p", "SHORTNAME": "s"}, {"SUBJECT": "s", "SHORTNAME": "s"})
+    data.image = make_image()
+    data.load_hex()
+    sequential = {category: dict(values) for category, values in data.parameters.items()}
+    data.image = make_image()
+    data.load_hex(workers=2)
+    parallel = data.parameters
+    assert list(parallel["VAL_BLK"]) == ["b1", "b2", "b3"]
+    assert all(pid != os.getpid() for _, pid, _ in parallel["VAL_BLK"].values())
+    assert [(n, d) for n, _, d in parallel["VAL_BLK"].values()] == [(n, d) for n, _, d in sequential["VAL_BLK"].values()]
+    assert {n: v.converted_value for n, v in parallel["VALUE"].items()} == {"v1": 2 * 0x0100 + 1.0, "v2": 0x0302}  # MSB_LAST.
+
+
+class StagedData(CalibrationData):
+    """Stands in for the AXIS_PTS / CURVE decoders, records if dependencies were already there."""
+
+    DEPENDENCIES = {"c1": ("AXIS_PTS", "ax"), "c2": ("CURVE", "c1"), "c3": ("CURVE", "c2")}
+    ADDRESSES = {"ax": 0x1010, "c1": 0x1020, "c2": 0x1030, "c3": 0x2000}
+
+    def save(self):
+        pass
+
+    def _load_axis_pt(self, name):
+        return (name, os.getpid(), True, None, bytes(self.image.read(self.ADDRESSES[name], 8)))
+
+    def _load_curve_or_map(self, name, category, num_axes):
+        time.sleep(0.1)  # Keep a worker busy, so the pool spreads a stage across workers.
+        dep_category, dep_name = self.DEPENDENCIES[name]
+        present = self.parameters[dep_category].is_loaded(dep_name)
+        dependency = self.parameters[dep_category][dep_name]
+        return (name, os.getpid(), present, dependency[-1], bytes(self.image.read(self.ADDRESSES[name], 8)))
+
+
+def test_parallel_staging(tmp_path, monkeypatch):
+    from pya2l import DB
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "staged.a2l").write_text(A2L_AXES)
+    monkeypatch.setattr(AsamBaseType, "_session_obj", DB().open_create("staged.a2l"), raising=False)
+    data = StagedData({"A2L_FILE": "staged.a2l", "PROJECT": "p", "SHORTNAME": "s"}, {"SUBJECT": "s", "SHORTNAME": "s"})
+    data.image = make_image()
+    data.load_hex()
+    sequential = {category: dict(data.parameters[category]) for category in ("AXIS_PTS", "CURVE")}
+    data.image = make_image()
+    data.load_hex(workers=2)
+    parallel = data.parameters
+    assert list(parallel["CURVE"]) == ["c1", "c2", "c3"]
+    for category in ("AXIS_PTS", "CURVE"):
+        for name, (_, pid, present, dependency, raw) in parallel[category].items():
+            assert pid != os.getpid()
+            assert present  # Decoded in an earlier stage, not on demand by the worker.
+            assert (dependency, raw) == sequential[category][name][3:]
+    assert parallel["CURVE"]["c3"][3] == bytes(range(0x30, 0x38))
+    assert parallel["CURVE"]["c3"][4] == bytes(range(0x80, 0x88))
+
+
+class AxesData(CalibrationData):
+    def save(self):
+        pass
+
+
+def test_parallel_load_hex_axes(tmp_path, monkeypatch):
+    from pya2l import DB
+    from pya2l.api.inspect import AxisPts
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "axes.a2l").write_text(A2L_AXES)
+    session = DB().open_create("axes.a2l")
+    if isinstance(AxisPts.get(session, "ax").record_layout_components, dict):
+        pytest.skip("Installed pya2l has an incompatible RECORD_LAYOUT API.")
+    monkeypatch.setattr(AsamBaseType, "_session_obj", session, raising=False)
+    data = AxesData({"A2L_FILE": "axes.a2l", "PROJECT": "p", "SHORTNAME": "s"}, {"SUBJECT": "s", "SHORTNAME": "s"})
+    data.image = make_image()
+    data.load_hex()
+    sequential = {category: dict(values) for category, values in data.parameters.items()}
+    data.image = make_image()
+    data.load_hex(workers=2)
+    parallel = data.parameters
+    assert list(parallel["CURVE"]) == ["c1", "c2", "c3"]
+    for category, names in (("AXIS_PTS", ["ax"]), ("CURVE", ["c1", "c2", "c3"])):
+        for name in names:
+            assert np.array_equal(parallel[category][name].raw_values, sequential[category][name].raw_values)
+            assert np.array_equal(parallel[category][name].converted_values, sequential[category][name].converted_values)
+    assert [a.curve_axis_ref for a in parallel["CURVE"]["c3"].axes] == ["c2"]
+    assert parallel["CURVE"]["c2"].raw_values.tolist() == [0x3130 + 0x0202 * i for i in range(4)]  # MSB_LAST.
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import struct
+
+import numpy as np
+import pytest
+from asammdf import MDF
+
+from asamint.utils.optimize import McObject
+from asamint.xcp.daq import DaqEntry
+from asamint.xcp.daq import DaqListSetup
+from asamint.xcp.pipeline import DaqMdfPipeline
+from asamint.xcp.reco import XcpLogFileWriter
+
+DAQ_INFO = {
+    "processor": {"keyByte": {"identificationField": "IDF_ABS_ODT_NUMBER", "addressExtension": "AE_DIFFERENT_WITHIN_ODT"}},
+    "resolution": {
+        "timestampTicks": 1,
+        "maxOdtEntrySizeDaq": 0,
+        "granularityOdtEntrySizeDaq": 1,
+        "timestampMode": {"unit": "DAQ_TIMESTAMP_UNIT_1MS", "fixed": False, "size": "S4"},
+    },
+}
+
+SETUPS = [
+    DaqListSetup(
+        event_channel=1,
+        prescaler=1,
+        priority=0,
+        blocks=[McObject("", 0x1000, 2)],
+        measurement_summary=[("speed", 0x1000, 0, "UWORD", 2, "CM.LINEAR")],
+        odts=[[DaqEntry(0xFF, 2, 0x1000, 0)]],
+    ),
+    DaqListSetup(
+        event_channel=2,
+        prescaler=1,
+        priority=0,
+        blocks=[McObject("", 0x2000, 1)],
+        measurement_summary=[("gear", 0x2000, 0, "UBYTE", 1, "NO_COMPU_METHOD")],
+        odts=[[DaqEntry(0xFF, 1, 0x2000, 0)]],
+    ),
+]
+
+
+def record(file_name, count):
+    writer = XcpLogFileWriter(file_name, prealloc=2, chunk_size=1)
+    for idx in range(count):
+        frames = [(0, 0.0, struct.pack("<BLH", 0, idx, idx))]
+        if idx % 2 == 0:
+            frames.append((0, 0.0, struct.pack("<BLB", 1, idx, idx & 0xFF)))
+        writer.add_xcp_frames(frames)
+    writer.close()
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_pipeline(tmp_path, parallel):
+    log_file = str(tmp_path / "rec")
+    mdf_file = str(tmp_path / "rec.mf4")
+    record(log_file, 500)
+    pipeline = DaqMdfPipeline(
+        SETUPS,
+        DAQ_INFO,
+        converter=lambda cm, values: values * 0.5 if cm == "CM.LINEAR" else values,
+        chunk_size=64,
+        parallel=parallel,
+    )
+    pipeline.run(log_file, mdf_file)
+    with MDF(mdf_file) as mdf:
+        assert len(mdf.groups) == 2
+        speed = mdf.get("speed")
+        gear = mdf.get("gear")
+    assert np.allclose(speed.samples, np.arange(500) * 0.5)
+    assert np.allclose(speed.timestamps, np.arange(500) * 0.001)
+    assert np.array_equal(gear.samples, np.arange(0, 500, 2) & 0xFF)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from asamint.xcp.daq import DaqEntry
+from asamint.xcp.daq import DaqListSetup
+from asamint.xcp.daq import EventChannel
+from asamint.xcp.planner import BandwidthPlanner
+from asamint.xcp.planner import can_frame_bits
+from asamint.xcp.planner import frame_bits
+
+DAQ_INFO = {
+    "processor": {
+        "minDaq": 0,
+        "maxDaq": 0,
+        "properties": {"prescalerSupported": True},
+        "keyByte": {"identificationField": "IDF_ABS_ODT_NUMBER", "addressExtension": "AE_DIFFERENT_WITHIN_ODT"},
+    },
+    "resolution": {"timestampMode": {"unit": "DAQ_TIMESTAMP_UNIT_1US", "fixed": False, "size": "S2"}},
+}
+
+EVENTS = {
+    0: EventChannel(0, "1ms", "1ms", 1, 6, 0, 0xFF),
+    1: EventChannel(1, "10ms", "10ms", 10, 6, 0, 0xFF),
+    2: EventChannel(2, "sporadic", "sp", 0, 6, 0, 0xFF),
+}
+
+
+def setup(event_channel, odt_lengths, prescaler=1):
+    return DaqListSetup(
+        event_channel=event_channel,
+        prescaler=prescaler,
+        priority=0,
+        blocks=[],
+        measurement_summary=[],
+        odts=[[DaqEntry(0xFF, length, 0x1000, 0)] for length in odt_lengths],
+    )
+
+
+@pytest.fixture
+def planner():
+    return BandwidthPlanner(DAQ_INFO, 8, EVENTS, transport="CAN", bitrate=500000)
+
+
+def test_frame_bits():
+    assert can_frame_bits(8) == 64 + 47 + (34 + 64 - 1) // 4
+    assert frame_bits(3, "CAN", 8, pad_frames=True) == can_frame_bits(8)
+    assert frame_bits(10, "CANFD", 64) == can_frame_bits(12)
+    assert frame_bits(10, "ETH", 1024) == 8 * (10 + 70)
+
+
+def test_estimate(planner):
+    plan = planner.estimate([setup(0, [5, 7]), setup(1, [5]), setup(2, [5])])
+    load_1ms, load_10ms, load_sporadic = plan.daq_loads
+    assert load_1ms.frames_per_second == pytest.approx(2000.0)
+    assert load_1ms.bytes_per_second == pytest.approx((1 + 2 + 5 + 1 + 7) * 1000.0)
+    assert load_10ms.frames_per_second == pytest.approx(100.0)
+    assert load_sporadic.frames_per_second == 0.0
+    assert plan.bus_load == pytest.approx((load_1ms.bits_per_second + load_10ms.bits_per_second) / 500000)
+    assert plan.problems == []
+
+
+def test_resource_problems(planner):
+    problems = planner.check_resources([setup(0, [5] + [7] * 199), setup(1, [5] + [7] * 59), setup(5, [5, 8])])
+    assert len(problems) == 3
+
+
+def test_suggest_prescalers(planner):
+    setups = [setup(0, [5] + [7] * 3), setup(1, [5])]
+    assert planner.estimate(setups).bus_load > 0.5
+    prescalers = planner.suggest_prescalers(setups, 0.5)
+    assert planner.estimate(setups, prescalers).bus_load <= 0.5
+    assert prescalers[1] == 1
+    assert prescalers[0] > 1
+    assignments = planner.suggest_event_assignments(setups, prescalers)
+    assert assignments.get(0) in (None, 1)
+
+
+def test_unreachable_target(planner):
+    assert planner.suggest_prescalers([setup(0, [5])], 0.0) is None
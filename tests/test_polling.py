@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import struct
+
+import pytest
+
+from asamint.xcp.decoder import DaqDecoder
+from asamint.xcp.polling import POLLING_DAQ_INFO
+from asamint.xcp.polling import PollingScheduler
+from asamint.xcp.polling import polling_layout
+
+SUMMARY = [
+    ("a", 0x1000, 0, "UWORD", 2, "NO_COMPU_METHOD"),
+    ("b", 0x1002, 0, "UWORD", 2, "NO_COMPU_METHOD"),
+    ("c", 0x1004, 0, "ULONG", 4, "NO_COMPU_METHOD"),
+    ("d", 0x1000, 1, "UBYTE", 1, "NO_COMPU_METHOD"),
+    ("e", 0x2000, 0, "FLOAT64_IEEE", 8, "NO_COMPU_METHOD"),
+]
+
+
+def test_polling_layout():
+    rates = {"a": 100.0, "b": 100.0, "c": 100.0, "d": 100.0, "e": 10.0}
+    fast, slow = polling_layout(SUMMARY, rates, max_cto=8)
+    assert fast.event_channel == 100.0
+    assert [(e.address, e.length, e.ext) for (e,) in fast.odts] == [(0x1000, 4, 0), (0x1004, 4, 0), (0x1000, 1, 1)]
+    assert [(e.address, e.length) for (e,) in slow.odts] == [(0x2000, 8)]
+    assert {m[0] for m in slow.measurement_summary} == {"e"}
+
+
+def test_polling_layout_many_blocks():
+    summary = [("m{}".format(idx), 0x1000 + idx * 8, 0, "UWORD", 2, "NO_COMPU_METHOD") for idx in range(300)]
+    first, second = polling_layout(summary, {m[0]: 10.0 for m in summary}, max_cto=8)
+    assert (len(first.odts), len(second.odts)) == (256, 44)  # ODT numbers fit into the record header.
+    assert [m[0] for m in first.measurement_summary + second.measurement_summary] == [m[0] for m in summary]
+    assert second.odts[0][0].address == second.measurement_summary[0][1] == 0x1000 + 256 * 8
+
+
+def test_scheduler_order():
+    scheduler = PollingScheduler([0.01, 0.025], start=0.0)
+    polled = []
+    while True:
+        due, idx = scheduler.next_due()
+        if due >= 0.05:
+            break
+        polled.append((round(due, 6), idx))
+        scheduler.done(due)
+    assert polled == [(0.0, 0), (0.0, 1), (0.01, 0), (0.02, 0), (0.025, 1), (0.03, 0), (0.04, 0)]
+    assert scheduler.overruns == [0, 0]
+
+
+def test_scheduler_overrun():
+    scheduler = PollingScheduler([0.01], start=0.0)
+    scheduler.done(0.035)  # Poll took much too long.
+    due, _ = scheduler.next_due()
+    assert due == pytest.approx(0.04)
+    assert scheduler.overruns == [3]
+
+
+def test_pseudo_dtos_decode():
+    setups = polling_layout(SUMMARY[:3], {"a": 10.0, "b": 10.0, "c": 10.0}, max_cto=8)
+    decoder = DaqDecoder(setups, POLLING_DAQ_INFO, timestamps=False)
+    frames = [
+        struct.pack("<BHHH", 0, 0, 1, 2),
+        struct.pack("<BHL", 1, 0, 3),
+    ]
+    (decoded,) = decoder.decode(frames, [1.5, 1.5])
+    assert list(decoded.timestamps) == [1.5]
+    assert decoded.signals["a"][0] == 1
+    assert decoded.signals["b"][0] == 2
+    assert decoded.signals["c"][0] == 3
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+from objutils import Image, Section
+import pytest
+from pyxcp.types import XcpResponseError
+
+from asamint.exceptions import ReplayMismatchError
+from asamint.utils.optimize import McObject
+from asamint.xcp.reco import XcpLogCategory, XcpLogFileReader
+from asamint.xcp.replay import ReplayMaster, SessionRecorder
+from asamint.xcp.simulator import SimulatedSlave
+from asamint.xcp.transfer import upload_blocks
+
+BLOCKS = [McObject("", 0x000, 300), McObject("", 0x400, 5)]
+
+
+def record_session(file_name):
+    slave = SimulatedSlave(Image(sections=[Section(0, bytearray(os.urandom(0x1000)))], join=False), realtime=False)
+    received = []
+    with SessionRecorder(slave, file_name) as recorder:
+        recorder.connect()
+        data, _ = upload_blocks(recorder, BLOCKS)
+        recorder.setMta(0x000)
+        recorder.buildChecksum(0x100)
+        with pytest.raises(XcpResponseError):
+            recorder.shortUpload(4, 0x2000)
+        recorder.cro_callback = lambda *args: received.append(args)
+        slave.cro_callback(XcpLogCategory.DAQ, b"\x00\x01\x02", 1, 3, 0.0)  # DTO arriving from the transport.
+        recorder.disconnect()
+    return data, received
+
+
+def test_record_and_replay(tmp_path):
+    file_name = str(tmp_path / "session")
+    data, received = record_session(file_name)
+    assert len(received) == 1
+    categories = [frame.category for frame in XcpLogFileReader(file_name).frames]
+    assert categories.count(XcpLogCategory.DAQ) == 1
+
+    replay = ReplayMaster(file_name)
+    assert replay.slaveProperties.maxCto == 8 and replay.slaveProperties["byteOrder"] == "INTEL"
+    replay.connect()
+    replayed, _ = upload_blocks(replay, BLOCKS)
+    assert replayed == data
+    replay.setMta(0x000)
+    response = replay.buildChecksum(0x100)
+    assert response.checksumType == "XCP_CRC_32"
+    with pytest.raises(XcpResponseError):
+        replay.shortUpload(4, 0x2000)
+    dtos = []
+    replay.cro_callback = lambda category, response, counter, length, timestamp: dtos.append(response.tobytes())
+    replay.disconnect()
+    assert dtos == [b"\x00\x01\x02"]
+    assert replay.exhausted
+
+
+def test_mismatch(tmp_path):
+    file_name = str(tmp_path / "session")
+    record_session(file_name)
+    replay = ReplayMaster(file_name)
+    with pytest.raises(ReplayMismatchError):
+        replay.disconnect()
+    replay = ReplayMaster(file_name)
+    replay.connect()
+    replay.setMta(0x000, 0)
+    with pytest.raises(ReplayMismatchError):
+        replay.pull(1)
+    lenient = ReplayMaster(file_name, strict=False)
+    lenient.connect()
+    lenient.setMta(0x123, 0)
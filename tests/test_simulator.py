@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import struct
+import time
+
+import numpy as np
+from objutils import Image, Section
+import pytest
+from pyxcp.types import XcpResponseError
+
+from asamint.utils.optimize import McObject
+from asamint.xcp.daq import DaqEntry, DaqListSetup
+from asamint.xcp.decoder import DaqDecoder
+from asamint.xcp.flash import PagedDownloader
+from asamint.xcp.simulator import SimulatedSlave
+from asamint.xcp.transfer import ReferenceImage, TransferCostModel, diff_image, download_blocks, upload_blocks
+
+
+@pytest.fixture
+def slave():
+    result = SimulatedSlave(
+        Image(sections=[Section(0, bytearray(os.urandom(0x1000)))], join=False),
+        timestamp_size="S2",
+        timestamp_ticks=10,
+        realtime=False,
+    )
+    result.connect()
+    return result
+
+
+def test_memory_transfers(slave, tmp_path):
+    blocks = [McObject("", 0x000, 300), McObject("", 0x400, 5)]
+    data, _ = upload_blocks(slave, blocks)
+    assert data[0] == slave.read(0x000, 300)
+    assert slave.shortUpload(4, 0x400) == data[1][:4]
+    cache = ReferenceImage(str(tmp_path), "sim")
+    cache.store(blocks, data)
+    commands = slave.commands
+    _, stats = upload_blocks(slave, blocks, cache.load(), TransferCostModel.from_slave_properties(slave.slaveProperties))
+    assert stats.unchanged == 1 and slave.commands - commands == 2 + 2  # Checksummed and pulled block.
+
+    target = bytearray(slave.read(0, 0x1000))
+    target[0x100:0x180] = os.urandom(0x80)
+    changes, _ = diff_image(Image(sections=[Section(0, bytes(target))], join=False), slave.memory[0])
+    download_blocks(slave, changes, verify=True)
+    assert slave.read(0, 0x1000) == target
+    PagedDownloader(slave, page_size=0x100).download(Image(sections=[Section(0x800, bytes(0x300))], join=False))
+    assert slave.read(0x800, 0x300) == bytes(0x300)
+    with pytest.raises(XcpResponseError):
+        slave.setMta(0x2000)
+        slave.pull(4)
+
+
+def configure_daq(slave, mode=0x10, event_channel=0, prescaler=1):
+    setup = DaqListSetup(
+        event_channel=event_channel,
+        prescaler=prescaler,
+        priority=0,
+        blocks=[McObject("", 0x10, 6)],
+        measurement_summary=[("counter", 0x10, 0, "ULONG", 4, "NO_COMPU_METHOD"), ("s16", 0x14, 0, "SWORD", 2, "NO_COMPU_METHOD")],
+        odts=[[DaqEntry(0xFF, 4, 0x10, 0)], [DaqEntry(0xFF, 2, 0x14, 0)]],
+    )
+    slave.freeDaq()
+    slave.allocDaq(1)
+    slave.allocOdt(0, len(setup.odts))
+    for odt_idx, odt in enumerate(setup.odts):
+        slave.allocOdtEntry(0, odt_idx, len(odt))
+    for odt_idx, odt in enumerate(setup.odts):
+        slave.setDaqPtr(0, odt_idx, 0)
+        for entry in odt:
+            slave.writeDaq(entry.bitoff, entry.length, entry.ext, entry.address)
+    slave.setDaqListMode(mode, 0, event_channel, prescaler, 0)
+    slave.startStopDaqList(0x02, 0)
+    slave.startStopSynch(0x01)
+    return [setup]
+
+
+def test_synthetic_daq(slave):
+    def stimulus(slave, t):
+        slave.write(0x10, struct.pack("<Lh", int(round(t * 1000)), -7))
+
+    slave.stimulus = stimulus
+    setups = configure_daq(slave, event_channel=1, prescaler=2)  # 10ms * 2
+    frames = slave.daq_frames(0.1)
+    assert len(frames) == 2 * 5
+    frames += slave.daq_frames(0.1)
+    decoder = DaqDecoder(setups, slave.getDaqInfo())
+    (daq,) = decoder.decode([f.frame for f in frames])
+    assert np.array_equal(daq.signals["counter"], np.arange(0, 200, 20))
+    assert np.allclose(daq.timestamps, np.arange(0, 0.2, 0.02))
+    assert np.all(daq.signals["s16"] == -7)
+
+
+def test_realtime_daq(slave):
+    received = []
+    slave.realtime = True
+    slave.cro_callback = lambda category, response, counter, length, timestamp: received.append(response.tobytes())
+    configure_daq(slave, event_channel=0)  # 1ms
+    time.sleep(0.1)
+    slave.startStopSynch(0x00)
+    count = len(received)
+    assert 2 * 20 < count <= 2 * 110
+    time.sleep(0.02)
+    assert len(received) == count
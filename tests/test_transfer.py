@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from logging import getLogger
+import os
+
+import numpy as np
+from objutils import Image, Section
+import pytest
+
+from asamint.calibration.transfer import XcpTransferMixin
+from asamint.exceptions import DownloadVerificationError
+from asamint.utils.optimize import McObject
+from asamint.xcp.transfer import (
+    ReferenceImage,
+    TransferCostModel,
+    changed_ranges,
+    diff_image,
+    download_blocks,
+    image_unchanged,
+    patched_image,
+    upload_blocks,
+)
+
+
+def test_round_trips():
+    model = TransferCostModel(max_cto=8)
+    assert model.round_trips(7) == 2
+    assert model.round_trips(8) == 3
+    block_mode = TransferCostModel(max_cto=8, slave_block_mode=True)
+    assert block_mode.round_trips(255) == 2
+    assert block_mode.round_trips(256) == 3
+
+
+def test_small_gaps_are_bridged():
+    model = TransferCostModel(max_cto=8, command_latency=0.001)
+    blocks = [McObject("", 0x1000, 4), McObject("", 0x1008, 4), McObject("", 0x2000, 4), McObject("", 0x2004, 2, ext=1)]
+    merged, stats = model.merge_blocks(blocks)
+    assert [(b.ext, b.address, b.length) for b in merged] == [(0, 0x1000, 12), (0, 0x2000, 4), (1, 0x2004, 2)]
+    assert stats.blocks == 3
+    assert stats.gap_bytes == 4
+    assert stats.round_trips_saved == 1
+    assert stats.estimated_time_saved > 0
+
+
+def test_no_bridging_without_block_mode():
+    blocks = [McObject("", 0x1000, 4), McObject("", 0x1100, 4)]
+    merged, _ = TransferCostModel(max_cto=8, command_latency=0.1).merge_blocks(blocks)
+    assert len(merged) == 2
+
+
+def test_latency_drives_merging():
+    blocks = [McObject("", 0x1000, 4), McObject("", 0x1100, 4)]
+    merged, stats = TransferCostModel(max_cto=8, slave_block_mode=True, command_latency=0.0001).merge_blocks(blocks)
+    assert len(merged) == 2 and stats.round_trips_saved == 0
+    merged, _ = TransferCostModel(max_cto=8, slave_block_mode=True, command_latency=0.1).merge_blocks(blocks)
+    assert len(merged) == 1
+    merged, _ = TransferCostModel(max_cto=8, slave_block_mode=True, command_latency=0.1).merge_blocks(blocks, max_length=64)
+    assert len(merged) == 2
+
+
+def test_from_slave_properties():
+    model = TransferCostModel.from_slave_properties(
+        {"maxCto": 64, "slaveBlockMode": True, "bytesPerElement": 2}, transport="ETH", bitrate=100000000
+    )
+    assert model.request_payload == 510
+    assert model.packet_payload == 63
+
+
+def test_incremental_upload(tmp_path, fake_master):
+    slave = fake_master(bytearray(os.urandom(0x400)), checksum_type="XCP_CRC_16_CITT")
+    blocks = [McObject("", 0x000, 64), McObject("", 0x100, 64), McObject("", 0x200, 4)]
+    cache = ReferenceImage(str(tmp_path), "abc")
+    data, stats = upload_blocks(slave, blocks, cache.load(), TransferCostModel(max_cto=8))
+    assert stats.unchanged == 0 and slave.pulled == [0x000, 0x100, 0x200]
+    cache.store(blocks, data)
+    slave.memory[0x110] ^= 0xFF
+    slave.pulled = []
+    data, stats = upload_blocks(slave, blocks, cache.load(), TransferCostModel(max_cto=8))
+    assert slave.pulled == [0x100, 0x200]  # Changed block, and a block too small for checking.
+    assert (stats.checked, stats.unchanged, stats.bytes_skipped) == (2, 1, 64)
+    assert data == [bytes(slave.memory[b.address : b.address + b.length]) for b in blocks]
+
+
+def test_reference_without_key(tmp_path):
+    cache = ReferenceImage(str(tmp_path), None)  # A2L file couldn't be hashed.
+    cache.store([McObject("", 0x000, 4)], [b"\x00\x01\x02\x03"])
+    assert cache.load() == {} and os.listdir(str(tmp_path)) == []
+
+
+def test_image_unchanged(fake_master):
+    slave = fake_master(bytearray(os.urandom(0x400)), checksum_type="XCP_CRC_16_CITT")
+    image = Image(sections=[Section(0x100, bytes(slave.memory[0x100:0x140])), Section(0x200, bytes(slave.memory[0x200:0x210]))])
+    assert image_unchanged(slave, image)
+    slave.memory[0x205] ^= 0xFF  # E.g. written by another tool.
+    assert not image_unchanged(slave, image)
+
+
+class Transfer(XcpTransferMixin):
+    logger = getLogger("Transfer")
+    a2l_epk = None
+
+    def __init__(self, gap_merging):
+        self.project_config = {
+            "BUS_TRANSPORT": "CAN",
+            "BUS_BITRATE": 500000,
+            "XCP_COMMAND_LATENCY": 0.1,
+            "UPLOAD_GAP_MERGING": gap_merging,
+        }
+
+
+def test_merge_upload_blocks(fake_master):
+    blocks = [McObject("", 0x100, 4), McObject("", 0x108, 4)]
+    slave = fake_master(bytearray(0x400))
+    assert Transfer(False).merge_upload_blocks(slave, blocks) == blocks
+    assert [(b.address, b.length) for b in Transfer(True).merge_upload_blocks(slave, blocks)] == [(0x100, 12)]
+
+
+def test_read_epk(fake_master):
+    slave = fake_master(bytearray(0x400))
+    slave.memory[0x300:0x306] = b"EPK_42"
+    transfer = Transfer(True)
+    assert transfer.read_epk(slave) is None  # No EPK in A2L.
+    transfer.a2l_epk = ("EPK_42", 0x300)
+    assert transfer.read_epk(slave) == "EPK_42"
+
+
+def test_changed_ranges():
+    current = np.array([0, 1, 2, 3, -1, 5, 6, 7], dtype=np.int16)
+    ranges = changed_ranges(bytes([0, 9, 2, 3, 4, 5, 6, 9]), current, start=0x100)
+    assert [(r.address, r.length) for r in ranges] == [(0x101, 1), (0x104, 1), (0x107, 1)]
+
+
+def test_differential_download(fake_master):
+    calram = bytes(os.urandom(0x10000))
+    slave = fake_master(bytearray(calram), checksum_type="XCP_CRC_16_CITT")
+    target = bytearray(calram)
+    target[0x1000:0x1800] = os.urandom(0x800)
+    target[0x1804] ^= 0xFF
+    target[0x8000] ^= 0xFF
+    reference = Image(sections=[Section(0, calram)], join=False)
+    model = TransferCostModel(max_cto=8, master_block_mode=True, max_bs=32)
+    blocks, stats = diff_image(Image(sections=[Section(0, bytes(target))], join=False), reference, model)
+    assert stats.total_bytes == 0x10000
+    assert [(b.address, b.length) for b, _ in blocks] == [(0x1000, 0x805), (0x8000, 1)]
+    download_blocks(slave, blocks, verify=True)
+    assert slave.memory == target
+    assert sum(length for _, length in slave.pushed) == 0x806
+    patched = patched_image(reference, blocks)
+    assert patched.read(0, 0x10000) == target
+    assert reference.read(0, 0x10000) == calram
+
+
+def test_download_verification(fake_master):
+    slave = fake_master(bytearray(16), corrupt=1)
+    blocks, _ = diff_image(Image(sections=[Section(0, bytes(range(1, 9)))], join=False))
+    with pytest.raises(DownloadVerificationError):
+        download_blocks(slave, blocks, verify=True)